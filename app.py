@@ -1,17 +1,79 @@
 import streamlit as st
 import pandas as pd
-from tceq_selenium_client import TCEQSeleniumClient
+from tceq_browser_pool import BrowserPool
+from tceq_batch import TCEQBatchRunner, read_rn_list
+from tceq_cache import SearchCache
+from tceq_client import TCEQClient
+from tceq_index import DocumentIndex
+from tceq_jobs import Job, JobQueue, batch_job, download_job, index_job, search_job
+from tceq_metrics import serve_metrics
+from tceq_records import ResultRecord, to_dataframe
+from tceq_resilience import CircuitOpenError, TCEQLayoutError, TCEQUnavailableError
+from tceq_search import TCEQSearch
+from tceq_store import DocumentStore
 from datetime import datetime
+import functools
+import os
+import time
 
 st.set_page_config(page_title="TCEQ Technical Review Downloader", layout="wide")
 
 st.title("TCEQ Technical Review Document Downloader")
 st.markdown("Automate the retrieval of Technical Review documents from TCEQ Records Online.")
 
+@st.cache_resource
+def get_search_cache():
+    # On-disk cache so repeat queries skip the TCEQ server entirely
+    return SearchCache(ttl=24 * 3600, max_entries=1000)
+
+@st.cache_resource
+def get_browser_pool():
+    # One pool of warm Chrome instances per process, shared by all sessions
+    return BrowserPool(size=2, max_uses=50, headless=True, cache=get_search_cache())
+
+@st.cache_resource
+def get_batch_runner():
+    # One worker pool for every batch job, so concurrent batches share its threads
+    return TCEQBatchRunner(max_workers=8, cache=get_search_cache())
+
+@st.cache_resource
+def get_searcher():
+    # HTTP search first; a pooled browser is only used when that fails
+    return TCEQSearch(TCEQClient(cache=get_search_cache()), get_browser_pool())
+
+@st.cache_resource
+def get_document_index():
+    # Full-text index of every document downloaded through the app
+    return DocumentIndex()
+
+@st.cache_resource
+def get_document_store():
+    # Content-addressed copy of every download, so no document is fetched twice
+    return DocumentStore()
+
+@st.cache_resource
+def start_metrics_server():
+    # Prometheus scrape endpoint, enabled by setting TCEQ_METRICS_PORT
+    port = os.environ.get("TCEQ_METRICS_PORT")
+    return serve_metrics(int(port)) if port else None
+
+start_metrics_server()
+
+@st.cache_resource
+def get_job_queue():
+    # Searches and downloads run here, off the UI thread; shared by all sessions.
+    # The browser pool's size caps Chrome instances however many jobs are queued.
+    return JobQueue(max_workers=4)
+
 # Sidebar for inputs
 with st.sidebar:
     st.header("Search Criteria")
-    rn_number = st.text_input("Central Registry RN", value="RN100223445", help="e.g., RN100223445")
+    mode = st.radio("Mode", ["Single RN", "Batch (RN list)"], horizontal=True)
+    if mode == "Single RN":
+        rn_number = st.text_input("Central Registry RN", value="RN100223445", help="e.g., RN100223445")
+    else:
+        rn_number = None
+        rn_file = st.file_uploader("RN list", type=["txt", "csv"], help="One RN per line or comma separated")
     
     # Date Range
     today = datetime.now()
@@ -19,53 +81,195 @@ with st.sidebar:
     start_date = st.date_input("Start Date", value=None)
     end_date = st.date_input("End Date", value=None)
     
+    refresh = st.checkbox("Bypass cache", value=False, help="Re-fetch from TCEQ even if this search was cached recently")
+    show_timings = st.checkbox("Show timing breakdown", value=False, help="Time spent in each phase of the last search")
+    
     search_btn = st.button("Search Documents", type="primary")
 
-if search_btn:
+DOWNLOAD_DIR = "downloads"
+
+@st.cache_resource
+def start_indexing_downloads():
+    # Documents downloaded outside the app (e.g. by tceq_sync.py) become searchable too
+    return get_job_queue().submit("index", index_job, get_document_index(), DOWNLOAD_DIR,
+                                  description="Indexing downloaded documents")
+
+start_indexing_downloads()
+
+def to_datetime_range(start_date, end_date):
+    s_dt = datetime.combine(start_date, datetime.min.time()) if start_date else None
+    e_dt = datetime.combine(end_date, datetime.max.time()) if end_date else None
+    return s_dt, e_dt
+
+def show_results_table(rows, target=st):
+    records = [ResultRecord.from_dict(doc) for doc in rows]
+    # Built column by column from the record slots; RN only when results span several RNs
+    columns = ["title", "date", "dID", "url", "raw_text"]
+    if len({record.rn for record in records if record.rn}) > 1:
+        columns.insert(0, "rn")
+    target.dataframe(
+        to_dataframe(records, columns),
+        column_config={
+            "url": st.column_config.LinkColumn("Download Link"),
+            "rn": "RN",
+            "title": "Document Title",
+            "date": "Date"
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+def show_job_error(error):
+    if isinstance(error, CircuitOpenError):
+        st.error(f"TCEQ Records Online is currently unavailable. {error}")
+    elif isinstance(error, TCEQUnavailableError):
+        st.error(f"TCEQ Records Online is busy or down ({error}). Please try again in a few minutes.")
+    elif isinstance(error, TCEQLayoutError):
+        st.error(f"The TCEQ search page could not be read: {error}")
+    else:
+        st.error(f"An error occurred: {error}")
+
+def show_job_progress(job):
+    """
+    Show a running job's progress. Returns True while the job is unfinished.
+    """
+    info = job.snapshot()
+    if info["status"] == Job.QUEUED:
+        st.info(f"{info['description']}: queued behind other searches...")
+    elif info["total"]:
+        st.progress(min(1.0, info["done"] / info["total"]), text=info["message"])
+    else:
+        st.info(f"{info['description']}: {info['message']}")
+    return not job.finished
+
+def read_file(path):
+    with open(path, "rb") as f:
+        return f.read()
+
+def show_bulk_download(rows):
+    """
+    Download every listed document in the background and offer them as one ZIP.
+    """
+    st.subheader("Bulk Download")
+    zip_job = get_job_queue().get(st.session_state.get("zip_job_id"))
+    if zip_job and not zip_job.finished:
+        return show_job_progress(zip_job)
+    
+    if zip_job:
+        st.session_state.pop("zip_job_id")
+        for warning in zip_job.warnings:
+            st.warning(warning)
+        if zip_job.status == Job.DONE:
+            st.session_state["zip_path"] = zip_job.result
+        elif zip_job.error:
+            show_job_error(zip_job.error)
+    
+    if st.button(f"Prepare ZIP of {len(rows)} documents"):
+        st.session_state.pop("zip_path", None)
+        st.session_state["zip_job_id"] = get_job_queue().submit(
+            "download", download_job, rows, DOWNLOAD_DIR, index=get_document_index(), store=get_document_store(),
+            description=f"ZIP of {len(rows)} documents")
+        st.rerun()
+    
+    zip_path = st.session_state.get("zip_path")
+    if zip_path and os.path.exists(zip_path):
+        # Deferred: the ZIP is only read when the button is clicked, not on every rerun
+        st.download_button("Download ZIP", functools.partial(read_file, zip_path), file_name="technical_reviews.zip",
+                           mime="application/zip", on_click="ignore")
+    return False
+
+def show_document_search():
+    """
+    Full-text search across every document downloaded so far.
+    """
+    index = get_document_index()
+    st.subheader("Search Downloaded Documents")
+    query = st.text_input("Find text in downloaded documents",
+                          placeholder="e.g. NOx lb/hr, PSD, permit number",
+                          help=f"{index.count()} documents indexed. Documents are indexed as they are downloaded.")
+    if not query:
+        return
+    hits = index.search(query)
+    if not hits:
+        st.info("No downloaded documents match.")
+        return
+    st.dataframe(
+        pd.DataFrame(hits)[["title", "date", "rn", "snippet", "url"]],
+        column_config={
+            "url": st.column_config.LinkColumn("Download Link"),
+            "rn": "RN",
+            "title": "Document Title",
+            "date": "Date",
+            "snippet": "Match"
+        },
+        hide_index=True,
+        use_container_width=True
+    )
+
+def start_search_job(kind, fn, *args, description):
+    st.session_state["job_id"] = get_job_queue().submit(kind, fn, *args, description=description)
+    st.session_state.pop("results", None)
+    st.session_state.pop("zip_path", None)
+    st.session_state.pop("timings", None)
+
+if search_btn and mode != "Single RN":
+    rns = read_rn_list(rn_file.getvalue().splitlines()) if rn_file else []
+    if not rns:
+        st.error("Please upload a file with at least one Central Registry RN number.")
+    else:
+        s_dt, e_dt = to_datetime_range(start_date, end_date)
+        start_search_job("batch", batch_job, get_batch_runner(), rns, s_dt, e_dt, refresh,
+                         description=f"Searching {len(rns)} RNs")
+
+elif search_btn:
     if not rn_number:
         st.error("Please enter a Central Registry RN number.")
     else:
-        status_text = st.empty()
-        status_text.info("Starting Selenium Browser... (This may take a moment)")
-        
-        # Initialize client
-        # We use session state to hold results if we want persistence, but simple run is fine
-        try:
-            with st.spinner("Searching TCEQ Database..."):
-                client = TCEQSeleniumClient(headless=True)
-                
-                # Convert date inputs to datetime
-                s_dt = datetime.combine(start_date, datetime.min.time()) if start_date else None
-                e_dt = datetime.combine(end_date, datetime.max.time()) if end_date else None
-                
-                results = client.search(rn_number, s_dt, e_dt)
-                client.close()
-                
-            status_text.empty()
-            
-            if not results:
-                st.warning("No documents found matching the criteria.")
-            else:
-                st.success(f"Found {len(results)} documents.")
-                
-                # Create DataFrame
-                df = pd.DataFrame(results)
-                
-                # Display standard table with links
-                # We can use st.dataframe with LinkColumn config
-                
-                st.dataframe(
-                    df,
-                    column_config={
-                        "url": st.column_config.LinkColumn("Download Link"),
-                        "title": "Document Title",
-                        "date": "Date"
-                    },
-                    hide_index=True,
-                    use_container_width=True
-                )
-                
-        except Exception as e:
-            st.error(f"An error occurred: {e}")
-            if 'client' in locals():
-                client.close()
+        # Convert date inputs to datetime
+        s_dt, e_dt = to_datetime_range(start_date, end_date)
+        start_search_job("search", search_job, get_searcher(), rn_number, s_dt, e_dt, refresh,
+                         description=f"Searching {rn_number}")
+
+polling = False
+search = get_job_queue().get(st.session_state.get("job_id"))
+if search and not search.finished:
+    polling = show_job_progress(search)
+    # Rows stream in page by page while the search runs
+    partial = search.partial_results()
+    if partial:
+        show_results_table(partial)
+elif search:
+    # The job finished since the last rerun: pick up its results
+    st.session_state.pop("job_id")
+    for warning in search.warnings:
+        st.warning(warning)
+    if search.trace:
+        st.session_state["timings"] = (search.trace.duration(), search.trace.breakdown())
+    if search.status == Job.DONE:
+        results = search.result
+        st.session_state["results"] = results
+        if not results:
+            st.warning("No documents found matching the criteria.")
+        else:
+            engine = "the browser" if search.engine == TCEQSearch.SELENIUM else "a direct HTTP search"
+            st.success(f"Found {len(results)} documents (served by {engine}).")
+    elif search.error:
+        show_job_error(search.error)
+
+if show_timings and st.session_state.get("timings"):
+    duration, breakdown = st.session_state["timings"]
+    with st.expander(f"Timing breakdown ({duration:.2f}s total)", expanded=True):
+        st.caption("Concurrent phases such as page loads are summed, so they can add up to more than the total.")
+        st.dataframe(pd.DataFrame(breakdown), hide_index=True, use_container_width=True)
+
+if st.session_state.get("results"):
+    # Keep the last results visible across reruns (e.g. when preparing the ZIP)
+    show_results_table(st.session_state["results"])
+    polling = show_bulk_download(st.session_state["results"]) or polling
+
+show_document_search()
+
+if polling:
+    # Jobs run in the background; rerun to refresh their progress
+    time.sleep(1)
+    st.rerun()
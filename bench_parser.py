@@ -0,0 +1,98 @@
+"""
+Benchmark the shared lxml result parser against the previous BeautifulSoup
+html.parser implementation.
+
+    python bench_parser.py                  # synthetic 200-row and 10-page result sets
+    python bench_parser.py saved_pages/     # every *.html results page in a directory
+"""
+import glob
+import os
+import re
+import sys
+import time
+import urllib.parse
+
+from bs4 import BeautifulSoup
+
+from tceq_fixtures import make_result_pages
+from tceq_parser import parse_results
+
+BASE_URL = "https://records.tceq.texas.gov/cs/idcplg"
+
+
+def legacy_parse_results(content):
+    """
+    The pre-tceq_parser TCEQClient._parse_results, kept for comparison.
+    """
+    soup = BeautifulSoup(content, 'html.parser')
+    results = []
+    result_table = None
+    for table in soup.find_all('table'):
+        if table.find('th') and "Title" in table.get_text():
+            result_table = table
+            break
+    rows = result_table.find_all('tr') if result_table else soup.find_all('tr')
+    for row in rows:
+        if row.find('th'):
+            continue
+        if not row.find_all('td'):
+            continue
+        text_content = row.get_text(separator=' ', strip=True)
+        if "Technical Review" not in text_content:
+            continue
+        doc_info = {}
+        link_tag = row.find('a', href=True)
+        if link_tag:
+            href = link_tag['href']
+            doc_info['url'] = urllib.parse.urljoin(BASE_URL, href)
+            doc_info['title'] = link_tag.get_text(strip=True)
+            params = urllib.parse.parse_qs(urllib.parse.urlparse(href).query)
+            if 'dID' in params:
+                doc_info['dID'] = params['dID'][0]
+        doc_info['raw_text'] = text_content
+        date_match = re.search(r'\d{1,2}/\d{1,2}/\d{2,4}', text_content)
+        if date_match:
+            doc_info['date'] = date_match.group(0)
+        if 'url' in doc_info:
+            results.append(doc_info)
+    return results
+
+
+def time_parser(parse, pages, repeat):
+    best = None
+    for _ in range(repeat):
+        start = time.perf_counter()
+        rows = 0
+        for page in pages:
+            rows += len(parse(page))
+        elapsed = time.perf_counter() - start
+        best = elapsed if best is None else min(best, elapsed)
+    return best, rows
+
+
+def report(name, pages, repeat=5):
+    legacy, legacy_rows = time_parser(legacy_parse_results, pages, repeat)
+    fast, fast_rows = time_parser(lambda page: parse_results(page, BASE_URL), pages, repeat)
+    print(f"{name}: {len(pages)} pages")
+    print(f"  bs4 html.parser  {legacy * 1000:8.1f} ms  ({legacy_rows} rows)")
+    print(f"  lxml             {fast * 1000:8.1f} ms  ({fast_rows} rows)")
+    print(f"  speedup          {legacy / fast:8.1f}x")
+
+
+def main(argv=None):
+    argv = sys.argv[1:] if argv is None else argv
+    if argv:
+        paths = sorted(glob.glob(os.path.join(argv[0], "*.html")))
+        pages = []
+        for path in paths:
+            with open(path, "rb") as f:
+                pages.append(f.read())
+        report(f"saved pages in {argv[0]}", pages)
+        return
+
+    report("200-row result page", make_result_pages(200))
+    report("10-page result set", make_result_pages(2000))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,65 @@
+import time
+
+import pytest
+
+
+class FakeBrowser:
+    """
+    Stand-in for TCEQSeleniumClient, built by FakeBrowsers.
+    """
+
+    def __init__(self, script):
+        self.script = script
+        self.closed = False
+
+    def is_healthy(self):
+        return not self.closed
+
+    def reset(self):
+        time.sleep(self.script.reset_delay)
+        self.script.resets += 1
+
+    def close(self):
+        self.closed = True
+
+    def search(self, rn_number, start_date=None, end_date=None):
+        return self.fetch_all(rn_number)
+
+    def fetch_all(self, rn_number, progress=None, retry_policy=None):
+        return [doc for page in self._iter_pages(rn_number, progress) for doc in page]
+
+    def _iter_pages(self, rn_number, progress=None):
+        self.script.searches += 1
+        if self.script.errors:
+            raise self.script.errors.pop(0)
+        yield from self.script.pages
+        if self.script.tail_error:
+            raise self.script.tail_error
+
+
+class FakeBrowsers:
+    """
+    client_factory for BrowserPool tests. Every browser it builds follows one
+    script: a search raises the next of `errors` while any are left, otherwise
+    it yields `pages` and then raises `tail_error` if set. Resets take
+    `reset_delay` seconds.
+    """
+
+    def __init__(self, pages=(), errors=(), tail_error=None, reset_delay=0):
+        self.pages = list(pages)
+        self.errors = list(errors)
+        self.tail_error = tail_error
+        self.reset_delay = reset_delay
+        self.resets = 0
+        self.searches = 0
+        self.built = []
+
+    def __call__(self):
+        browser = FakeBrowser(self)
+        self.built.append(browser)
+        return browser
+
+
+@pytest.fixture
+def fake_browsers():
+    return FakeBrowsers
@@ -0,0 +1,342 @@
+import asyncio
+import os
+import time
+import urllib.parse
+
+import httpx
+
+from tceq_client import TCEQClient, filter_by_date
+from tceq_downloader import PART_SUFFIX, document_id, file_extension, find_existing, holds_whole_body
+from tceq_http import USER_AGENT, default_governor
+from tceq_metrics import METRICS, span
+from tceq_parser import parse_hidden_inputs, parse_results_page
+from tceq_resilience import (DEFAULT_RETRY_POLICY, RETRY_STATUSES, TCEQError, TCEQLayoutError, TCEQUnavailableError,
+                             async_call_with_retries, breaker_for, parse_retry_after)
+
+
+def _prepare_download(dest_dir, doc_id):
+    """
+    Return (existing path or None, bytes already in the .part file).
+    """
+    os.makedirs(dest_dir, exist_ok=True)
+    part_path = os.path.join(dest_dir, doc_id + PART_SUFFIX)
+    offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+    return find_existing(dest_dir, doc_id), offset
+
+
+class AsyncTCEQClient:
+    """
+    asyncio counterpart of TCEQClient, built on httpx with HTTP/2 and
+    keep-alive connection pooling.
+
+    Search, parsing, layout checks and date filtering behave exactly like
+    TCEQClient. Every request has its own timeout, and each search as a
+    whole is bounded by search_timeout, so one slow TCEQ response cannot
+    stall the event loop's other searches and downloads; a search that runs
+    out of time raises TCEQUnavailableError. Pages and downloads are retried
+    under the same RetryPolicy and per-host circuit breaker as PooledSession.
+    Requests are paced by the same RateGovernor as the sync clients; its
+    SQLite bucket, and all file I/O, run on worker threads so they never
+    block the event loop. Use as an async context manager:
+
+        async with AsyncTCEQClient() as client:
+            async for rn, results, error in client.search_many(rns):
+                ...
+    """
+
+    BASE_URL = TCEQClient.BASE_URL
+    PAGE_SIZE = TCEQClient.PAGE_SIZE
+    MAX_PAGES = TCEQClient.MAX_PAGES
+    KEYWORD = TCEQClient.KEYWORD
+
+    def __init__(self, max_connections=10, request_timeout=30.0, search_timeout=300.0,
+                 page_concurrency=4, form_params_ttl=30 * 60, http2=True, client=None, base_url=None,
+                 rate_limiter=None, retry_policy=None):
+        if base_url:
+            self.BASE_URL = base_url
+        # Shared with the sync clients, so all of them together stay at the rate TCEQ tolerates
+        self.rate_limiter = rate_limiter or default_governor()
+        self.retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+        self.client = client or httpx.AsyncClient(
+            http2=http2,
+            headers={"User-Agent": USER_AGENT},
+            timeout=httpx.Timeout(request_timeout),
+            limits=httpx.Limits(max_connections=max_connections, max_keepalive_connections=max_connections),
+            follow_redirects=True,
+        )
+        self.search_timeout = search_timeout
+        self.page_concurrency = page_concurrency
+        self.form_params_ttl = form_params_ttl
+        self._form_lock = asyncio.Lock()
+        self._form_params = None
+        self._form_fetched_at = 0.0
+        self._headers = {"Referer": f"{self.BASE_URL}?IdcService=TCEQ_SEARCH"}
+
+    async def __aenter__(self):
+        return self
+
+    async def __aexit__(self, *exc_info):
+        await self.aclose()
+
+    async def aclose(self):
+        await self.client.aclose()
+
+    async def _paced(self, url):
+        """
+        Wait for the rate governor. Returns the start time to pass to _record.
+        """
+        await asyncio.to_thread(self.rate_limiter.acquire, url)
+        return time.perf_counter()
+
+    async def _record(self, url, started, status=None, retry_after=None):
+        await asyncio.to_thread(self.rate_limiter.record, url, time.perf_counter() - started, status, retry_after)
+
+    async def _send_once(self, method, url, **kwargs):
+        started = await self._paced(url)
+        try:
+            response = await self.client.request(method, url, **kwargs)
+        except (httpx.TransportError, httpx.TimeoutException) as e:
+            await self._record(url, started)
+            raise TCEQUnavailableError(f"Could not reach TCEQ: {e!r}") from e
+        retry_after = None
+        if response.status_code in RETRY_STATUSES:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        await self._record(url, started, response.status_code, retry_after)
+        if response.status_code in RETRY_STATUSES:
+            raise TCEQUnavailableError(
+                f"TCEQ server returned {response.status_code} {response.reason_phrase}",
+                status_code=response.status_code,
+                retry_after=retry_after
+            )
+        response.raise_for_status()
+        return response
+
+    async def _request(self, method, url, **kwargs):
+        """
+        One request with the shared retry policy and circuit breaker.
+        """
+        return await async_call_with_retries(
+            lambda: self._send_once(method, url, **kwargs),
+            self.retry_policy,
+            breaker_for(url),
+            f"{method} {urllib.parse.urlparse(url).path}"
+        )
+
+    async def _get_search_params(self, refresh=False):
+        """
+        Hidden fields of the TCEQ_SEARCH form, fetched once and shared by
+        concurrent searches until they expire or a search is rejected.
+        """
+        async with self._form_lock:
+            expired = time.monotonic() - self._form_fetched_at > self.form_params_ttl
+            if refresh or self._form_params is None or expired:
+                with span("form_bootstrap", client="async"):
+                    response = await self._request("GET", self.BASE_URL, params={"IdcService": "TCEQ_SEARCH"})
+                    params = parse_hidden_inputs(response.content)
+                METRICS.inc("tceq_response_bytes_total", len(response.content), client="async")
+                if 'IdcService' not in params:
+                    params['IdcService'] = 'TCEQ_PERFORM_SEARCH'
+                self._form_params = params
+                self._form_fetched_at = time.monotonic()
+            return dict(self._form_params)
+
+    async def _fetch_page(self, method, params):
+        with span("page_load", client="async", start_row=params.get("StartRow", 1)):
+            if method == "GET":
+                response = await self._request("GET", self.BASE_URL, params=params, headers=self._headers)
+            else:
+                response = await self._request("POST", self.BASE_URL, data=params, headers=self._headers)
+        METRICS.inc("tceq_response_bytes_total", len(response.content), client="async")
+        with span("parse", client="async"):
+            page = parse_results_page(response.content, self.BASE_URL, self.KEYWORD)
+        METRICS.inc("tceq_pages_total", client="async")
+        METRICS.inc("tceq_rows_total", len(page['rows']), client="async")
+        return page
+
+    async def _submit_search(self, rn_number, start_date=None):
+        """
+        POST the search; on rejection refetch the form fields and retry once.
+        """
+        for attempt in range(2):
+            search_params = TCEQClient.search_form_data(await self._get_search_params(refresh=bool(attempt)), rn_number, start_date)
+            try:
+                first_page = await self._fetch_page("POST", search_params)
+            except httpx.HTTPStatusError as e:
+                if attempt or not 400 <= e.response.status_code < 500:
+                    raise
+            else:
+                if first_page['has_table'] or first_page['no_results']:
+                    return search_params, first_page
+                if attempt:
+                    raise TCEQLayoutError("TCEQ returned a page without a results table; the search page layout may have changed.")
+            print("Search was rejected, refreshing search form parameters...")
+
+    async def _fetch_remaining_pages(self, search_params, first_page):
+        if first_page['next_params']:
+            method, base_params = "GET", first_page['next_params']
+        else:
+            method, base_params = "POST", search_params
+
+        if first_page['total']:
+            total = min(first_page['total'], self.PAGE_SIZE * self.MAX_PAGES)
+            semaphore = asyncio.Semaphore(self.page_concurrency)
+
+            async def fetch(start_row):
+                params = dict(base_params)
+                params.update({
+                    "StartRow": start_row,
+                    "EndRow": min(start_row + self.PAGE_SIZE - 1, total),
+                    "ResultCount": self.PAGE_SIZE
+                })
+                async with semaphore:
+                    return await self._fetch_page(method, params)
+
+            # gather keeps page order, so results stay sorted
+            pages = await asyncio.gather(*(fetch(start) for start in range(self.PAGE_SIZE + 1, total + 1, self.PAGE_SIZE)))
+            for page_num, page in enumerate(pages, start=2):
+                TCEQClient.check_page(page, page_num)
+            TCEQClient.check_row_count(first_page['row_count'] + sum(page['row_count'] for page in pages), total)
+            return [row for page in pages for row in page['rows']]
+
+        # Total unknown: follow next links serially
+        results = []
+        next_params = first_page['next_params']
+        page_num = 1
+        while next_params and page_num < self.MAX_PAGES:
+            page_num += 1
+            page = await self._fetch_page("GET", next_params)
+            if page['no_results']:
+                break
+            TCEQClient.check_page(page, page_num)
+            results.extend(page['rows'])
+            next_params = page['next_params']
+        return results
+
+    async def fetch_all(self, rn_number, start_date=None):
+        """
+        Every result row across all pages, unfiltered. With start_date the search
+        is narrowed server-side to documents checked in since then.
+        Raises TCEQError on failure.
+        """
+        search_params, first_page = await self._submit_search(rn_number, start_date)
+        TCEQClient.check_first_page(first_page)
+        results = list(first_page['rows'])
+        if TCEQClient.has_more_pages(first_page):
+            results.extend(await self._fetch_remaining_pages(search_params, first_page))
+        return results
+
+    async def search_technical_reviews(self, rn_number, start_date=None, end_date=None):
+        """
+        Same contract as TCEQClient.search_technical_reviews: filtered results,
+        TCEQError subclasses on failure.
+        """
+        try:
+            results = await asyncio.wait_for(self.fetch_all(rn_number, start_date), self.search_timeout)
+        except asyncio.TimeoutError as e:
+            raise TCEQUnavailableError(f"Search for {rn_number} timed out after {self.search_timeout:.0f}s") from e
+        except httpx.HTTPError as e:
+            raise TCEQError(f"Search request failed: {e!r}") from e
+        return filter_by_date(results, start_date, end_date)
+
+    async def search_many(self, rn_numbers, start_date=None, end_date=None, concurrency=8):
+        """
+        Search many RNs concurrently, yielding (rn_number, results, error) as each
+        finishes. Closing the generator early cancels the searches still running.
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(rn):
+            async with semaphore:
+                try:
+                    return rn, await self.search_technical_reviews(rn, start_date, end_date), None
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    return rn, [], e
+
+        tasks = [asyncio.create_task(run(rn)) for rn in rn_numbers]
+        try:
+            for next_done in asyncio.as_completed(tasks):
+                yield await next_done
+        finally:
+            for task in tasks:
+                task.cancel()
+            await asyncio.gather(*tasks, return_exceptions=True)
+
+    async def download(self, doc, dest_dir, chunk_size=64 * 1024):
+        """
+        Stream one document into dest_dir, named by dID like DocumentDownloader.
+        Returns the local path. Transient failures are retried under the shared
+        retry policy and circuit breaker; each retry resumes the .part file
+        with a Range request.
+        """
+        return await async_call_with_retries(
+            lambda: self._download_once(doc, dest_dir, chunk_size),
+            self.retry_policy,
+            breaker_for(doc['url']),
+            f"GET {urllib.parse.urlparse(doc['url']).path}"
+        )
+
+    async def _download_once(self, doc, dest_dir, chunk_size):
+        doc_id = document_id(doc)
+        existing, offset = await asyncio.to_thread(_prepare_download, dest_dir, doc_id)
+        if existing:
+            return existing
+        part_path = os.path.join(dest_dir, doc_id + PART_SUFFIX)
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        started = await self._paced(doc['url'])
+        try:
+            async with self.client.stream("GET", doc['url'], headers=headers) as response:
+                retry_after = None
+                if response.status_code in RETRY_STATUSES:
+                    retry_after = parse_retry_after(response.headers.get("Retry-After"))
+                await self._record(doc['url'], started, response.status_code, retry_after)
+                if response.status_code in RETRY_STATUSES:
+                    raise TCEQUnavailableError(
+                        f"TCEQ server returned {response.status_code} {response.reason_phrase}",
+                        status_code=response.status_code,
+                        retry_after=retry_after
+                    )
+                if response.status_code == 416:
+                    # Requested range not satisfiable: the part file should already hold the whole body
+                    if not await asyncio.to_thread(holds_whole_body, part_path, offset, response):
+                        print(f"Discarding unusable partial download {part_path}")
+                        await asyncio.to_thread(os.remove, part_path)
+                        return await self._download_once(doc, dest_dir, chunk_size)
+                    ext = ".pdf"
+                else:
+                    response.raise_for_status()
+                    # Servers that ignore Range answer 200 with the full body, so start over
+                    mode = "ab" if response.status_code == 206 else "wb"
+                    f = await asyncio.to_thread(open, part_path, mode)
+                    try:
+                        async for chunk in response.aiter_bytes(chunk_size):
+                            await asyncio.to_thread(f.write, chunk)
+                    finally:
+                        await asyncio.to_thread(f.close)
+                    ext = file_extension(response)
+                final_path = os.path.join(dest_dir, doc_id + ext)
+        except (httpx.TransportError, httpx.TimeoutException) as e:
+            await self._record(doc['url'], started)
+            # Whatever arrived stays in the .part file for the retry to resume
+            raise TCEQUnavailableError(f"Could not reach TCEQ: {e!r}") from e
+        await asyncio.to_thread(os.replace, part_path, final_path)
+        return final_path
+
+    async def download_all(self, results, dest_dir, concurrency=4):
+        """
+        Download every result concurrently; returns a list of (doc, path, error).
+        """
+        semaphore = asyncio.Semaphore(concurrency)
+
+        async def run(doc):
+            async with semaphore:
+                try:
+                    return doc, await self.download(doc, dest_dir), None
+                except asyncio.CancelledError:
+                    raise
+                except Exception as e:
+                    return doc, None, e
+
+        return await asyncio.gather(*(run(doc) for doc in results if doc.get('url')))
@@ -0,0 +1,238 @@
+import asyncio
+import sys
+import threading
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from datetime import datetime
+
+from tceq_client import SearchFormParams, TCEQClient, filter_by_date
+from tceq_http import CappedGovernor, HostLimiter, PooledSession, default_governor
+from tceq_metrics import propagate
+from tceq_resilience import TCEQError
+from tceq_search import TCEQSearch
+
+
+def read_rn_list(lines):
+    """
+    Parse RN numbers from an iterable of text lines (file upload or CLI file).
+    Accepts one RN per line or comma separated values; blank lines and
+    '#' comments are ignored. Duplicates are dropped, order is preserved.
+    """
+    rns = []
+    seen = set()
+    for line in lines:
+        if isinstance(line, bytes):
+            line = line.decode("utf-8", errors="ignore")
+        line = line.split("#", 1)[0]
+        for token in line.replace(",", " ").split():
+            rn = token.strip().upper()
+            if rn and rn not in seen:
+                seen.add(rn)
+                rns.append(rn)
+    return rns
+
+
+def _rate_limiter(requests_per_second=None, governor=None):
+    """
+    The governor runner sessions are paced by (default_governor() unless one
+    is given), capped at requests_per_second for this process if set.
+    """
+    governor = governor or default_governor()
+    return CappedGovernor(governor, requests_per_second) if requests_per_second else governor
+
+
+class TCEQBatchRunner:
+    """
+    Fans a list of RNs out over a bounded worker pool.
+    Every worker thread keeps its own TCEQClient on a PooledSession, with its
+    own cookies and cached search form fields; all sessions share one
+    HostLimiter and the adaptive RateGovernor, so the combined load on
+    records.tceq.texas.gov stays at what the server tolerates no matter how
+    many workers (or other local runs on the same governor) there are.
+    requests_per_second caps this runner's rate without changing the
+    governor's.
+
+    With a BrowserPool, searches go through TCEQSearch (HTTP first, browser
+    fallback), or straight to the pool when use_http is False.
+    base_url points the HTTP clients at another server, e.g. the local
+    replay server.
+
+    The worker pool lives as long as the runner, so one runner can be shared
+    by concurrent callers (e.g. every batch job in the app) and max_workers
+    caps their combined searches. close() stops it.
+    """
+
+    def __init__(self, max_workers=4, max_per_host=4, requests_per_second=None, cache=None,
+                 browser_pool=None, use_http=True, base_url=None, governor=None):
+        self.max_workers = max_workers
+        # Also sizes each worker session's connection pool in _client()
+        self.max_per_host = max_per_host
+        self.cache = cache
+        self.base_url = base_url
+        self.browser_pool = browser_pool
+        self.use_http = use_http
+        self.host_limiter = HostLimiter(max_per_host)
+        self.rate_limiter = _rate_limiter(requests_per_second, governor)
+        self._local = threading.local()
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tceq-batch")
+
+    def _client(self):
+        client = getattr(self._local, "client", None)
+        if client is None:
+            session = PooledSession(self.host_limiter, self.rate_limiter, pool_size=self.max_per_host)
+            # The search form's hidden fields are cached per session: they may be tied to
+            # the session's cookies, so they are not shared with other workers
+            client = TCEQClient(session=session, cache=self.cache, form_params=SearchFormParams(),
+                                base_url=self.base_url)
+            self._local.client = client
+        return client
+
+    def _search_one(self, rn_number, start_date, end_date, refresh):
+        if self.browser_pool is None:
+            return self._client().search_technical_reviews(rn_number, start_date, end_date, refresh)
+        if not self.use_http:
+            return self.browser_pool.search(rn_number, start_date, end_date, refresh)
+        return TCEQSearch(self._client(), self.browser_pool).search(rn_number, start_date, end_date, refresh)
+
+    def iter_results(self, rn_numbers, start_date=None, end_date=None, refresh=False):
+        """
+        Yield (rn_number, results, error) tuples as each RN finishes,
+        in completion order rather than submission order. Searches not yet
+        started are cancelled if the caller stops iterating early.
+        """
+        futures = {
+            self._executor.submit(propagate(self._search_one), rn, start_date, end_date, refresh): rn
+            for rn in rn_numbers
+        }
+        try:
+            for future in as_completed(futures):
+                rn = futures[future]
+                try:
+                    yield rn, future.result(), None
+                except Exception as e:
+                    print(f"Error searching {rn}: {e}")
+                    yield rn, [], e
+        finally:
+            for future in futures:
+                future.cancel()
+
+    def run(self, rn_numbers, start_date=None, end_date=None, refresh=False):
+        """
+        Run the whole batch and return a dict of RN -> results.
+        """
+        return {rn: results for rn, results, _ in self.iter_results(rn_numbers, start_date, end_date, refresh)}
+
+    def close(self):
+        self._executor.shutdown(wait=True, cancel_futures=True)
+
+
+class AsyncBatchRunner:
+    """
+    TCEQBatchRunner on one asyncio event loop instead of a thread per worker:
+    a single AsyncTCEQClient (httpx, HTTP/2, max_per_host pooled connections)
+    searches up to max_workers RNs at once, paced by the same RateGovernor.
+    iter_results() and run() behave like TCEQBatchRunner's, including the
+    search cache and its stale-if-error fallback, so callers can use either.
+    """
+
+    def __init__(self, max_workers=8, max_per_host=4, requests_per_second=None, cache=None, base_url=None,
+                 governor=None):
+        self.max_workers = max_workers
+        self.max_per_host = max_per_host
+        self.cache = cache
+        self.base_url = base_url
+        self.rate_limiter = _rate_limiter(requests_per_second, governor)
+
+    def _cache_key(self, rn_number):
+        return self.cache.make_key(rn_number, TCEQClient.RECORD_SERIES, TCEQClient.KEYWORD, TCEQClient.SORT)
+
+    def _iter_live(self, rn_numbers, start_date):
+        """
+        Yield (rn_number, results, error) from AsyncTCEQClient.search_many,
+        driving a private event loop one result at a time.
+        """
+        # Imported here so the thread-based runner works without httpx installed
+        from tceq_async_client import AsyncTCEQClient
+
+        loop = asyncio.new_event_loop()
+        client = None
+        searches = None
+        try:
+            async def open_client():
+                # httpx.AsyncClient must be created inside the loop that uses it
+                return AsyncTCEQClient(max_connections=self.max_per_host, base_url=self.base_url,
+                                       rate_limiter=self.rate_limiter)
+
+            client = loop.run_until_complete(open_client())
+            searches = client.search_many(rn_numbers, start_date, concurrency=self.max_workers)
+            while True:
+                try:
+                    yield loop.run_until_complete(searches.__anext__())
+                except StopAsyncIteration:
+                    break
+        finally:
+            if searches is not None:
+                loop.run_until_complete(searches.aclose())
+            if client is not None:
+                loop.run_until_complete(client.aclose())
+            loop.close()
+
+    def iter_results(self, rn_numbers, start_date=None, end_date=None, refresh=False):
+        """
+        Yield (rn_number, results, error) tuples: cached RNs first, then the
+        rest in completion order.
+        """
+        misses = []
+        for rn in rn_numbers:
+            cached = self.cache.get(self._cache_key(rn), start_date=start_date) if self.cache and not refresh else None
+            if cached is None:
+                misses.append(rn)
+                continue
+            yield rn, filter_by_date(cached, start_date, end_date), None
+
+        for rn, results, error in self._iter_live(misses, start_date):
+            if self.cache:
+                key = self._cache_key(rn)
+                if error is None:
+                    self.cache.put(key, results, start_date)
+                elif isinstance(error, TCEQError):
+                    stale = self.cache.get(key, allow_stale=True, start_date=start_date)
+                    if stale is not None:
+                        print(f"Live search for {rn} failed ({error}), serving stale cached results.")
+                        results, error = stale, None
+            if error:
+                print(f"Error searching {rn}: {error}")
+            yield rn, filter_by_date(results, start_date, end_date), error
+
+    def run(self, rn_numbers, start_date=None, end_date=None, refresh=False):
+        """
+        Run the whole batch and return a dict of RN -> results.
+        """
+        return {rn: results for rn, results, _ in self.iter_results(rn_numbers, start_date, end_date, refresh)}
+
+    def close(self):
+        # Each iter_results() call opens and closes its own client and event loop
+        pass
+
+
+def parse_date_arg(value, end_of_day=False):
+    """
+    Parse a YYYY-MM-DD command line date; end dates cover the whole day.
+    """
+    if not value:
+        return None
+    parsed = datetime.strptime(value, "%Y-%m-%d")
+    return datetime.combine(parsed, datetime.max.time()) if end_of_day else parsed
+
+
+def main(argv=None):
+    """
+    Command line batch search: the same entry point as tceq_cli.py, kept so
+    existing `python tceq_batch.py` runs keep working.
+    """
+    from tceq_cli import main as cli_main
+
+    return cli_main(argv)
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -0,0 +1,197 @@
+import queue
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from contextlib import contextmanager
+
+from tceq_client import filter_by_date
+from tceq_resilience import TCEQBrowserError, TCEQError, breaker_for, iter_with_retries
+from tceq_selenium_client import TCEQSeleniumClient
+
+
+class BrowserPool:
+    """
+    Long-lived pool of warm TCEQSeleniumClient instances.
+
+    Browsers are started lazily up to `size` and handed out with `acquire()`.
+    On release each browser is reset to the search form on a background
+    thread, so neither the releasing caller nor the next job waits for the
+    navigation; it rejoins the idle queue once the reset is done. `acquire()`
+    raises TimeoutError when no browser frees up within `acquire_timeout`
+    seconds. A browser is recycled (quit and replaced on next demand)
+    after `max_uses` jobs, when a job fails because of the browser (a
+    TCEQBrowserError or any non-TCEQError exception), or when its health
+    check fails.
+    With a SearchCache, cached searches are answered without borrowing a browser.
+    Searches that hit a TCEQ outage are retried with retry_policy (default:
+    DEFAULT_RETRY_POLICY) behind the shared circuit breaker.
+    `client_factory` builds the browsers (default: TCEQSeleniumClient).
+    Their page loads are paced by `governor` (default: default_governor()).
+    """
+
+    def __init__(self, size=2, max_uses=50, headless=True, acquire_timeout=300, cache=None, base_url=None,
+                 lean=True, debug=None, client_factory=None, retry_policy=None, governor=None):
+        self.size = size
+        self.max_uses = max_uses
+        self.headless = headless
+        self.acquire_timeout = acquire_timeout
+        self.cache = cache
+        self.base_url = base_url
+        # Browser profile options passed to every TCEQSeleniumClient
+        self.lean = lean
+        self.debug = debug
+        self.governor = governor
+        self._idle = queue.LifoQueue()
+        self._lock = threading.Lock()
+        self._created = 0
+        self._uses = {}
+        self._closed = False
+        self.client_factory = client_factory
+        self.retry_policy = retry_policy
+        # Resets run here, off the caller's thread; at most one per browser at a time
+        self._resetter = ThreadPoolExecutor(max_workers=size, thread_name_prefix="tceq-browser-reset")
+
+    def _new_client(self):
+        if self.client_factory:
+            client = self.client_factory()
+        else:
+            client = TCEQSeleniumClient(headless=self.headless, base_url=self.base_url, lean=self.lean,
+                                        debug=self.debug, governor=self.governor)
+        with self._lock:
+            self._uses[id(client)] = 0
+        return client
+
+    def _discard(self, client):
+        with self._lock:
+            self._uses.pop(id(client), None)
+        try:
+            client.close()
+        except Exception as e:
+            print(f"Error closing pooled browser: {e}")
+        with self._lock:
+            self._created -= 1
+
+    def _checkout(self):
+        while True:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                with self._lock:
+                    can_create = self._created < self.size
+                    if can_create:
+                        self._created += 1
+                if can_create:
+                    try:
+                        return self._new_client()
+                    except Exception:
+                        with self._lock:
+                            self._created -= 1
+                        raise
+                try:
+                    client = self._idle.get(timeout=self.acquire_timeout)
+                except queue.Empty:
+                    raise TimeoutError(f"No pooled browser became free within {self.acquire_timeout}s; "
+                                       f"all {self.size} are busy.") from None
+
+            if client.is_healthy():
+                return client
+            print("Pooled browser failed health check, recycling.")
+            self._discard(client)
+
+    def _checkin(self, client, failed):
+        with self._lock:
+            uses = self._uses[id(client)] = self._uses.get(id(client), 0) + 1
+        if failed or self._closed or uses >= self.max_uses:
+            self._discard(client)
+            return
+        try:
+            self._resetter.submit(self._reset, client)
+        except RuntimeError:
+            # The pool was closed while this browser was out
+            self._discard(client)
+
+    def _reset(self, client):
+        try:
+            client.reset()
+        except Exception as e:
+            print(f"Could not reset pooled browser, recycling: {e}")
+            self._discard(client)
+            return
+        if self._closed:
+            self._discard(client)
+            return
+        self._idle.put(client)
+
+    @contextmanager
+    def acquire(self):
+        """
+        Borrow a browser for one job:
+
+            with pool.acquire() as client:
+                results = client.search(rn)
+        """
+        if self._closed:
+            raise RuntimeError("BrowserPool is closed")
+        client = self._checkout()
+        failed = False
+        try:
+            yield client
+        except TCEQBrowserError:
+            failed = True
+            raise
+        except TCEQError:
+            # The browser worked; the server or page was the problem
+            raise
+        except Exception:
+            failed = True
+            raise
+        finally:
+            self._checkin(client, failed)
+
+    def _search_all(self, rn_number, progress=None):
+        with self.acquire() as client:
+            return client.fetch_all(rn_number, progress, self.retry_policy)
+
+    def search(self, rn_number, start_date=None, end_date=None, refresh=False, progress=None):
+        if self.cache:
+            key = self.cache.make_key(rn_number, TCEQSeleniumClient.RECORD_SERIES, TCEQSeleniumClient.KEYWORD, TCEQSeleniumClient.SORT)
+            results = self.cache.fetch(key, lambda: self._search_all(rn_number, progress), refresh)
+        else:
+            results = self._search_all(rn_number, progress)
+        
+        return filter_by_date(results, start_date, end_date)
+
+    def iter_search(self, rn_number, start_date=None, end_date=None, refresh=False, progress=None):
+        """
+        Streaming search(): yields filtered rows page by page. A browser is
+        only borrowed on a cache miss, and is returned as soon as the
+        iteration finishes or is abandoned. As in search(), an outage is
+        retried behind the circuit breaker (with a freshly borrowed browser)
+        until the first page arrives; after that an error propagates.
+        """
+        def iter_pages():
+            return iter_with_retries(lambda: self._iter_pages(rn_number, progress), self.retry_policy,
+                                     breaker_for(self.base_url or TCEQSeleniumClient.BASE_URL),
+                                     f"Browser search for {rn_number}")
+
+        if self.cache:
+            key = self.cache.make_key(rn_number, TCEQSeleniumClient.RECORD_SERIES, TCEQSeleniumClient.KEYWORD, TCEQSeleniumClient.SORT)
+            pages = self.cache.stream(key, iter_pages, refresh)
+        else:
+            pages = iter_pages()
+        for rows in pages:
+            yield filter_by_date(rows, start_date, end_date)
+
+    def _iter_pages(self, rn_number, progress=None):
+        with self.acquire() as client:
+            yield from client._iter_pages(rn_number, progress)
+
+    def close(self):
+        self._closed = True
+        # Browsers still resetting are discarded by _reset once it sees the pool closed
+        self._resetter.shutdown(wait=True)
+        while True:
+            try:
+                client = self._idle.get_nowait()
+            except queue.Empty:
+                break
+            self._discard(client)
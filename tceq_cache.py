@@ -0,0 +1,178 @@
+import json
+import sqlite3
+import threading
+import time
+
+from tceq_metrics import METRICS
+from tceq_records import ResultRecord
+from tceq_resilience import TCEQError
+
+DEFAULT_CACHE_PATH = "tceq_cache.sqlite3"
+
+
+class SearchCache:
+    """
+    Persistent on-disk cache of search results, stored in SQLite.
+
+    Entries are keyed by (RN, record series, keyword, sort) and hold the
+    result list before end-date filtering, so any end date can be served from
+    one entry. A search narrowed server-side to documents checked in since a
+    start date stores that date with its entry (`since`); the entry then
+    serves searches from that date or later, while a full-history entry
+    serves every search.
+    Entries older than `ttl` seconds are stale; empty results go stale after
+    `empty_ttl`, so a transient empty page or a layout change is not served
+    for a whole day. The least recently used entries are evicted once more
+    than `max_entries` are stored.
+    An expired entry is refetched in full: TCEQ offers no validators
+    (ETag/Last-Modified) to refresh it conditionally. A stale entry is only
+    served when the refetch fails (see fetch()).
+    """
+
+    def __init__(self, path=DEFAULT_CACHE_PATH, ttl=24 * 3600, max_entries=1000, empty_ttl=15 * 60):
+        self.path = path
+        self.ttl = ttl
+        self.empty_ttl = empty_ttl
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS search_results ("
+            " key TEXT PRIMARY KEY,"
+            " results TEXT NOT NULL,"
+            " fetched_at REAL NOT NULL,"
+            " accessed_at REAL NOT NULL,"
+            " since TEXT)"
+        )
+        columns = [row[1] for row in self._conn.execute("PRAGMA table_info(search_results)")]
+        if "since" not in columns:
+            # Caches created before entries recorded their start date hold full histories
+            self._conn.execute("ALTER TABLE search_results ADD COLUMN since TEXT")
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_accessed_at ON search_results (accessed_at)")
+        self._conn.commit()
+
+    @staticmethod
+    def make_key(rn_number, record_series, keyword, sort):
+        return json.dumps([rn_number.strip().upper(), record_series, keyword, list(sort)])
+
+    @staticmethod
+    def _since(start_date):
+        return start_date.strftime('%Y-%m-%d') if start_date else None
+
+    def get(self, key, allow_stale=False, start_date=None):
+        """
+        Return the cached results for key, or None on a miss. An entry
+        narrowed to a later start date than start_date is a miss.
+        Stale entries are only returned when allow_stale is set.
+        """
+        now = time.time()
+        since = self._since(start_date)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT results, fetched_at, since FROM search_results WHERE key = ?", (key,)
+            ).fetchone()
+            if row is None:
+                return None
+            results, fetched_at, entry_since = row
+            if entry_since is not None and (since is None or entry_since > since):
+                return None
+            ttl = self.ttl
+            if results == "[]" and self.empty_ttl is not None:
+                ttl = self.empty_ttl if ttl is None else min(ttl, self.empty_ttl)
+            if not allow_stale and ttl is not None and now - fetched_at > ttl:
+                return None
+            self._conn.execute("UPDATE search_results SET accessed_at = ? WHERE key = ?", (now, key))
+            self._conn.commit()
+        return [ResultRecord.from_dict(doc) for doc in json.loads(results)]
+
+    def put(self, key, results, start_date=None):
+        """
+        Store results for key; start_date is the date the search was narrowed
+        to server-side, None for a full history.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.execute(
+                "INSERT OR REPLACE INTO search_results (key, results, fetched_at, accessed_at, since)"
+                " VALUES (?, ?, ?, ?, ?)",
+                (key, json.dumps([dict(doc) for doc in results]), now, now, self._since(start_date))
+            )
+            # LRU bound: keep only the most recently accessed entries
+            self._conn.execute(
+                "DELETE FROM search_results WHERE key NOT IN ("
+                " SELECT key FROM search_results ORDER BY accessed_at DESC LIMIT ?)",
+                (self.max_entries,)
+            )
+            self._conn.commit()
+
+    def fetch(self, key, fetch_fn, refresh=False, start_date=None):
+        """
+        Return cached results for key, calling fetch_fn() on a miss, expiry or refresh.
+        start_date is the date fetch_fn narrows its search to (see get() and put()).
+        If fetch_fn raises TCEQError (e.g. the server is down), a stale entry is
+        served when one exists; otherwise the error propagates.
+        """
+        if not refresh:
+            cached = self.get(key, start_date=start_date)
+            if cached is not None:
+                print("Serving search results from cache.")
+                METRICS.inc("tceq_cache_requests_total", result="hit")
+                return cached
+        METRICS.inc("tceq_cache_requests_total", result="refresh" if refresh else "miss")
+
+        try:
+            results = fetch_fn()
+        except TCEQError as e:
+            stale = self.get(key, allow_stale=True, start_date=start_date)
+            if stale is None:
+                raise
+            print(f"Live search failed ({e}), serving stale cached results.")
+            METRICS.inc("tceq_cache_requests_total", result="stale")
+            return stale
+
+        self.put(key, results, start_date)
+        return results
+
+    def stream(self, key, iter_fn, refresh=False, start_date=None):
+        """
+        Streaming fetch(): yields lists of results. A cached entry is yielded
+        as one list; otherwise the lists from iter_fn() are passed through as
+        they arrive and cached once the iterator is exhausted. An abandoned
+        iteration caches nothing. A TCEQError raised before anything was
+        yielded falls back to a stale entry, as in fetch(). start_date is as
+        in fetch().
+        """
+        if not refresh:
+            cached = self.get(key, start_date=start_date)
+            if cached is not None:
+                print("Serving search results from cache.")
+                METRICS.inc("tceq_cache_requests_total", result="hit")
+                yield cached
+                return
+        METRICS.inc("tceq_cache_requests_total", result="refresh" if refresh else "miss")
+
+        results = []
+        try:
+            for chunk in iter_fn():
+                results.extend(chunk)
+                yield chunk
+        except TCEQError as e:
+            stale = self.get(key, allow_stale=True, start_date=start_date) if not results else None
+            if stale is None:
+                raise
+            print(f"Live search failed ({e}), serving stale cached results.")
+            METRICS.inc("tceq_cache_requests_total", result="stale")
+            yield stale
+            return
+
+        self.put(key, results, start_date)
+
+    def clear(self):
+        with self._lock:
+            self._conn.execute("DELETE FROM search_results")
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
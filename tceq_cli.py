@@ -0,0 +1,132 @@
+"""
+Headless entry point for unattended bulk runs (cron, batch clusters).
+
+Reads an RN list and date range, searches every RN and writes the results as
+JSON lines, CSV or Parquet:
+
+    python tceq_cli.py rns.txt --start-date 2020-01-01 --output results.csv
+
+Nothing beyond the standard library is imported until the arguments are
+parsed, and Selenium only when a browser engine is chosen, so --help and
+argument errors are instant. --shard i/n runs only the RNs of shard i (0 to
+n-1), so one RN list can be split across processes or machines:
+
+    for i in 0 1 2 3; do python tceq_cli.py rns.txt --shard $i/4 --output part$i.jsonl & done
+
+An RN always lands in the same shard however the list is ordered or grown.
+The exit status is 1 if any RN failed, 0 otherwise.
+"""
+import argparse
+import sys
+import zlib
+
+ENGINES = ("http", "auto", "selenium", "async")
+
+
+def parse_shard(value):
+    """
+    Parse an 'i/n' shard spec into (i, n), with 0 <= i < n.
+    """
+    try:
+        index, count = (int(part) for part in value.split("/"))
+    except ValueError:
+        raise argparse.ArgumentTypeError(f"Shard must look like i/n, got {value!r}")
+    if count < 1 or not 0 <= index < count:
+        raise argparse.ArgumentTypeError(f"Shard index must be between 0 and {count - 1}, got {value!r}")
+    return index, count
+
+
+def in_shard(rn_number, shard):
+    """
+    Whether rn_number belongs to shard (i, n). CRC32 is stable across
+    processes and machines, unlike the built-in hash().
+    """
+    index, count = shard
+    return zlib.crc32(rn_number.encode("utf-8")) % count == index
+
+
+def build_parser():
+    parser = argparse.ArgumentParser(description="Search TCEQ Technical Reviews for a list of RNs without the web app.")
+    parser.add_argument("rn_file", help="File with one RN per line ('-' for stdin)")
+    parser.add_argument("--start-date", help="YYYY-MM-DD")
+    parser.add_argument("--end-date", help="YYYY-MM-DD")
+    parser.add_argument("--output", default="-", help="Output file ('-' for stdout, the default)")
+    parser.add_argument("--format", choices=("jsonl", "csv", "parquet"),
+                        help="Output format (default: from the --output extension; JSON lines on stdout)")
+    parser.add_argument("--shard", type=parse_shard, help="Only search shard i of n of the RN list, e.g. 0/4")
+    parser.add_argument("--engine", choices=ENGINES, default="http",
+                        help="http: HTTP client only; auto: HTTP with browser fallback; selenium: browser only; "
+                             "async: HTTP/2 client on one event loop, --workers searches at once")
+    parser.add_argument("--browsers", type=int, default=2, help="Browser pool size for the auto/selenium engines")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--max-per-host", type=int, default=4)
+    parser.add_argument("--rps", type=float,
+                        help="Cap this run at this many requests per second (default: the shared adaptive rate)")
+    # tceq_cache.DEFAULT_CACHE_PATH, spelled out to keep tceq_cache out of startup
+    parser.add_argument("--cache", default="tceq_cache.sqlite3", help="SQLite search cache path ('' to disable)")
+    parser.add_argument("--cache-ttl", type=float, default=24, help="Cache TTL in hours")
+    parser.add_argument("--refresh", action="store_true", help="Bypass cached results and re-fetch")
+    parser.add_argument("--metrics-file", help="Write Prometheus metrics here when done (textfile collector)")
+    return parser
+
+
+def main(argv=None):
+    args = build_parser().parse_args(argv)
+
+    # Heavy imports only once the arguments are known to be valid
+    from tceq_batch import AsyncBatchRunner, TCEQBatchRunner, parse_date_arg, read_rn_list
+    from tceq_cache import SearchCache
+    from tceq_http import governor_path, shared_governor
+    from tceq_metrics import METRICS
+    from tceq_records import open_writer
+
+    if args.rn_file == "-":
+        rns = read_rn_list(sys.stdin)
+    else:
+        with open(args.rn_file) as f:
+            rns = read_rn_list(f)
+    if args.shard:
+        rns = [rn for rn in rns if in_shard(rn, args.shard)]
+        print(f"Shard {args.shard[0]}/{args.shard[1]}: {len(rns)} RNs.", file=sys.stderr)
+
+    start_date = parse_date_arg(args.start_date)
+    end_date = parse_date_arg(args.end_date, end_of_day=True)
+
+    cache = SearchCache(args.cache, ttl=args.cache_ttl * 3600) if args.cache else None
+    # Kept beside the cache, so shards run from one directory share one adaptive rate
+    governor = shared_governor(governor_path(args.cache or None))
+    browser_pool = None
+    if args.engine in ("auto", "selenium"):
+        from tceq_browser_pool import BrowserPool
+
+        browser_pool = BrowserPool(size=args.browsers, headless=True, cache=cache, governor=governor)
+    if args.engine == "async":
+        runner = AsyncBatchRunner(args.workers, args.max_per_host, args.rps, cache=cache, governor=governor)
+    else:
+        runner = TCEQBatchRunner(args.workers, args.max_per_host, args.rps, cache=cache,
+                                 browser_pool=browser_pool, use_http=args.engine != "selenium", governor=governor)
+
+    writer = open_writer(args.output, args.format)
+    failed = []
+    total = 0
+    try:
+        for rn, results, error in runner.iter_results(rns, start_date, end_date, args.refresh):
+            if error:
+                failed.append(rn)
+            print(f"{rn}: {len(results)} documents", file=sys.stderr)
+            writer.write([doc.with_rn(rn) for doc in results])
+            total += len(results)
+    finally:
+        runner.close()
+        writer.close()
+        if browser_pool is not None:
+            browser_pool.close()
+        if args.metrics_file:
+            METRICS.write_prometheus(args.metrics_file)
+
+    print(f"{total} documents across {len(rns)} RNs ({len(failed)} failed).", file=sys.stderr)
+    return 1 if failed else 0
+
+
+if __name__ == "__main__":
+    sys.exit(main())
@@ -1,16 +1,104 @@
+import threading
+import time
 import requests
-from bs4 import BeautifulSoup
-from datetime import datetime
-import urllib.parse
+from concurrent.futures import ThreadPoolExecutor
+from tceq_http import USER_AGENT, PooledSession
+from tceq_metrics import METRICS, propagate, span
+from tceq_resilience import TCEQError, TCEQLayoutError
+from tceq_parser import parse_hidden_inputs, parse_results_page
+from tceq_records import ResultRecord, parse_doc_date
+
+def doc_date(doc):
+    """
+    The parsed date of a result: precomputed on a ResultRecord, parsed for a plain dict.
+    """
+    if isinstance(doc, ResultRecord):
+        return doc.doc_date
+    return parse_doc_date(doc.get('date'))
+
+def filter_by_date(results, start_date=None, end_date=None):
+    """
+    Client-side date filtering shared by both clients.
+    Documents without a parseable date are kept (safe default).
+    """
+    if not start_date and not end_date:
+        return list(results)
+    
+    filtered_results = []
+    for doc in results:
+        date = doc_date(doc)
+        if date:
+            if start_date and date < start_date:
+                continue
+            if end_date and date > end_date:
+                continue
+        filtered_results.append(doc)
+    return filtered_results
+
+def date_query_clause(start_date):
+    """
+    Universal QueryText clause restricting the search to documents checked in
+    on or after start_date. Only the lower bound is pushed to the server: a
+    document is checked in after its own date, so dInDate >= start_date never
+    drops a match, while an upper bound on dInDate could.
+    """
+    return f"dInDate >= `{start_date.strftime('%m/%d/%Y')}`"
+
+class SearchFormParams:
+    """
+    Hidden inputs scraped from the TCEQ_SEARCH form, cached with an expiry.
+    One instance belongs to one session (the fields may be tied to its
+    cookies) and is shared by every thread searching on it: the first search
+    fetches the form, concurrent searches wait for that fetch instead of
+    repeating it, and later searches reuse the cached values until they
+    expire or a search is rejected.
+    """
+
+    def __init__(self, ttl=30 * 60):
+        self.ttl = ttl
+        self._lock = threading.Lock()
+        self._params = None
+        self._fetched_at = 0.0
+
+    def get(self, fetch_fn):
+        with self._lock:
+            if self._params is None or time.monotonic() - self._fetched_at > self.ttl:
+                params = fetch_fn()
+                # Don't cache a failed bootstrap
+                if not params:
+                    return {}
+                self._params = params
+                self._fetched_at = time.monotonic()
+            return dict(self._params)
+
+    def invalidate(self):
+        with self._lock:
+            self._params = None
 
 class TCEQClient:
     BASE_URL = "https://records.tceq.texas.gov/cs/idcplg"
+    PAGE_SIZE = 200
+    MAX_PAGES = 100
+    RECORD_SERIES = "1081" # AIR / New Source Review Permit
+    KEYWORD = "Technical Review"
+    SORT = ("dInDate", "Desc")
     
-    def __init__(self):
-        self.session = requests.Session()
+    def __init__(self, session=None, page_workers=4, cache=None, form_params=None, base_url=None):
+        # base_url points the client at another server, e.g. the local replay server
+        if base_url:
+            self.BASE_URL = base_url
+        # A shared PooledSession can be passed in so batch workers reuse connections;
+        # PooledSession also retries transient failures behind the circuit breaker
+        self.session = session or PooledSession()
         self.session.headers.update({
-            "User-Agent": "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"
+            "User-Agent": USER_AGENT
         })
+        # Worker threads used to fetch result pages 2..N concurrently
+        self.page_workers = page_workers
+        # Optional SearchCache shared with other clients
+        self.cache = cache
+        # Cached search form hidden fields, optionally shared with other clients on the same session
+        self.form_params = form_params or SearchFormParams()
 
     def _get_search_params(self):
         """
@@ -18,152 +106,288 @@ class TCEQClient:
         Returns a dictionary of parameters.
         """
         try:
-            response = self.session.get(f"{self.BASE_URL}?IdcService=TCEQ_SEARCH")
-            response.raise_for_status()
-            soup = BeautifulSoup(response.content, 'html.parser')
-            
-            params = {}
-            # Extract all hidden inputs
-            for input_tag in soup.find_all('input', type='hidden'):
-                if input_tag.get('name') and input_tag.get('value'):
-                    params[input_tag['name']] = input_tag['value']
+            with span("form_bootstrap", client="http"):
+                response = self.session.get(f"{self.BASE_URL}?IdcService=TCEQ_SEARCH")
+                response.raise_for_status()
+                METRICS.inc("tceq_response_bytes_total", len(response.content), client="http")
+                # Extract all hidden inputs
+                params = parse_hidden_inputs(response.content)
             
             # Ensure we have essential ones, if not, set defaults based on browser findings
             if 'IdcService' not in params:
                 params['IdcService'] = 'TCEQ_PERFORM_SEARCH' 
             
             return params
+        except TCEQError:
+            raise
         except Exception as e:
             print(f"Error initializing search session: {e}")
             return {}
 
-    def search_technical_reviews(self, rn_number, start_date=None, end_date=None):
+    def search_technical_reviews(self, rn_number, start_date=None, end_date=None, refresh=False):
         """
-        Search for Technical Review documents using TCEQ_PERFORM_SEARCH service and client-side filtering.
+        Search for Technical Review documents using TCEQ_PERFORM_SEARCH service.
+        start_date is pushed into the query as a check-in date clause, so TCEQ
+        only returns (and pages through) documents checked in since then; both
+        bounds are still re-checked client-side against the document date.
+        With a cache configured, results come from it unless expired or refresh is set.
+        Raises a TCEQError subclass if the search fails, so an outage is never
+        mistaken for "no documents".
         """
-        # Get baseParams from the search page
-        search_params = self._get_search_params()
+        with span("search", client="http", rn=rn_number):
+            if self.cache:
+                key = self.cache.make_key(rn_number, self.RECORD_SERIES, self.KEYWORD, self.SORT)
+                all_results = self.cache.fetch(key, lambda: self._fetch_all(rn_number, start_date), refresh, start_date)
+            else:
+                all_results = self._fetch_all(rn_number, start_date)
+            
+            with span("filter", client="http"):
+                return filter_by_date(all_results, start_date, end_date)
+
+    def iter_search(self, rn_number, start_date=None, end_date=None, refresh=False):
+        """
+        Streaming search_technical_reviews: yields the filtered rows of each
+        result page as soon as it arrives, in result order, so the first rows
+        can be shown after one page load. Pages 2..N are still fetched
+        concurrently. A cached search is yielded in one piece; a live one is
+        cached once every page has arrived.
+        """
+        if self.cache:
+            key = self.cache.make_key(rn_number, self.RECORD_SERIES, self.KEYWORD, self.SORT)
+            pages = self.cache.stream(key, lambda: self._iter_all(rn_number, start_date), refresh, start_date)
+        else:
+            pages = self._iter_all(rn_number, start_date)
+        for rows in pages:
+            yield filter_by_date(rows, start_date, end_date)
+
+    @classmethod
+    def search_form_data(cls, hidden_params, rn_number, start_date=None):
+        """
+        TCEQ_PERFORM_SEARCH form data for an RN, on top of the search form's hidden fields.
+        With start_date, a dInDate clause is added to QueryText.
+        """
+        search_params = dict(hidden_params)
         
         # Override/Add specific search criteria
         search_params.update({
             "IdcService": "TCEQ_PERFORM_SEARCH",
-            "xRecordSeries": "1081", # AIR / New Source Review Permit
+            "xRecordSeries": cls.RECORD_SERIES,
             "select0": "xRefNumTxt",
             "input0": rn_number,
-            "ftx": "Technical Review",
-            "SortField": "dInDate",
-            "SortOrder": "Desc",
-            "ResultCount": 200,
+            "ftx": cls.KEYWORD,
+            "SortField": cls.SORT[0],
+            "SortOrder": cls.SORT[1],
+            "ResultCount": cls.PAGE_SIZE,
             # Ensure these are present if scraping missed them
             "SearchQueryFormat": "Universal", 
             "IsExternalSearch": "1"
         })
+        if start_date:
+            clause = date_query_clause(start_date)
+            query_text = search_params.get("QueryText")
+            search_params["QueryText"] = f"{query_text} <AND> {clause}" if query_text else clause
+        return search_params
+
+    def _build_search_params(self, rn_number, start_date=None):
+        """
+        Build the TCEQ_PERFORM_SEARCH form data and request headers for an RN.
+        """
+        # Get baseParams from the search page (cached between searches)
+        search_params = self.search_form_data(self.form_params.get(self._get_search_params), rn_number, start_date)
         
         # Add Referer header which is often required for search actions
         headers = {
             "Referer": f"{self.BASE_URL}?IdcService=TCEQ_SEARCH"
         }
-        
-        try:
-            response = self.session.post(self.BASE_URL, data=search_params, headers=headers)
-            response.raise_for_status()
-            
-            all_results = self._parse_results(response.content)
+        return search_params, headers
+
+    def _submit_search(self, rn_number, start_date=None):
+        """
+        POST the search and parse the first results page.
+        If the server rejects the search (client error, or a page with neither a
+        results table nor a no-results message), the cached form parameters are
+        refetched and the search is retried once.
+        Returns (search_params, headers, first_page).
+        """
+        for attempt in range(2):
+            search_params, headers = self._build_search_params(rn_number, start_date)
+            try:
+                with span("submit", client="http", attempt=attempt + 1):
+                    first_page = self._parse_page(self._fetch_page("POST", search_params, headers))
+            except requests.HTTPError as e:
+                status = e.response.status_code if e.response is not None else None
+                if attempt or status is None or not 400 <= status < 500:
+                    raise
+            else:
+                if first_page['has_table'] or first_page['no_results']:
+                    return search_params, headers, first_page
+                if attempt:
+                    raise TCEQLayoutError("TCEQ returned a page without a results table; the search page layout may have changed.")
             
-            # Client-side Date Filtering
-            filtered_results = []
-            for doc in all_results:
-                if not doc.get('date'):
-                    filtered_results.append(doc)
-                    continue
-                    
-                try:
-                    # Date format is typically MM/DD/YYYY
-                    doc_date = datetime.strptime(doc['date'], '%m/%d/%Y')
-                    
-                    if start_date and doc_date < start_date:
-                        continue
-                    if end_date and doc_date > end_date:
-                        continue
-                        
-                    filtered_results.append(doc)
-                    
-                except ValueError:
-                    # If date parse fails, include it (safe default) or log warning
-                    filtered_results.append(doc)
+            print("Search was rejected, refreshing search form parameters...")
+            self.form_params.invalidate()
+
+    def _fetch_all(self, rn_number, start_date=None):
+        """
+        Run the search and return every result row across all pages, unfiltered.
+        With start_date, the search is narrowed server-side to documents
+        checked in since then.
+        Raises a TCEQError subclass if the search failed.
+        """
+        return [row for rows in self._iter_all(rn_number, start_date) for row in rows]
+
+    def _iter_all(self, rn_number, start_date=None):
+        """
+        Yield the unfiltered rows of every result page in order; see _fetch_all.
+        """
+        try:
+            search_params, headers, first_page = self._submit_search(rn_number, start_date)
+            self.check_first_page(first_page)
             
-            return filtered_results
+            yield first_page['rows']
+            yield from self._iter_remaining_pages(search_params, first_page, headers)
 
-        except Exception as e:
-            print(f"Error executing search: {e}")
-            return []
+        except requests.RequestException as e:
+            raise TCEQError(f"Search request failed: {e}") from e
 
-    def _parse_results(self, content):
-        soup = BeautifulSoup(content, 'html.parser')
-        results = []
-        
-        # TCEQ results are usually in a table. We need to identify the correct table.
-        # Often it involves looking for specific headers or iterating through rows.
+    def iter_pages(self, rn_number):
+        """
+        Yield the unfiltered rows of each result page in order, one request at a time.
+        Results are sorted newest first, so callers can stop iterating as soon as
+        they have what they need and no further pages are requested.
+        Request errors are raised to the caller.
+        """
+        search_params, headers, paging = self._submit_search(rn_number)
+        self.check_first_page(paging)
+        yield paging['rows']
         
-        # Helper to find the table with results
-        # This is heuristic based on standard Oracle Content Server layouts
-        tables = soup.find_all('table')
-        result_table = None
-        for table in tables:
-            if table.find('th') and "Title" in table.get_text():
-                result_table = table
+        page_num = 1
+        while page_num < self.MAX_PAGES:
+            if paging['next_params']:
+                method, params = "GET", paging['next_params']
+            elif paging['total'] and page_num * self.PAGE_SIZE < paging['total']:
+                start_row = page_num * self.PAGE_SIZE + 1
+                method, params = "POST", dict(search_params, StartRow=start_row, EndRow=start_row + self.PAGE_SIZE - 1)
+            else:
+                break
+            
+            page_num += 1
+            print(f"Fetching result page {page_num}...")
+            paging = self._parse_page(self._fetch_page(method, params, headers))
+            if paging['no_results']:
                 break
+            self.check_page(paging, page_num)
+            yield paging['rows']
+
+    def _fetch_page(self, method, params, headers):
+        with span("page_load", client="http", start_row=params.get("StartRow", 1)):
+            if method == "GET":
+                response = self.session.get(self.BASE_URL, params=params, headers=headers)
+            else:
+                response = self.session.post(self.BASE_URL, data=params, headers=headers)
+            response.raise_for_status()
+        METRICS.inc("tceq_response_bytes_total", len(response.content), client="http")
+        return response.content
+
+    @classmethod
+    def has_more_pages(cls, first_page):
+        return first_page['next_params'] is not None or bool(first_page['total'] and first_page['total'] > cls.PAGE_SIZE)
+
+    @classmethod
+    def check_first_page(cls, first_page):
+        """
+        Raise TCEQLayoutError if the first page's table has no rows, or if a
+        single page of results does not hold the total TCEQ reported.
+        """
+        if not first_page['has_table']:
+            return
+        if not first_page['row_count']:
+            raise TCEQLayoutError("The results table has no rows; the page layout may have changed.")
+        total = first_page['total']
+        if not cls.has_more_pages(first_page) and total is not None and first_page['row_count'] != total:
+            raise TCEQLayoutError(f"Parsed {first_page['row_count']} result rows but TCEQ reported {total}; "
+                                  "the page layout may have changed.")
+
+    @staticmethod
+    def check_page(page, page_num):
+        """
+        Raise TCEQLayoutError if result page page_num (2..N) has no results
+        table, or an empty one.
+        """
+        if not page['has_table'] or not page['row_count']:
+            raise TCEQLayoutError(f"Result page {page_num} has no results table rows; the page layout may have changed.")
+
+    @staticmethod
+    def check_row_count(row_count, total):
+        """
+        Raise TCEQLayoutError if the rows parsed across every page do not add
+        up to the total TCEQ reported.
+        """
+        if row_count != total:
+            raise TCEQLayoutError(f"Parsed {row_count} result rows but TCEQ reported {total}; the page layout may have changed.")
+
+    def _iter_remaining_pages(self, search_params, first_page, headers):
+        """
+        Fetch result pages 2..N, given the parsed first page, yielding each
+        page's rows in order as soon as it and the pages before it arrive.
+        When the total row count is known, every remaining page is requested
+        concurrently by StartRow/EndRow, page_workers at a time. Otherwise the
+        "Link To More Results" links are followed one page at a time.
+        Either way, a page without a results table (or with an empty one), or
+        a row count that does not add up to the reported total, raises
+        TCEQLayoutError, so a layout change is never mistaken for a short list.
+        """
+        paging = first_page
+        if not self.has_more_pages(paging):
+            return
         
-        if not result_table:
-            # Fallback: Look for rows directly if table structure is messy
-            rows = soup.find_all('tr')
+        # Prefer the server's own next-page query string; fall back to re-posting the search
+        if paging['next_params']:
+            method, base_params = "GET", paging['next_params']
         else:
-            rows = result_table.find_all('tr')
-
-        for row in rows:
-            # Skip header rows
-            if row.find('th'):
-                continue
-                
-            cells = row.find_all('td')
-            if not cells:
-                continue
-                
-            # We need to extract: Title, Content ID (for link), Date
-            # The column order might vary, so we look for links and text
+            method, base_params = "POST", search_params
+        
+        if paging['total']:
+            total = min(paging['total'], self.PAGE_SIZE * self.MAX_PAGES)
+            page_params = []
+            for start_row in range(self.PAGE_SIZE + 1, total + 1, self.PAGE_SIZE):
+                params = dict(base_params)
+                params.update({
+                    "StartRow": start_row,
+                    "EndRow": min(start_row + self.PAGE_SIZE - 1, total),
+                    "ResultCount": self.PAGE_SIZE
+                })
+                page_params.append(params)
             
-            text_content = row.get_text(separator=' ', strip=True)
-            if "Technical Review" not in text_content:
-                continue
+            print(f"Fetching {len(page_params)} more result pages ({paging['total']} rows total)...")
+            row_count = paging['row_count']
+            with ThreadPoolExecutor(max_workers=self.page_workers) as executor:
+                contents = executor.map(propagate(lambda params: self._fetch_page(method, params, headers)), page_params)
+                # executor.map keeps page order, so results stay sorted
+                for page_num, content in enumerate(contents, start=2):
+                    page = self._parse_page(content)
+                    self.check_page(page, page_num)
+                    row_count += page['row_count']
+                    yield page['rows']
+            self.check_row_count(row_count, total)
+            return
+        
+        # Total unknown: follow next links serially
+        next_params = paging['next_params']
+        page_num = 1
+        while next_params and page_num < self.MAX_PAGES:
+            page_num += 1
+            print(f"Fetching result page {page_num}...")
+            page = self._parse_page(self._fetch_page("GET", next_params, headers))
+            if page['no_results']:
+                break
+            self.check_page(page, page_num)
+            yield page['rows']
+            next_params = page['next_params']
 
-            doc_info = {}
-            
-            # Extract Link and Content ID
-            link_tag = row.find('a', href=True)
-            if link_tag:
-                href = link_tag['href']
-                doc_info['url'] = urllib.parse.urljoin(self.BASE_URL, href)
-                doc_info['title'] = link_tag.get_text(strip=True)
-                
-                # Extract dID if possible for robust linking
-                # href usually looks like ...?IdcService=GET_FILE&dID=12345...
-                parsed_url = urllib.parse.urlparse(href)
-                params = urllib.parse.parse_qs(parsed_url.query)
-                if 'dID' in params:
-                    doc_info['dID'] = params['dID'][0]
-            
-            # Try to find date
-            # It's usually in one of the cells. We can match a regex or just take the last cell often.
-            # For now, let's just store the full text row as snippet if we can't parse perfectly
-            doc_info['raw_text'] = text_content
-            
-            # Heuristic for date: look for MM/DD/YYYY format in cells
-            import re
-            date_match = re.search(r'\d{1,2}/\d{1,2}/\d{2,4}', text_content)
-            if date_match:
-                doc_info['date'] = date_match.group(0)
-            
-            if 'url' in doc_info:
-                results.append(doc_info)
-                
-        return results
+    def _parse_page(self, content):
+        with span("parse", client="http"):
+            page = parse_results_page(content, self.BASE_URL, self.KEYWORD)
+        METRICS.inc("tceq_pages_total", client="http")
+        METRICS.inc("tceq_rows_total", len(page['rows']), client="http")
+        return page
@@ -0,0 +1,233 @@
+import hashlib
+import mimetypes
+import os
+import re
+import tempfile
+import urllib.parse
+import zipfile
+from concurrent.futures import ThreadPoolExecutor, as_completed
+
+from tceq_http import PooledSession
+from tceq_metrics import METRICS, propagate, span
+
+CHUNK_SIZE = 64 * 1024
+PART_SUFFIX = ".part"
+
+FILENAME_RE = re.compile(r'filename\*?=(?:UTF-8\'\')?"?([^";]+)"?', re.IGNORECASE)
+
+
+def document_id(doc):
+    """
+    Stable identifier for a search result: its dID, else the dID/dDocName in
+    the url, else a hash of the url.
+    """
+    if doc.get('dID'):
+        return str(doc['dID'])
+    params = urllib.parse.parse_qs(urllib.parse.urlparse(doc.get('url', '')).query)
+    for name in ('dID', 'dDocName'):
+        if params.get(name):
+            return re.sub(r'[^\w.-]', '_', params[name][0])
+    return hashlib.sha1(doc.get('url', '').encode('utf-8')).hexdigest()[:16]
+
+
+def file_extension(response):
+    """
+    Pick a file extension from Content-Disposition, else Content-Type; default .pdf.
+    """
+    match = FILENAME_RE.search(response.headers.get('Content-Disposition', ''))
+    if match:
+        ext = os.path.splitext(urllib.parse.unquote(match.group(1)))[1]
+        if ext:
+            return ext.lower()
+    content_type = response.headers.get('Content-Type', '').split(';')[0].strip()
+    return mimetypes.guess_extension(content_type) or ".pdf"
+
+
+def holds_whole_body(part_path, size, response):
+    """
+    Whether a 416 answer to a Range request means part_path already holds the
+    whole body: the length in its Content-Range ("bytes */N") matches the
+    file, or, when the server sends none, the file at least starts as a PDF.
+    """
+    match = re.match(r'bytes \*/(\d+)', response.headers.get('Content-Range', ''))
+    if match:
+        return int(match.group(1)) == size
+    with open(part_path, "rb") as f:
+        return f.read(4) == b"%PDF"
+
+
+def list_existing(dest_dir):
+    """
+    Map each document id with a completed download in dest_dir to its path,
+    from a single directory listing.
+    """
+    existing = {}
+    for name in os.listdir(dest_dir):
+        if not name.endswith(PART_SUFFIX):
+            existing.setdefault(os.path.splitext(name)[0], os.path.join(dest_dir, name))
+    return existing
+
+
+def find_existing(dest_dir, doc_id):
+    """
+    Return the path of a completed download for doc_id in dest_dir, or None.
+    """
+    prefix = doc_id + "."
+    for name in os.listdir(dest_dir):
+        if name.startswith(prefix) and not name.endswith(PART_SUFFIX):
+            return os.path.join(dest_dir, name)
+    return None
+
+
+class DocumentDownloader:
+    """
+    Downloads search result documents concurrently into dest_dir.
+
+    Files are named by document id (normally the dID), so documents already
+    on disk are skipped. Bodies are streamed to a .part file in chunks and
+    renamed when complete; an interrupted .part file is resumed with an HTTP
+    Range request on the next run.
+
+    With a DocumentIndex, every file iter_download() delivers is added to the
+    full-text index (files already indexed are skipped). With a DocumentStore,
+    documents already in the store are linked into dest_dir instead of
+    downloaded, and new downloads are added to it.
+    """
+
+    def __init__(self, dest_dir="downloads", max_workers=4, session=None, chunk_size=CHUNK_SIZE, timeout=60,
+                 index=None, store=None):
+        self.dest_dir = dest_dir
+        self.index = index
+        self.store = store
+        self.max_workers = max_workers
+        self.session = session or PooledSession(pool_size=max_workers)
+        self.chunk_size = chunk_size
+        self.timeout = timeout
+        os.makedirs(dest_dir, exist_ok=True)
+
+    def existing_path(self, doc_id, existing=None):
+        """
+        Return the path of a completed download for doc_id, or None.
+        existing is a list_existing() listing of dest_dir to look it up in,
+        so bulk downloads list the directory once rather than per document.
+        """
+        if existing is not None:
+            return existing.get(doc_id)
+        return find_existing(self.dest_dir, doc_id)
+
+    def download(self, doc, existing=None):
+        """
+        Download one document and return its local path.
+        """
+        doc_id = document_id(doc)
+        existing = self.existing_path(doc_id, existing)
+        if existing:
+            if self.store is not None:
+                self.store.add(doc_id, existing, doc, doc.get('rn'))
+            return existing
+        if self.store is not None:
+            stored = self.store.checkout(doc_id, self.dest_dir, doc.get('rn'))
+            if stored:
+                return stored
+
+        part_path = os.path.join(self.dest_dir, doc_id + PART_SUFFIX)
+        offset = os.path.getsize(part_path) if os.path.exists(part_path) else 0
+        headers = {"Range": f"bytes={offset}-"} if offset else {}
+
+        written = 0
+        with span("download", client="http", doc_id=doc_id), \
+                self.session.get(doc['url'], headers=headers, stream=True, timeout=self.timeout) as response:
+            if response.status_code == 416:
+                # Requested range not satisfiable: the part file should already hold the whole body
+                if not holds_whole_body(part_path, offset, response):
+                    print(f"Discarding unusable partial download {part_path}")
+                    os.remove(part_path)
+                    return self.download(doc)
+                ext = ".pdf"
+            else:
+                response.raise_for_status()
+                # Servers that ignore Range answer 200 with the full body, so start over
+                mode = "ab" if response.status_code == 206 else "wb"
+                with open(part_path, mode) as f:
+                    for chunk in response.iter_content(chunk_size=self.chunk_size):
+                        if chunk:
+                            f.write(chunk)
+                            written += len(chunk)
+                ext = file_extension(response)
+            final_path = os.path.join(self.dest_dir, doc_id + ext)
+        METRICS.inc("tceq_download_bytes_total", written)
+
+        os.replace(part_path, final_path)
+        if self.store is not None:
+            self.store.add(doc_id, final_path, doc, doc.get('rn'))
+        return final_path
+
+    def _download_and_index(self, doc, existing):
+        path = self.download(doc, existing)
+        if self.index is not None:
+            # Text extraction runs on the download worker; a failure does not fail the download
+            try:
+                self.index.index_document(path, doc)
+            except Exception as e:
+                print(f"Could not index {path}: {e}")
+        return path
+
+    def iter_download(self, results):
+        """
+        Download every result concurrently, yielding (doc, path, error)
+        tuples as each file finishes.
+        """
+        # Several rows can point at the same document
+        unique = {}
+        for doc in results:
+            if doc.get('url'):
+                unique.setdefault(document_id(doc), doc)
+        existing = list_existing(self.dest_dir)
+
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            futures = {executor.submit(propagate(self._download_and_index), doc, existing): doc for doc in unique.values()}
+            for future in as_completed(futures):
+                doc = futures[future]
+                try:
+                    yield doc, future.result(), None
+                except Exception as e:
+                    print(f"Error downloading {doc.get('url')}: {e}")
+                    yield doc, None, e
+
+    def download_all(self, results):
+        """
+        Download every result and return the list of local paths.
+        """
+        return [path for _, path, error in self.iter_download(results) if not error]
+
+
+def zip_name_for(results):
+    """
+    ZIP file name for a result set. The same documents always map to the
+    same name, so rebuilding a ZIP replaces the old one instead of adding
+    another archive to the downloads directory.
+    """
+    doc_ids = sorted({document_id(doc) for doc in results if doc.get('url')})
+    digest = hashlib.sha1("\n".join(doc_ids).encode("utf-8")).hexdigest()[:12]
+    return f"technical_reviews_{digest}.zip"
+
+
+def build_zip(paths, zip_path):
+    """
+    Write files into a ZIP archive one at a time. zipfile copies each file
+    in chunks, so memory use stays flat regardless of archive size.
+    PDFs are already compressed, so entries are stored rather than deflated.
+    The archive is written under a temporary name and renamed when complete,
+    so a concurrent build of the same ZIP never leaves a mixed file behind.
+    """
+    fd, tmp_path = tempfile.mkstemp(suffix=PART_SUFFIX, dir=os.path.dirname(zip_path) or ".")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            with zipfile.ZipFile(f, "w", compression=zipfile.ZIP_STORED, allowZip64=True) as zf:
+                for path in paths:
+                    zf.write(path, arcname=os.path.basename(path))
+        os.replace(tmp_path, zip_path)
+    except BaseException:
+        os.remove(tmp_path)
+        raise
+    return zip_path
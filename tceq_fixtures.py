@@ -0,0 +1,134 @@
+import html
+import urllib.parse
+from datetime import datetime, timedelta
+
+# Column layout of the TCEQ_PERFORM_SEARCH table_0 grid (Title at 12, Begin Date at 14)
+RESULT_COLUMNS = [
+    "", "Select", "Content ID", "Record Series", "Central Registry RN", "Permit Number",
+    "Regulated Entity", "Customer", "County", "Program", "Document Type", "Media",
+    "Title", "Secondary ID", "Begin Date", "End Date",
+]
+
+TITLES = [
+    "Technical Review",
+    "Technical Review - Amendment",
+    "Permit Application",
+    "Draft Permit",
+    "Technical Review - Renewal",
+    "Public Notice",
+]
+
+
+SEARCH_FORM_PAGE = """<html><head><title>TCEQ Records Online</title></head><body>
+<form id="searchForm" method="POST" action="{action}">
+<input type="hidden" name="IdcService" value="TCEQ_PERFORM_SEARCH">
+<input type="hidden" name="accessID" value="replay-access-id">
+<input type="hidden" name="ResultCount" value="20">
+<select id="xRecordSeries" name="xRecordSeries">
+<option value="">-- Select --</option><option value="1081">AIR / New Source Review Permit</option>
+</select>
+<select id="xInsightDocumentType" name="xInsightDocumentType">
+<option value="">-- Select --</option><option value="27">Permits</option>
+</select>
+<select id="select0" name="select0">
+<option value="">-- Select --</option><option value="xRefNumTxt">Central Registry RN</option>
+</select>
+<input type="text" name="input0" class="wideInput">
+<input type="text" name="ftx">
+<button type="submit">Search</button>
+</form></body></html>"""
+
+
+def make_search_form_page(action="/cs/idcplg"):
+    """
+    Render a static stand-in for the TCEQ_SEARCH form with the fields both clients use.
+    """
+    return SEARCH_FORM_PAGE.format(action=action)
+
+
+def make_result_rows(count, rn_number="RN100223445", first_did=5000000, newest=datetime(2024, 6, 1)):
+    """
+    Synthesize result rows sorted newest first, as dicts of the column values
+    used by make_results_page. Rows are sorted by check-in date (dInDate),
+    which runs up to nine days after the document's Begin Date.
+    """
+    rows = []
+    for i in range(count):
+        did = first_did + count - i
+        begin = newest - timedelta(days=7 * i)
+        checked_in = begin + timedelta(days=3 * (i % 4))
+        rows.append({
+            "dID": did,
+            "content_id": f"{did}",
+            "rn": rn_number,
+            "title": TITLES[i % len(TITLES)],
+            "date": begin.strftime("%m/%d/%Y"),
+            "checked_in": checked_in,
+        })
+    return rows
+
+
+def make_results_page(rows, start_row=1, total=None, base_path="/cs/idcplg", query_text=None):
+    """
+    Render one results page in the layout of TCEQ_PERFORM_SEARCH: a table_0
+    grid, an "x - y of N" summary and a "Link To More Results" link when
+    more rows follow. The link carries query_text, as TCEQ's does.
+    """
+    total = len(rows) if total is None else total
+    end_row = start_row + len(rows) - 1
+
+    if not rows:
+        return "<html><body><div id='results'>No search results found.</div></body></html>"
+
+    header = "".join(f"<th>{html.escape(name)}</th>" for name in RESULT_COLUMNS)
+    body = []
+    for row in rows:
+        href = f"{base_path}?IdcService=GET_FILE&amp;dID={row['dID']}&amp;Rendition=Web"
+        cells = [""] * len(RESULT_COLUMNS)
+        cells[1] = "<input type='checkbox'>"
+        cells[2] = f"<a href='{href}'>{row['content_id']}</a>"
+        cells[3] = "AIR / New Source Review Permit"
+        cells[4] = row['rn']
+        cells[5] = "12345"
+        cells[6] = "EXAMPLE PLANT"
+        cells[7] = "EXAMPLE COMPANY LLC"
+        cells[8] = "HARRIS"
+        cells[9] = "AIR"
+        cells[10] = "Permits"
+        cells[11] = "Paper"
+        cells[12] = html.escape(row['title'])
+        cells[14] = f"{row['date']} 12:00 AM"
+        cells[15] = row['date']
+        body.append("<tr>" + "".join(f"<td>{cell}</td>" for cell in cells) + "</tr>")
+
+    paging = ""
+    if end_row < total:
+        next_href = f"{base_path}?IdcService=TCEQ_PERFORM_SEARCH&amp;StartRow={end_row + 1}&amp;EndRow={end_row + len(rows)}&amp;ResultCount={len(rows)}"
+        if query_text:
+            next_href += "&amp;QueryText=" + html.escape(urllib.parse.quote(query_text))
+        paging = f"<a href='{next_href}'><img src='/images/next.gif' alt='Link To More Results'></a>"
+
+    return (
+        "<html><head><title>Search Results</title></head><body>"
+        f"<div class='summary'>Results {start_row} - {end_row} of {total}</div>"
+        f"<input type='hidden' name='TotalRows' value='{total}'>"
+        f"<table id='table_0'><tr>{header}</tr>{''.join(body)}</table>"
+        f"{paging}</body></html>"
+    )
+
+
+def make_result_pages(total_rows, page_size=200, **kwargs):
+    """
+    Render a full multi-page result set; returns a list of page HTML strings.
+    """
+    return paginate(make_result_rows(total_rows, **kwargs), page_size)
+
+
+def paginate(rows, page_size=200, query_text=None):
+    """
+    Render rows as consecutive result pages; returns a list of page HTML strings.
+    """
+    pages = []
+    for start in range(0, max(len(rows), 1), page_size):
+        pages.append(make_results_page(rows[start:start + page_size], start + 1, len(rows), query_text=query_text))
+    return pages
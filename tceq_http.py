@@ -0,0 +1,316 @@
+import os
+import sqlite3
+import threading
+import time
+import urllib.parse
+from collections import defaultdict
+
+import requests
+from requests.adapters import HTTPAdapter
+
+from tceq_metrics import METRICS
+from tceq_resilience import (DEFAULT_RETRY_POLICY, RETRY_STATUSES, TCEQUnavailableError,
+                             breaker_for, call_with_retries, parse_retry_after)
+
+USER_AGENT = "Mozilla/5.0 (Macintosh; Intel Mac OS X 10_15_7) AppleWebKit/537.36 (KHTML, like Gecko) Chrome/91.0.4472.114 Safari/537.36"
+
+
+DEFAULT_GOVERNOR_NAME = "tceq_governor.sqlite3"
+# Hosts RateGovernor paces by default; anything else (e.g. the local replay server) is left alone
+GOVERNED_HOSTS = ("records.tceq.texas.gov",)
+
+
+class RateGovernor:
+    """
+    Adaptive token bucket per host, shared by every thread and, through a
+    SQLite file, every local process using the same path.
+
+    acquire() takes a token, sleeping until one is available. Callers report
+    each response with record(), and the bucket's rate adapts AIMD-style:
+    every successful, fast response adds about `increase` requests/second
+    per second of traffic, up to max_rate; a 429/5xx, a connection failure
+    or a response slower than latency_target halves the rate, down to
+    min_rate. Requests already in flight when the server starts struggling
+    all fail together, so the rate is cut at most once per `cooldown`
+    seconds. A Retry-After puts the bucket in debt for that long.
+
+    max_rate defaults to the 2 requests/second TCEQ has long been searched
+    at, so the governor only ever slows down from there. path=None keeps the
+    bucket in memory, for this process only.
+    """
+
+    def __init__(self, path=None, initial_rate=2.0, min_rate=0.2, max_rate=2.0,
+                 increase=0.1, decrease=0.5, burst=2.0, latency_target=5.0, cooldown=2.0, hosts=GOVERNED_HOSTS):
+        self.path = path
+        self.max_rate = max_rate
+        self.min_rate = min(min_rate, max_rate)
+        self.initial_rate = min(max(initial_rate, self.min_rate), max_rate)
+        self.increase = increase
+        self.decrease = decrease
+        self.burst = burst
+        self.latency_target = latency_target
+        self.cooldown = cooldown
+        # None governs every host
+        self.hosts = hosts
+        self._lock = threading.Lock()
+        self._conn = None
+
+    def governs(self, host):
+        return self.hosts is None or host in self.hosts
+
+    def _connection(self):
+        # Opened on first use, so sessions that never reach a governed host create no file
+        if self._conn is None:
+            self._conn = sqlite3.connect(self.path or ":memory:", check_same_thread=False, timeout=30,
+                                         isolation_level=None)
+            if self.path:
+                self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute(
+                "CREATE TABLE IF NOT EXISTS rate_buckets ("
+                " host TEXT PRIMARY KEY,"
+                " rate REAL NOT NULL,"
+                " tokens REAL NOT NULL,"
+                " updated REAL NOT NULL,"
+                " last_decrease REAL NOT NULL)"
+            )
+        return self._conn
+
+    def _update(self, host, change):
+        """
+        Run change(rate, tokens, last_decrease, now) -> (rate, tokens,
+        last_decrease, result) on the host's bucket, refilled up to now, in one
+        transaction. Returns result.
+        """
+        with self._lock:
+            conn = self._connection()
+            conn.execute("BEGIN IMMEDIATE")
+            try:
+                now = time.time()
+                row = conn.execute(
+                    "SELECT rate, tokens, updated, last_decrease FROM rate_buckets WHERE host = ?", (host,)
+                ).fetchone()
+                if row is None:
+                    rate, tokens, last_decrease = self.initial_rate, self.burst, 0.0
+                else:
+                    rate, tokens, updated, last_decrease = row
+                    rate = min(max(rate, self.min_rate), self.max_rate)
+                    tokens = min(self.burst, tokens + max(0.0, now - updated) * rate)
+                rate, tokens, last_decrease, result = change(rate, tokens, last_decrease, now)
+                conn.execute(
+                    "INSERT OR REPLACE INTO rate_buckets (host, rate, tokens, updated, last_decrease)"
+                    " VALUES (?, ?, ?, ?, ?)",
+                    (host, rate, tokens, now, last_decrease)
+                )
+                conn.execute("COMMIT")
+            except BaseException:
+                conn.execute("ROLLBACK")
+                raise
+        return result
+
+    def acquire(self, url=None):
+        host = urllib.parse.urlparse(url).netloc if url else ""
+        if not self.governs(host):
+            return
+
+        def take(rate, tokens, last_decrease, now):
+            # Reserve the token now and wait out any shortfall, so waiters queue in order
+            delay = (1.0 - tokens) / rate if tokens < 1.0 else 0.0
+            return rate, tokens - 1.0, last_decrease, delay
+
+        delay = self._update(host, take)
+        if delay > 0:
+            METRICS.observe("tceq_rate_wait_seconds", delay, help="Time requests waited for the rate governor.")
+            time.sleep(delay)
+
+    def record(self, url, seconds=None, status=None, retry_after=None, latency_target=None):
+        """
+        Feed back one response: its latency in seconds and HTTP status, with
+        status None meaning the request failed without a response.
+        latency_target replaces the governor's own for this response, for
+        timings that include more than the server's reply (e.g. a browser
+        rendering the page).
+        """
+        host = urllib.parse.urlparse(url).netloc if url else ""
+        if not self.governs(host):
+            return
+        if latency_target is None:
+            latency_target = self.latency_target
+        failed = status is None or status in RETRY_STATUSES or (seconds or 0) > latency_target
+
+        def adapt(rate, tokens, last_decrease, now):
+            if not failed:
+                return min(self.max_rate, rate + self.increase / rate), tokens, last_decrease, None
+            if now - last_decrease >= self.cooldown:
+                rate = max(self.min_rate, rate * self.decrease)
+                last_decrease = now
+                METRICS.inc("tceq_rate_decreases_total", help="Times the rate governor backed off.", host=host)
+            if retry_after:
+                tokens = min(tokens, 1.0 - retry_after * rate)
+            return rate, tokens, last_decrease, None
+
+        self._update(host, adapt)
+
+    def rate(self, host):
+        """
+        Current requests/second for host.
+        """
+        return self._update(host, lambda rate, tokens, last_decrease, now: (rate, tokens, last_decrease, rate))
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+
+class CappedGovernor:
+    """
+    A shared RateGovernor with a ceiling for this process only: requests
+    wait for requests_per_second locally as well as for the shared bucket.
+    The shared rate itself is left alone, so runs with different caps on one
+    governor file do not fight over it.
+    """
+
+    def __init__(self, governor, requests_per_second):
+        self.governor = governor
+        self.min_interval = 1.0 / requests_per_second
+        self._lock = threading.Lock()
+        self._next_slot = 0.0
+
+    def acquire(self, url=None):
+        if self.governor.governs(urllib.parse.urlparse(url).netloc if url else ""):
+            with self._lock:
+                now = time.monotonic()
+                slot = max(now, self._next_slot)
+                self._next_slot = slot + self.min_interval
+            if slot > now:
+                time.sleep(slot - now)
+        self.governor.acquire(url)
+
+    def record(self, *args, **kwargs):
+        self.governor.record(*args, **kwargs)
+
+    def rate(self, host):
+        return min(self.governor.rate(host), 1.0 / self.min_interval)
+
+
+_governors = {}
+_governors_lock = threading.Lock()
+
+
+def governor_path(beside=None):
+    """
+    SQLite file for the shared RateGovernor: TCEQ_GOVERNOR_PATH if set,
+    else DEFAULT_GOVERNOR_NAME in the directory of the file `beside` (e.g.
+    the search cache), else None for a governor in memory.
+    """
+    path = os.environ.get("TCEQ_GOVERNOR_PATH")
+    if path:
+        return path
+    if beside:
+        return os.path.join(os.path.dirname(os.path.abspath(beside)), DEFAULT_GOVERNOR_NAME)
+    return None
+
+
+def shared_governor(path=None):
+    """
+    The one RateGovernor of this process for path (None: in memory), so
+    every session, browser and runner using that path shares its bucket.
+    """
+    key = os.path.abspath(path) if path else None
+    with _governors_lock:
+        if key not in _governors:
+            _governors[key] = RateGovernor(path)
+        return _governors[key]
+
+
+def default_governor():
+    """
+    The RateGovernor used by sessions and browsers that are not given one:
+    shared_governor(governor_path()).
+    """
+    return shared_governor(governor_path())
+
+
+class HostLimiter:
+    """
+    Caps the number of in-flight requests per host.
+    """
+
+    def __init__(self, max_per_host=4):
+        self.max_per_host = max_per_host
+        self._lock = threading.Lock()
+        self._semaphores = defaultdict(lambda: threading.BoundedSemaphore(self.max_per_host))
+
+    def semaphore(self, url):
+        host = urllib.parse.urlparse(url).netloc
+        with self._lock:
+            return self._semaphores[host]
+
+
+class PooledSession(requests.Session):
+    """
+    requests.Session that keeps a connection pool sized for the worker count
+    and routes every request through a shared HostLimiter and rate limiter
+    (default_governor() unless one is given), reporting each response's
+    latency and status back to it.
+    Transient failures (429/5xx, connection errors, timeouts) are retried
+    with backoff behind the host's circuit breaker; once retries run out a
+    TCEQUnavailableError is raised instead of returning the error response.
+    """
+
+    def __init__(self, host_limiter=None, rate_limiter=None, pool_size=10, retry_policy=None, timeout=60):
+        super().__init__()
+        self.host_limiter = host_limiter
+        self.rate_limiter = rate_limiter or default_governor()
+        self.retry_policy = retry_policy or DEFAULT_RETRY_POLICY
+        self.timeout = timeout
+        adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+        self.mount("https://", adapter)
+        self.mount("http://", adapter)
+        self.headers.update({"User-Agent": USER_AGENT})
+
+    def _send_timed(self, method, url, *args, **kwargs):
+        started = time.perf_counter()
+        try:
+            response = super().request(method, url, *args, **kwargs)
+        except (requests.ConnectionError, requests.Timeout):
+            self.rate_limiter.record(url, time.perf_counter() - started)
+            raise
+        retry_after = None
+        if response.status_code in RETRY_STATUSES:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+        self.rate_limiter.record(url, time.perf_counter() - started, response.status_code, retry_after)
+        return response
+
+    def _send_once(self, method, url, *args, **kwargs):
+        # Wait for a rate token before taking a host slot, so a paced request
+        # never holds a slot that another worker could be sending on
+        self.rate_limiter.acquire(url)
+        try:
+            if self.host_limiter is None:
+                response = self._send_timed(method, url, *args, **kwargs)
+            else:
+                with self.host_limiter.semaphore(url):
+                    response = self._send_timed(method, url, *args, **kwargs)
+        except (requests.ConnectionError, requests.Timeout) as e:
+            raise TCEQUnavailableError(f"Could not reach {urllib.parse.urlparse(url).netloc}: {e}") from e
+
+        if response.status_code in RETRY_STATUSES:
+            retry_after = parse_retry_after(response.headers.get("Retry-After"))
+            response.close()
+            raise TCEQUnavailableError(
+                f"TCEQ server returned {response.status_code} {response.reason}",
+                status_code=response.status_code,
+                retry_after=retry_after
+            )
+        return response
+
+    def request(self, method, url, *args, **kwargs):
+        kwargs.setdefault("timeout", self.timeout)
+        return call_with_retries(
+            lambda: self._send_once(method, url, *args, **kwargs),
+            self.retry_policy,
+            breaker_for(url),
+            f"{method} {urllib.parse.urlparse(url).path}"
+        )
@@ -0,0 +1,219 @@
+"""
+Local full-text index over downloaded Technical Review documents.
+
+Text is extracted from each downloaded file once and stored in a SQLite
+FTS5 table keyed by document id (normally the dID), so permit numbers,
+pollutants or emission limits can be found across every cached document
+without reopening the PDFs:
+
+    python tceq_index.py index downloads/
+    python tceq_index.py search "NOx lb/hr"
+
+PDF text extraction needs the optional pypdf package; without it PDFs are
+skipped and everything else still works.
+"""
+import argparse
+import os
+import re
+import sqlite3
+import sys
+import threading
+import time
+
+from lxml import html as lxml_html
+
+from tceq_downloader import PART_SUFFIX, document_id
+
+try:
+    from pypdf import PdfReader
+except ImportError:  # optional dependency
+    PdfReader = None
+
+DEFAULT_INDEX_PATH = "tceq_index.sqlite3"
+
+WHITESPACE_RE = re.compile(r"\s+")
+
+
+def extract_text(path):
+    """
+    Plain text of a downloaded document, or None if its type is not supported
+    (or it is a PDF and pypdf is not installed).
+    """
+    ext = os.path.splitext(path)[1].lower()
+    if ext == ".pdf":
+        if PdfReader is None:
+            return None
+        reader = PdfReader(path)
+        text = "\n".join(page.extract_text() or "" for page in reader.pages)
+    elif ext in (".htm", ".html"):
+        with open(path, "rb") as f:
+            text = lxml_html.fromstring(f.read()).text_content()
+    elif ext == ".txt":
+        with open(path, encoding="utf-8", errors="ignore") as f:
+            text = f.read()
+    else:
+        return None
+    return WHITESPACE_RE.sub(" ", text).strip()
+
+
+def fts_query(query):
+    """
+    Quote each word so free text typed into a search box is never read as
+    FTS5 syntax (a stray '-' or ':' would otherwise be a query error).
+    """
+    return " ".join('"' + term.replace('"', '""') + '"' for term in query.split())
+
+
+class DocumentIndex:
+    """
+    SQLite FTS5 index of document text.
+
+    `indexed_documents` records each document's metadata and the size and
+    mtime of the file it was extracted from, so re-indexing a download
+    directory only extracts new or changed files. The text itself lives in
+    the `documents_fts` virtual table, ranked with bm25.
+    """
+
+    def __init__(self, path=DEFAULT_INDEX_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS indexed_documents ("
+            " doc_id TEXT PRIMARY KEY,"
+            " rn TEXT,"
+            " title TEXT,"
+            " date TEXT,"
+            " url TEXT,"
+            " path TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " mtime REAL NOT NULL,"
+            " indexed_at REAL NOT NULL)"
+        )
+        self._conn.execute(
+            "CREATE VIRTUAL TABLE IF NOT EXISTS documents_fts USING fts5("
+            " doc_id UNINDEXED, title, body, tokenize='porter unicode61')"
+        )
+        self._conn.commit()
+
+    def needs_indexing(self, doc_id, path):
+        stat = os.stat(path)
+        with self._lock:
+            row = self._conn.execute(
+                "SELECT size, mtime FROM indexed_documents WHERE doc_id = ?", (doc_id,)
+            ).fetchone()
+        return row is None or row[0] != stat.st_size or row[1] != stat.st_mtime
+
+    def add(self, doc_id, path, text, doc=None, rn=None):
+        """
+        Store (or replace) the text of one document.
+        """
+        doc = doc or {}
+        stat = os.stat(path)
+        title = doc.get('title') or os.path.basename(path)
+        with self._lock:
+            self._conn.execute("DELETE FROM documents_fts WHERE doc_id = ?", (doc_id,))
+            self._conn.execute(
+                "INSERT INTO documents_fts (doc_id, title, body) VALUES (?, ?, ?)",
+                (doc_id, title, text)
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO indexed_documents"
+                " (doc_id, rn, title, date, url, path, size, mtime, indexed_at)"
+                " VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                (doc_id, rn or doc.get('rn'), title, doc.get('date'), doc.get('url'),
+                 os.path.abspath(path), stat.st_size, stat.st_mtime, time.time())
+            )
+            self._conn.commit()
+
+    def index_document(self, path, doc=None, rn=None):
+        """
+        Extract and index one downloaded file unless it is already indexed.
+        Returns True if the file was (re)indexed.
+        """
+        doc_id = document_id(doc) if doc else os.path.splitext(os.path.basename(path))[0]
+        if not self.needs_indexing(doc_id, path):
+            return False
+        text = extract_text(path)
+        if text is None:
+            return False
+        self.add(doc_id, path, text, doc, rn)
+        return True
+
+    def index_downloads(self, downloads, rn=None):
+        """
+        Index (doc, path) pairs, e.g. the successful results of
+        DocumentDownloader.iter_download. Returns the number of files indexed.
+        A file that fails to extract is reported and skipped.
+        """
+        indexed = 0
+        for doc, path in downloads:
+            try:
+                indexed += self.index_document(path, doc, rn)
+            except Exception as e:
+                print(f"Could not index {path}: {e}")
+        return indexed
+
+    def index_directory(self, dest_dir):
+        """
+        Index every completed download in dest_dir, keyed by file name.
+        """
+        paths = [os.path.join(dest_dir, name) for name in sorted(os.listdir(dest_dir))
+                 if not name.endswith(PART_SUFFIX) and os.path.isfile(os.path.join(dest_dir, name))]
+        return self.index_downloads((None, path) for path in paths)
+
+    def search(self, query, limit=50):
+        """
+        Best matches first, as dicts with doc_id, rn, title, date, url, path
+        and a highlighted snippet. An empty query returns no results.
+        """
+        if not query.strip():
+            return []
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT f.doc_id, d.rn, d.title, d.date, d.url, d.path,"
+                " snippet(documents_fts, 2, '**', '**', ' ... ', 16)"
+                " FROM documents_fts f JOIN indexed_documents d ON d.doc_id = f.doc_id"
+                " WHERE documents_fts MATCH ? ORDER BY bm25(documents_fts) LIMIT ?",
+                (fts_query(query), limit)
+            ).fetchall()
+        columns = ("doc_id", "rn", "title", "date", "url", "path", "snippet")
+        return [dict(zip(columns, row)) for row in rows]
+
+    def count(self):
+        with self._lock:
+            return self._conn.execute("SELECT COUNT(*) FROM indexed_documents").fetchone()[0]
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Full-text index over downloaded Technical Review documents.")
+    parser.add_argument("--index", default=DEFAULT_INDEX_PATH, help="SQLite index file")
+    commands = parser.add_subparsers(dest="command", required=True)
+    index_cmd = commands.add_parser("index", help="Index new or changed files in a download directory")
+    index_cmd.add_argument("dest_dir", nargs="?", default="downloads")
+    search_cmd = commands.add_parser("search", help="Search the indexed documents")
+    search_cmd.add_argument("query")
+    search_cmd.add_argument("--limit", type=int, default=20)
+    args = parser.parse_args(argv)
+
+    index = DocumentIndex(args.index)
+    try:
+        if args.command == "index":
+            if PdfReader is None:
+                print("pypdf is not installed; PDF files will be skipped.", file=sys.stderr)
+            indexed = index.index_directory(args.dest_dir)
+            print(f"Indexed {indexed} documents ({index.count()} in the index).", file=sys.stderr)
+        else:
+            for hit in index.search(args.query, args.limit):
+                print(f"{hit['doc_id']}\t{hit['date'] or ''}\t{hit['title']}\t{hit['snippet']}")
+    finally:
+        index.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,236 @@
+import os
+import threading
+import time
+import uuid
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+
+from tceq_downloader import DocumentDownloader, build_zip, document_id, zip_name_for
+from tceq_metrics import trace
+from tceq_records import ResultRecord
+
+
+class Job:
+    """
+    One background search or download. Worker threads report progress with
+    update(); the UI reads a consistent copy with snapshot().
+    """
+
+    QUEUED = "queued"
+    RUNNING = "running"
+    DONE = "done"
+    FAILED = "failed"
+    CANCELLED = "cancelled"
+
+    def __init__(self, kind, description=""):
+        self.id = uuid.uuid4().hex[:12]
+        self.kind = kind
+        self.description = description
+        self.status = self.QUEUED
+        self.message = "Waiting for a free worker..."
+        self.pages = 0
+        self.rows = 0
+        self.done = 0
+        self.total = 0
+        self.warnings = []
+        # Rows found so far, for showing results while the job runs
+        self.partial = []
+        # Search engine that served a search job ("http" or "selenium")
+        self.engine = None
+        self.result = None
+        self.error = None
+        # Trace of every span the job recorded, for a timing breakdown
+        self.trace = None
+        self.created_at = time.time()
+        self.finished_at = None
+        self._lock = threading.Lock()
+
+    @property
+    def finished(self):
+        return self.status in (self.DONE, self.FAILED, self.CANCELLED)
+
+    def update(self, **fields):
+        with self._lock:
+            for name, value in fields.items():
+                setattr(self, name, value)
+
+    def extend_results(self, rows):
+        with self._lock:
+            self.partial.extend(rows)
+            self.rows = len(self.partial)
+
+    def partial_results(self):
+        with self._lock:
+            return list(self.partial)
+
+    def warn(self, message):
+        with self._lock:
+            self.warnings.append(message)
+
+    def snapshot(self):
+        with self._lock:
+            return {
+                "id": self.id,
+                "kind": self.kind,
+                "description": self.description,
+                "status": self.status,
+                "message": self.message,
+                "pages": self.pages,
+                "rows": self.rows,
+                "done": self.done,
+                "total": self.total,
+                "warnings": list(self.warnings),
+                "engine": self.engine,
+                "error": self.error,
+                "created_at": self.created_at,
+                "finished_at": self.finished_at
+            }
+
+
+class JobQueue:
+    """
+    Runs jobs on a bounded worker pool so searches never block the UI thread.
+
+    submit() returns a job ID straight away; callers poll get(job_id) for
+    progress and the result. At most `max_workers` jobs run at once and the
+    rest wait in order. Browser jobs are further capped by the shared
+    BrowserPool's size, so the number of Chrome processes stays fixed however
+    many users submit searches; batch jobs likewise share one TCEQBatchRunner's
+    workers. Only the newest `max_finished` finished jobs
+    are kept.
+    """
+
+    def __init__(self, max_workers=4, max_finished=100):
+        self.max_finished = max_finished
+        self._executor = ThreadPoolExecutor(max_workers=max_workers, thread_name_prefix="tceq-job")
+        self._lock = threading.Lock()
+        self._jobs = OrderedDict()
+        self._futures = {}
+
+    def submit(self, kind, fn, *args, description="", **kwargs):
+        """
+        Queue fn(job, *args, **kwargs) and return the new job's ID.
+        fn's return value becomes job.result.
+        """
+        job = Job(kind, description)
+        with self._lock:
+            self._jobs[job.id] = job
+            self._prune()
+            self._futures[job.id] = self._executor.submit(self._run, job, fn, args, kwargs)
+        return job.id
+
+    def get(self, job_id):
+        with self._lock:
+            return self._jobs.get(job_id)
+
+    def jobs(self):
+        with self._lock:
+            return list(self._jobs.values())
+
+    def cancel(self, job_id):
+        """
+        Cancel a job that has not started yet. Returns True if it was cancelled.
+        """
+        with self._lock:
+            future = self._futures.get(job_id)
+            job = self._jobs.get(job_id)
+            if future is None or not future.cancel():
+                return False
+            del self._futures[job_id]
+        job.update(status=Job.CANCELLED, message="Cancelled", finished_at=time.time())
+        return True
+
+    def shutdown(self, wait=False):
+        self._executor.shutdown(wait=wait, cancel_futures=True)
+
+    def _run(self, job, fn, args, kwargs):
+        job.update(status=Job.RUNNING, message="Running...")
+        try:
+            with trace(job.kind, job_id=job.id) as job_trace:
+                job.trace = job_trace
+                result = fn(job, *args, **kwargs)
+        except Exception as e:
+            print(f"Job {job.id} ({job.kind}) failed: {e}")
+            job.update(status=Job.FAILED, error=e, message=str(e), finished_at=time.time())
+        else:
+            job.update(status=Job.DONE, result=result, message="Finished", finished_at=time.time())
+        finally:
+            with self._lock:
+                self._futures.pop(job.id, None)
+
+    def _prune(self):
+        finished = [job_id for job_id, job in self._jobs.items() if job.finished]
+        for job_id in finished[:max(0, len(finished) - self.max_finished)]:
+            del self._jobs[job_id]
+
+
+def search_job(job, searcher, rn_number, start_date=None, end_date=None, refresh=False):
+    """
+    Single-RN search on a TCEQSearch (HTTP first, browser fallback). Rows
+    are tagged with the searched RN, as in batch_job, so downloads record
+    which RN each document was found under. They are streamed into the job
+    page by page, with the pages parsed, rows found and the engine serving
+    the search.
+    """
+    job.update(message="Searching...")
+    rn_number = rn_number.strip().upper()
+    pages = 0
+    for rows, engine in searcher.iter_search(rn_number, start_date, end_date, refresh):
+        pages += 1
+        job.extend_results([ResultRecord.from_dict(doc).with_rn(rn_number) for doc in rows])
+        job.update(pages=pages, engine=engine,
+                   message=f"Parsed {pages} result pages, {job.rows} rows found")
+    return job.partial
+
+
+def batch_job(job, runner, rn_numbers, start_date=None, end_date=None, refresh=False):
+    """
+    Multi-RN HTTP search with a TCEQBatchRunner, which may be shared with
+    other jobs. Rows are tagged with their RN.
+    """
+    job.update(total=len(rn_numbers), message=f"Searching {len(rn_numbers)} RNs...")
+    for done, (rn, results, error) in enumerate(runner.iter_results(rn_numbers, start_date, end_date, refresh), start=1):
+        if error:
+            job.warn(f"{rn}: {error}")
+        job.extend_results([doc.with_rn(rn) for doc in results])
+        job.update(done=done, message=f"{done}/{len(rn_numbers)} RNs searched, {job.rows} documents found")
+    return job.partial
+
+
+def download_job(job, rows, dest_dir="downloads", zip_name=None, max_workers=4, index=None, store=None):
+    """
+    Download every listed document and bundle them into one ZIP, named after
+    the result set unless zip_name is given (see zip_name_for), so repeated
+    jobs for the same results replace one archive instead of adding more.
+    With a DocumentIndex, downloads are also added to the full-text index.
+    With a DocumentStore, documents already stored are not downloaded again.
+    Returns the ZIP path.
+    """
+    downloader = DocumentDownloader(dest_dir, max_workers=max_workers, index=index, store=store)
+    # Several rows can point at the same document; it is downloaded once
+    total = len({document_id(doc) for doc in rows if doc.get('url')})
+    job.update(total=total, message="Downloading documents...")
+    paths = []
+    failed = 0
+    for done, (doc, path, error) in enumerate(downloader.iter_download(rows), start=1):
+        if error:
+            failed += 1
+        else:
+            paths.append(path)
+        job.update(done=done, message=f"Downloaded {len(paths)} documents ({failed} failed)")
+    if failed:
+        job.warn(f"{failed} documents could not be downloaded.")
+    job.update(message="Building ZIP...")
+    return build_zip(paths, os.path.join(dest_dir, zip_name or zip_name_for(rows)))
+
+
+def index_job(job, index, dest_dir="downloads"):
+    """
+    Add every file already in dest_dir to a DocumentIndex, e.g. downloads
+    made by the command line tools. Files already indexed are skipped.
+    Returns the number of files indexed.
+    """
+    if not os.path.isdir(dest_dir):
+        return 0
+    job.update(message=f"Indexing documents in {dest_dir}...")
+    return index.index_directory(dest_dir)
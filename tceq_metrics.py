@@ -0,0 +1,299 @@
+"""
+Instrumentation shared by every client: counters, span timings and traces.
+
+Spans time the phases of a search (form bootstrap, submit, page load,
+parse, filter, download). Each finished span is added to the process-wide
+METRICS registry as a duration histogram, and to the current Trace when one
+is active, so a single search can be broken down phase by phase:
+
+    with trace("search", rn=rn) as t:
+        results = client.search_technical_reviews(rn)
+    print(t.breakdown())
+
+METRICS renders in the Prometheus text format (prometheus_text(), or serve
+it with serve_metrics(port)), and a Trace exports as OTLP/JSON spans
+(to_otlp()), which OpenTelemetry collectors accept. No extra packages are
+needed.
+"""
+import contextvars
+import json
+import os
+import threading
+import time
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+DURATION_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0)
+
+_current_trace = contextvars.ContextVar("tceq_trace", default=None)
+_current_span = contextvars.ContextVar("tceq_span", default=None)
+
+
+def _label_key(labels):
+    return tuple(sorted((name, str(value)) for name, value in labels.items()))
+
+
+def _escape(value, quote=True):
+    # Exposition format escapes: backslash, newline and, in label values, double quote
+    value = str(value).replace("\\", "\\\\").replace("\n", "\\n")
+    return value.replace('"', '\\"') if quote else value
+
+
+def _format_labels(key, extra=()):
+    pairs = list(key) + list(extra)
+    if not pairs:
+        return ""
+    return "{" + ",".join(f'{name}="{_escape(value)}"' for name, value in pairs) + "}"
+
+
+class Metrics:
+    """
+    Thread-safe registry of counters and duration histograms.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._counters = {}
+        self._histograms = {}
+        self._help = {}
+
+    def inc(self, name, value=1, help=None, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            if help:
+                self._help.setdefault(name, help)
+            series = self._counters.setdefault(name, {})
+            series[key] = series.get(key, 0) + value
+
+    def observe(self, name, seconds, help=None, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            if help:
+                self._help.setdefault(name, help)
+            series = self._histograms.setdefault(name, {})
+            buckets, count, total = series.get(key, ([0] * len(DURATION_BUCKETS), 0, 0.0))
+            buckets = [n + (seconds <= bound) for n, bound in zip(buckets, DURATION_BUCKETS)]
+            series[key] = (buckets, count + 1, total + seconds)
+
+    def counter(self, name, **labels):
+        with self._lock:
+            return self._counters.get(name, {}).get(_label_key(labels), 0)
+
+    def reset(self):
+        with self._lock:
+            self._counters.clear()
+            self._histograms.clear()
+
+    def prometheus_text(self):
+        """
+        All metrics in the Prometheus text exposition format.
+        """
+        lines = []
+        with self._lock:
+            for name, series in sorted(self._counters.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {_escape(self._help[name], quote=False)}")
+                lines.append(f"# TYPE {name} counter")
+                for key, value in sorted(series.items()):
+                    lines.append(f"{name}{_format_labels(key)} {value}")
+            for name, series in sorted(self._histograms.items()):
+                if name in self._help:
+                    lines.append(f"# HELP {name} {_escape(self._help[name], quote=False)}")
+                lines.append(f"# TYPE {name} histogram")
+                for key, (buckets, count, total) in sorted(series.items()):
+                    for bound, n in zip(DURATION_BUCKETS, buckets):
+                        lines.append(f"{name}_bucket{_format_labels(key, [('le', bound)])} {n}")
+                    lines.append(f"{name}_bucket{_format_labels(key, [('le', '+Inf')])} {count}")
+                    lines.append(f"{name}_sum{_format_labels(key)} {total:.6f}")
+                    lines.append(f"{name}_count{_format_labels(key)} {count}")
+        return "\n".join(lines) + "\n"
+
+    def write_prometheus(self, path):
+        """
+        Write the metrics atomically, e.g. for node_exporter's textfile collector.
+        """
+        tmp_path = path + ".tmp"
+        with open(tmp_path, "w") as f:
+            f.write(self.prometheus_text())
+        os.replace(tmp_path, path)
+
+
+METRICS = Metrics()
+
+
+class Trace:
+    """
+    The spans recorded for one search (or batch), from any thread that
+    inherited the trace's context.
+    """
+
+    def __init__(self, name, attributes=None):
+        self.name = name
+        self.trace_id = os.urandom(16).hex()
+        self.attributes = attributes or {}
+        self.spans = []
+        self._lock = threading.Lock()
+
+    def add(self, span):
+        with self._lock:
+            self.spans.append(span)
+
+    def breakdown(self):
+        """
+        Per span name: how many times it ran and total/max seconds, in the
+        order each name first appeared. Spans that ran concurrently (e.g.
+        page loads) are summed, so totals can exceed wall-clock time.
+        """
+        rows = {}
+        with self._lock:
+            spans = list(self.spans)
+        for span in spans:
+            if span["parent_id"] is None:
+                continue
+            row = rows.setdefault(span["name"], {"phase": span["name"], "count": 0, "total_s": 0.0, "max_s": 0.0})
+            row["count"] += 1
+            row["total_s"] += span["duration"]
+            row["max_s"] = max(row["max_s"], span["duration"])
+        return list(rows.values())
+
+    def duration(self):
+        with self._lock:
+            roots = [span["duration"] for span in self.spans if span["parent_id"] is None]
+        return sum(roots)
+
+    def to_otlp(self, service_name="tceq-downloader"):
+        """
+        The trace as an OTLP/JSON ExportTraceServiceRequest.
+        """
+        def attributes(values):
+            return [{"key": key, "value": {"stringValue": str(value)}} for key, value in values.items()]
+
+        with self._lock:
+            spans = list(self.spans)
+        return {
+            "resourceSpans": [{
+                "resource": {"attributes": attributes({"service.name": service_name})},
+                "scopeSpans": [{
+                    "scope": {"name": "tceq_metrics"},
+                    "spans": [{
+                        "traceId": self.trace_id,
+                        "spanId": span["span_id"],
+                        "parentSpanId": span["parent_id"] or "",
+                        "name": span["name"],
+                        "kind": 1,
+                        "startTimeUnixNano": str(int(span["start"] * 1e9)),
+                        "endTimeUnixNano": str(int((span["start"] + span["duration"]) * 1e9)),
+                        "attributes": attributes(span["attributes"]),
+                        "status": {"code": 2, "message": span["error"]} if span["error"] else {}
+                    } for span in spans]
+                }]
+            }]
+        }
+
+    def write_otlp(self, path, service_name="tceq-downloader"):
+        with open(path, "w") as f:
+            json.dump(self.to_otlp(service_name), f)
+
+
+def current_trace():
+    return _current_trace.get()
+
+
+def _record(name, start, duration, attributes, span_id, parent_id, error=None, observe=True):
+    if observe:
+        labels = {"span": name}
+        if "client" in attributes:
+            labels["client"] = attributes["client"]
+        METRICS.observe("tceq_span_duration_seconds", duration,
+                        help="Time spent in each search and download phase.", **labels)
+    active = _current_trace.get()
+    if active is not None:
+        active.add({
+            "name": name,
+            "span_id": span_id,
+            "parent_id": parent_id,
+            "start": start,
+            "duration": duration,
+            "attributes": attributes,
+            "error": error
+        })
+
+
+@contextmanager
+def span(name, _observe=True, **attributes):
+    """
+    Time a block as a span named name; nested spans record their parent.
+    """
+    span_id = os.urandom(8).hex()
+    parent_id = _current_span.get()
+    token = _current_span.set(span_id)
+    start = time.time()
+    started = time.perf_counter()
+    error = None
+    try:
+        yield attributes
+    except BaseException as e:
+        error = f"{type(e).__name__}: {e}"
+        raise
+    finally:
+        _current_span.reset(token)
+        _record(name, start, time.perf_counter() - started, attributes, span_id, parent_id, error, _observe)
+
+
+def record_span(name, seconds, **attributes):
+    """
+    Record a phase that was timed elsewhere, ending now, as a child of the current span.
+    """
+    _record(name, time.time() - seconds, seconds, attributes, os.urandom(8).hex(), _current_span.get())
+
+
+@contextmanager
+def trace(name, **attributes):
+    """
+    Collect every span recorded inside the block into a new Trace. The
+    block itself is the root span; it is kept out of METRICS, since the
+    spans inside it are already counted there.
+    """
+    active = Trace(name, attributes)
+    token = _current_trace.set(active)
+    try:
+        with span(name, _observe=False, **attributes):
+            yield active
+    finally:
+        _current_trace.reset(token)
+
+
+def propagate(fn):
+    """
+    Wrap fn so it runs in the caller's trace context when called from a
+    worker thread (ThreadPoolExecutor does not carry contextvars over).
+    """
+    context = contextvars.copy_context()
+
+    def run(*args, **kwargs):
+        return context.copy().run(fn, *args, **kwargs)
+    return run
+
+
+class _MetricsHandler(BaseHTTPRequestHandler):
+    def do_GET(self):
+        body = METRICS.prometheus_text().encode("utf-8")
+        self.send_response(200)
+        self.send_header("Content-Type", "text/plain; version=0.0.4; charset=utf-8")
+        self.send_header("Content-Length", str(len(body)))
+        self.end_headers()
+        self.wfile.write(body)
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_metrics(port=9464, host="0.0.0.0"):
+    """
+    Serve METRICS for Prometheus scraping from a background thread.
+    Returns the server; call shutdown() to stop it.
+    """
+    httpd = ThreadingHTTPServer((host, port), _MetricsHandler)
+    httpd.daemon_threads = True
+    threading.Thread(target=httpd.serve_forever, daemon=True).start()
+    return httpd
@@ -0,0 +1,162 @@
+import re
+import urllib.parse
+
+import lxml.html
+
+from tceq_records import ResultRecord
+
+DATE_RE = re.compile(r'\d{1,2}/\d{1,2}/\d{2,4}')
+DID_RE = re.compile(r'[?&]dID=(\d+)')
+# "Results 1 - 200 of 523" / "Items 1-200 of 523" style paging summaries
+TOTAL_ROWS_RE = re.compile(r'\d+\s*-\s*\d+\s+of\s+([\d,]+)', re.IGNORECASE)
+WHITESPACE_RE = re.compile(r'\s+')
+
+NO_RESULTS_TEXT = "No search results"
+NEXT_PAGE_XPATH = "//a[@href][img[@alt='Link To More Results']]"
+
+# Column headers of table_0, with the fallback positions used when a header is missing
+TITLE_HEADERS = ("Title",)
+DATE_HEADERS = ("Begin Date", "Date")
+TITLE_FALLBACK_IDX = 12
+DATE_FALLBACK_IDX = 14
+
+
+def _text(element):
+    return WHITESPACE_RE.sub(' ', element.text_content()).strip()
+
+
+def _header_index(header_texts, names, fallback):
+    for name in names:
+        if name in header_texts:
+            return header_texts.index(name)
+    return fallback
+
+
+def _find_result_table(tree):
+    """
+    The results grid is table_0; older layouts are matched by a Title header.
+    """
+    tables = tree.xpath("//table[@id='table_0']")
+    if tables:
+        return tables[0]
+    for table in tree.xpath("//table[.//th]"):
+        if any(_text(th) in TITLE_HEADERS for th in table.xpath(".//th")):
+            return table
+    return None
+
+
+def _parse_row(row, cells, title_idx, date_idx, base_url):
+    link = row.xpath(".//a[@href]")
+    if not link:
+        return None
+    href = link[0].get('href')
+    raw_text = ' '.join(filter(None, (_text(cell) for cell in cells)))
+
+    did_match = DID_RE.search(href)
+    date_match = DATE_RE.search(_text(cells[date_idx])) if date_idx is not None else None
+    if not date_match:
+        date_match = DATE_RE.search(raw_text)
+
+    return ResultRecord(
+        title=_text(cells[title_idx]) if title_idx is not None else _text(link[0]),
+        url=urllib.parse.urljoin(base_url, href),
+        date=date_match.group(0) if date_match else None,
+        dID=did_match.group(1) if did_match else None,
+        raw_text=raw_text
+    )
+
+
+def parse_results_page(content, base_url, keyword="Technical Review"):
+    """
+    Parse one TCEQ_PERFORM_SEARCH results page.
+
+    Goes straight to the table_0 rows, maps columns by header text (from a
+    th row, or a leading td row without links) and keeps rows whose title
+    contains keyword (case-insensitive). Without a header, table_0 columns
+    fall back to Title=12 and Begin Date=14. Returns a dict with:
+      rows         list of ResultRecords (title, url, date, dID, raw_text)
+      has_table    whether a results table was found
+      row_count    result rows in the table before keyword filtering
+      no_results   whether the page says "No search results"
+      total        total row count from the paging summary, or None
+      next_params  query parameters of the "Link To More Results" link, or None
+    """
+    tree = lxml.html.fromstring(content)
+    page = {"rows": [], "has_table": False, "row_count": 0, "no_results": False, "total": None, "next_params": None}
+    keyword = keyword.lower() if keyword else None
+
+    table = _find_result_table(tree)
+    if table is None:
+        page['no_results'] = NO_RESULTS_TEXT in tree.text_content()
+    else:
+        page['has_table'] = True
+        # Fixed fallback positions only make sense for the known table_0 grid
+        is_grid = table.get('id') == 'table_0'
+        rows = table.xpath("./tr | ./thead/tr | ./tbody/tr")
+        if is_grid:
+            # Until a header row says otherwise
+            title_idx, date_idx = TITLE_FALLBACK_IDX, DATE_FALLBACK_IDX
+            min_cells = max(title_idx, date_idx) + 1
+        else:
+            title_idx = date_idx = None
+            min_cells = 1
+        for position, row in enumerate(rows):
+            header_cells = row.xpath("./th")
+            # Some layouts render the grid's header row with td cells; it is the first row and has no link
+            if not header_cells and position == 0 and not row.xpath(".//a[@href]"):
+                header_cells = row.xpath("./td")
+            if header_cells:
+                header_texts = [_text(cell) for cell in header_cells]
+                title_idx = _header_index(header_texts, TITLE_HEADERS, TITLE_FALLBACK_IDX if is_grid else None)
+                date_idx = _header_index(header_texts, DATE_HEADERS, DATE_FALLBACK_IDX if is_grid else None)
+                min_cells = max([idx for idx in (title_idx, date_idx) if idx is not None], default=0) + 1
+                continue
+
+            cells = row.xpath("./td")
+            if len(cells) < min_cells:
+                continue
+
+            doc = _parse_row(row, cells, title_idx, date_idx, base_url)
+            if doc is None:
+                continue
+            page['row_count'] += 1
+            haystack = doc.title if title_idx is not None else doc.raw_text
+            if keyword and keyword not in haystack.lower():
+                continue
+            page['rows'].append(doc)
+
+    total_input = tree.xpath("//input[@name='TotalRows']/@value")
+    if total_input and total_input[0].isdigit():
+        page['total'] = int(total_input[0])
+    else:
+        match = TOTAL_ROWS_RE.search(tree.text_content())
+        if match:
+            page['total'] = int(match.group(1).replace(',', ''))
+
+    for link in tree.xpath(NEXT_PAGE_XPATH):
+        href = link.get('href')
+        if not href.lower().startswith('javascript'):
+            next_url = urllib.parse.urljoin(base_url, href)
+            page['next_params'] = dict(urllib.parse.parse_qsl(urllib.parse.urlparse(next_url).query))
+            break
+
+    return page
+
+
+def parse_hidden_inputs(content):
+    """
+    Return the name/value pairs of the hidden inputs on the search form page.
+    """
+    tree = lxml.html.fromstring(content)
+    return {
+        field.get('name'): field.get('value')
+        for field in tree.xpath("//input[@type='hidden'][@name][@value]")
+        if field.get('name') and field.get('value')
+    }
+
+
+def parse_results(content, base_url, keyword="Technical Review"):
+    """
+    Return only the matching result rows of a results page.
+    """
+    return parse_results_page(content, base_url, keyword)['rows']
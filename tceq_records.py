@@ -0,0 +1,216 @@
+"""
+Compact search result records and columnar export.
+
+Both clients' parsers produce ResultRecord objects: slotted, with the date
+parsed once and the dID stored as an int. Records still answer dict-style
+access (record['url'], record.get('date'), dict(record)), so code written
+against the old result dicts keeps working.
+
+Lists of records convert to columns without building a dict per row, for a
+pandas DataFrame (to_dataframe) or bulk CSV/Parquet files (open_writer),
+which also writes JSON lines.
+"""
+import csv
+import json
+import sys
+from datetime import datetime
+
+# Exported columns, in order
+COLUMNS = ("rn", "dID", "title", "date", "doc_date", "url", "raw_text")
+# Keys a record exposes through the dict-style interface (the old result dict keys)
+DICT_KEYS = ("title", "url", "raw_text", "dID", "date", "rn")
+
+
+def parse_doc_date(date_str):
+    """
+    Parse a result date such as '06/15/2021' or '06/15/2021 10:30 AM'.
+    Returns a datetime, or None if the string is empty or not in MM/DD/YYYY form.
+    """
+    if not date_str:
+        return None
+    try:
+        return datetime.strptime(date_str.split()[0], '%m/%d/%Y')
+    except ValueError:
+        return None
+
+
+class ResultRecord:
+    """
+    One search result row. `date` keeps the text shown by TCEQ; `doc_date`
+    is that date parsed (None if unparseable), so filtering never re-parses.
+    """
+
+    __slots__ = ("title", "url", "date", "doc_date", "dID", "raw_text", "rn")
+
+    def __init__(self, title, url, date=None, dID=None, raw_text="", rn=None, doc_date=None):
+        self.title = title
+        self.url = url
+        self.date = date
+        self.doc_date = doc_date if doc_date is not None else parse_doc_date(date)
+        self.dID = int(dID) if dID not in (None, "") else None
+        self.raw_text = raw_text
+        self.rn = rn
+
+    @classmethod
+    def from_dict(cls, doc):
+        if isinstance(doc, cls):
+            return doc
+        return cls(doc.get('title', ''), doc.get('url', ''), doc.get('date'), doc.get('dID'),
+                   doc.get('raw_text', ''), doc.get('rn'))
+
+    def with_rn(self, rn):
+        """
+        A copy of this record tagged with its RN.
+        """
+        return ResultRecord(self.title, self.url, self.date, self.dID, self.raw_text, rn, self.doc_date)
+
+    def to_dict(self):
+        return {key: getattr(self, key) for key in DICT_KEYS if getattr(self, key) is not None}
+
+    # Dict-style access, for code written against the old result dicts
+
+    def keys(self):
+        return [key for key in DICT_KEYS if getattr(self, key) is not None]
+
+    def __getitem__(self, key):
+        if key not in DICT_KEYS or getattr(self, key) is None:
+            raise KeyError(key)
+        return getattr(self, key)
+
+    def __contains__(self, key):
+        return key in DICT_KEYS and getattr(self, key) is not None
+
+    def get(self, key, default=None):
+        if key not in DICT_KEYS:
+            return default
+        value = getattr(self, key)
+        return default if value is None else value
+
+    def __eq__(self, other):
+        if not isinstance(other, ResultRecord):
+            return NotImplemented
+        return all(getattr(self, name) == getattr(other, name) for name in self.__slots__)
+
+    def __repr__(self):
+        return f"ResultRecord(dID={self.dID!r}, date={self.date!r}, title={self.title!r})"
+
+
+def to_columns(records, columns=COLUMNS):
+    """
+    Column name -> list of values, read straight from the record slots.
+    """
+    return {name: [getattr(record, name) for record in records] for name in columns}
+
+
+def to_dataframe(records, columns=COLUMNS):
+    """
+    pandas DataFrame of the records, built from columns in one step.
+    """
+    import pandas as pd
+
+    return pd.DataFrame(to_columns(records, columns), columns=list(columns))
+
+
+def _csv_value(value):
+    return value.strftime('%Y-%m-%d') if isinstance(value, datetime) else value
+
+
+def _open_text(path):
+    """
+    Text file for writing, with '-' meaning stdout (which is never closed).
+    """
+    if path == "-":
+        return sys.stdout, False
+    return open(path, "w", newline="", encoding="utf-8"), True
+
+
+class CsvRecordWriter:
+    """
+    Appends records to a CSV file (or stdout) as they arrive, with a header row.
+    """
+
+    def __init__(self, path, columns=COLUMNS):
+        self.columns = columns
+        self._file, self._owned = _open_text(path)
+        self._writer = csv.writer(self._file)
+        self._writer.writerow(columns)
+
+    def write(self, records):
+        self._writer.writerows([_csv_value(getattr(record, name)) for name in self.columns] for record in records)
+        self._file.flush()
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+
+
+class JsonlRecordWriter:
+    """
+    Appends one JSON object per record (the dict-style view) to a file or stdout.
+    """
+
+    def __init__(self, path):
+        self._file, self._owned = _open_text(path)
+
+    def write(self, records):
+        self._file.writelines(json.dumps(dict(record)) + "\n" for record in records)
+        self._file.flush()
+
+    def close(self):
+        if self._owned:
+            self._file.close()
+
+
+class ParquetRecordWriter:
+    """
+    Writes records to a Parquet file, one row group per write() call, so a
+    batch run never holds more than one RN's rows. Needs pyarrow.
+    """
+
+    def __init__(self, path, columns=COLUMNS):
+        try:
+            import pyarrow as pa
+            import pyarrow.parquet as pq
+        except ImportError as e:
+            raise RuntimeError("Parquet export needs pyarrow (pip install pyarrow).") from e
+        self._pa = pa
+        self.columns = columns
+        types = {"dID": pa.int64(), "doc_date": pa.timestamp("s")}
+        self.schema = pa.schema([(name, types.get(name, pa.string())) for name in columns])
+        self._writer = pq.ParquetWriter(path, self.schema)
+
+    def write(self, records):
+        if records:
+            self._writer.write_table(self._pa.Table.from_pydict(to_columns(records, self.columns), schema=self.schema))
+
+    def close(self):
+        self._writer.close()
+
+
+def guess_format(path):
+    """
+    Export format for path from its extension: parquet, jsonl or csv.
+    stdout ('-') defaults to JSON lines.
+    """
+    name = path.lower()
+    if name.endswith((".parquet", ".pq")):
+        return "parquet"
+    if name == "-" or name.endswith((".jsonl", ".ndjson", ".json")):
+        return "jsonl"
+    return "csv"
+
+
+def open_writer(path, fmt=None):
+    """
+    Record writer for path ('-' for stdout); the format defaults to the extension.
+    """
+    fmt = fmt or guess_format(path)
+    if fmt == "parquet":
+        if path == "-":
+            raise ValueError("Parquet output needs a file path, not stdout.")
+        return ParquetRecordWriter(path)
+    if fmt == "csv":
+        return CsvRecordWriter(path)
+    if fmt == "jsonl":
+        return JsonlRecordWriter(path)
+    raise ValueError(f"Unknown export format: {fmt}")
@@ -0,0 +1,205 @@
+"""
+Local stand-in for records.tceq.texas.gov that replays recorded pages.
+
+Serves the TCEQ_SEARCH form, TCEQ_PERFORM_SEARCH result pages (selected by
+StartRow) and GET_FILE documents, with optional injected 503s and latency,
+so both clients can be tested and benchmarked offline:
+
+    python tceq_replay_server.py --port 8765 --error-rate 0.1 --latency 0.2
+    python tceq_replay_server.py --pages recorded_pages/
+
+A recorded pages directory holds search_form.html plus results_*.html pages
+in page order. Without one, pages are synthesized by tceq_fixtures, and a
+QueryText clause of the form dInDate >= `MM/DD/YYYY` narrows the results.
+"""
+import argparse
+import glob
+import os
+import random
+import re
+import threading
+import time
+import urllib.parse
+from datetime import datetime
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+from tceq_fixtures import make_result_rows, make_search_form_page, paginate
+
+SEARCH_PATH = "/cs/idcplg"
+CHECKED_IN_CLAUSE = re.compile(r"dInDate\s*>=\s*`(\d{2}/\d{2}/\d{4})`")
+
+
+class _ReplayHandler(BaseHTTPRequestHandler):
+    protocol_version = "HTTP/1.1"
+
+    def log_message(self, format, *args):
+        if self.server.replay.verbose:
+            super().log_message(format, *args)
+
+    def _params(self):
+        url = urllib.parse.urlparse(self.path)
+        params = dict(urllib.parse.parse_qsl(url.query))
+        length = int(self.headers.get("Content-Length") or 0)
+        if length:
+            body = self.rfile.read(length).decode("utf-8", errors="ignore")
+            params.update(urllib.parse.parse_qsl(body))
+        return url.path, params
+
+    def _send(self, status, body, content_type="text/html; charset=utf-8", headers=None):
+        if isinstance(body, str):
+            body = body.encode("utf-8")
+        self.send_response(status)
+        self.send_header("Content-Type", content_type)
+        self.send_header("Content-Length", str(len(body)))
+        for name, value in (headers or {}).items():
+            self.send_header(name, value)
+        self.end_headers()
+        self.wfile.write(body)
+
+    def _handle(self):
+        replay = self.server.replay
+        path, params = self._params()
+        replay.record_request(params.get("IdcService"))
+
+        if replay.latency:
+            time.sleep(replay.latency)
+        if replay.should_fail():
+            self._send(503, "<html><body>Service Unavailable</body></html>", headers={"Retry-After": "1"})
+            return
+        if path != SEARCH_PATH:
+            self._send(404, "Not Found")
+            return
+
+        service = params.get("IdcService")
+        if service == "TCEQ_SEARCH":
+            self._send(200, replay.search_form)
+        elif service == "TCEQ_PERFORM_SEARCH":
+            self._send(200, replay.results_page(params.get("StartRow"), params.get("QueryText")))
+        elif service == "GET_FILE":
+            did = params.get("dID", "0")
+            self._send(200, f"%PDF-1.4\n% replayed document {did}\n%%EOF\n", "application/pdf",
+                       {"Content-Disposition": f'attachment; filename="{did}.pdf"'})
+        else:
+            self._send(400, "Unknown IdcService")
+
+    do_GET = _handle
+    do_POST = _handle
+
+
+class ReplayServer:
+    """
+    Threaded replay server, usable as a context manager:
+
+        with ReplayServer(total_rows=2000, error_rate=0.05) as server:
+            client = TCEQClient(base_url=server.base_url)
+    """
+
+    def __init__(self, pages_dir=None, total_rows=450, page_size=200, error_rate=0.0,
+                 latency=0.0, host="127.0.0.1", port=0, seed=None, verbose=False):
+        self.error_rate = error_rate
+        self.latency = latency
+        self.page_size = page_size
+        self.verbose = verbose
+        self._random = random.Random(seed)
+        self._lock = threading.Lock()
+        self.request_counts = {}
+        self.rows = None
+        self._narrowed = {}
+
+        if pages_dir:
+            with open(os.path.join(pages_dir, "search_form.html"), encoding="utf-8") as f:
+                self.search_form = f.read()
+            self.pages = []
+            for path in sorted(glob.glob(os.path.join(pages_dir, "results_*.html"))):
+                with open(path, encoding="utf-8") as f:
+                    self.pages.append(f.read())
+        else:
+            self.search_form = make_search_form_page(SEARCH_PATH)
+            self.rows = make_result_rows(total_rows)
+            self.pages = paginate(self.rows, page_size)
+
+        self.httpd = ThreadingHTTPServer((host, port), _ReplayHandler)
+        self.httpd.daemon_threads = True
+        self.httpd.replay = self
+        self._thread = None
+
+    @property
+    def base_url(self):
+        host, port = self.httpd.server_address[:2]
+        return f"http://{host}:{port}{SEARCH_PATH}"
+
+    @property
+    def search_url(self):
+        return f"{self.base_url}?IdcService=TCEQ_SEARCH"
+
+    def should_fail(self):
+        with self._lock:
+            return self.error_rate and self._random.random() < self.error_rate
+
+    def record_request(self, service):
+        with self._lock:
+            self.request_counts[service] = self.request_counts.get(service, 0) + 1
+
+    def _pages_for(self, query_text):
+        """
+        Result pages for a search. A dInDate clause narrows synthesized rows to
+        those checked in on or after its date; recorded pages are served as is.
+        """
+        match = CHECKED_IN_CLAUSE.search(query_text or "")
+        if not match or self.rows is None:
+            return self.pages
+        cutoff = match.group(1)
+        with self._lock:
+            if cutoff not in self._narrowed:
+                since = datetime.strptime(cutoff, "%m/%d/%Y")
+                rows = [row for row in self.rows if row['checked_in'] >= since]
+                self._narrowed[cutoff] = paginate(rows, self.page_size, query_text)
+            return self._narrowed[cutoff]
+
+    def results_page(self, start_row, query_text=None):
+        pages = self._pages_for(query_text)
+        try:
+            index = (int(start_row) - 1) // self.page_size if start_row else 0
+        except ValueError:
+            index = 0
+        if 0 <= index < len(pages):
+            return pages[index]
+        return pages[-1] if pages else ""
+
+    def start(self):
+        self._thread = threading.Thread(target=self.httpd.serve_forever, daemon=True)
+        self._thread.start()
+        return self
+
+    def stop(self):
+        self.httpd.shutdown()
+        self.httpd.server_close()
+
+    def __enter__(self):
+        return self.start()
+
+    def __exit__(self, *exc_info):
+        self.stop()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Replay recorded TCEQ search pages locally.")
+    parser.add_argument("--pages", help="Directory with search_form.html and results_*.html")
+    parser.add_argument("--rows", type=int, default=450, help="Synthetic result rows when --pages is not given")
+    parser.add_argument("--page-size", type=int, default=200)
+    parser.add_argument("--error-rate", type=float, default=0.0, help="Fraction of requests answered with 503")
+    parser.add_argument("--latency", type=float, default=0.0, help="Seconds of delay added to every response")
+    parser.add_argument("--port", type=int, default=8765)
+    args = parser.parse_args(argv)
+
+    server = ReplayServer(args.pages, args.rows, args.page_size, args.error_rate, args.latency,
+                          port=args.port, verbose=True)
+    print(f"Replaying TCEQ pages at {server.search_url}")
+    try:
+        server.httpd.serve_forever()
+    except KeyboardInterrupt:
+        pass
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,281 @@
+import asyncio
+import random
+import threading
+import time
+import urllib.parse
+from email.utils import parsedate_to_datetime
+
+from tceq_metrics import METRICS
+
+
+class TCEQError(Exception):
+    """
+    Base class for errors the app can show to the user.
+    """
+
+
+class TCEQUnavailableError(TCEQError):
+    """
+    TCEQ Records Online is down, overloaded or unreachable (5xx, 429, timeouts).
+    """
+
+    def __init__(self, message, status_code=None, retry_after=None):
+        super().__init__(message)
+        self.status_code = status_code
+        self.retry_after = retry_after
+
+
+class CircuitOpenError(TCEQUnavailableError):
+    """
+    Raised without contacting the server while the circuit breaker is open.
+    """
+
+
+class TCEQLayoutError(TCEQError):
+    """
+    A TCEQ page did not have the expected structure (form fields, results table).
+    """
+
+
+class TCEQBrowserError(TCEQError):
+    """
+    The browser itself failed (crashed or unresponsive WebDriver), not TCEQ.
+    A pooled browser that raises it is recycled.
+    """
+
+
+RETRY_STATUSES = frozenset([429, 500, 502, 503, 504])
+
+
+def parse_retry_after(value):
+    """
+    Parse a Retry-After header (delta-seconds or HTTP-date) into seconds.
+    """
+    if not value:
+        return None
+    value = value.strip()
+    if value.isdigit():
+        return float(value)
+    try:
+        return max(0.0, parsedate_to_datetime(value).timestamp() - time.time())
+    except (TypeError, ValueError):
+        return None
+
+
+class RetryPolicy:
+    """
+    Jittered exponential backoff ("full jitter"): attempt n waits a random
+    time up to base_delay * 2**n, capped at max_delay. A server Retry-After
+    takes precedence when it asks for longer.
+    """
+
+    def __init__(self, max_attempts=4, base_delay=1.0, max_delay=30.0):
+        self.max_attempts = max_attempts
+        self.base_delay = base_delay
+        self.max_delay = max_delay
+
+    def delay(self, attempt, retry_after=None):
+        backoff = random.uniform(0, min(self.max_delay, self.base_delay * (2 ** attempt)))
+        if retry_after is not None:
+            return min(self.max_delay, max(backoff, retry_after))
+        return backoff
+
+
+class CircuitBreaker:
+    """
+    Fails fast while TCEQ is down. After failure_threshold consecutive
+    failures the circuit opens and calls raise CircuitOpenError for
+    reset_timeout seconds; then one trial call is let through (half-open)
+    and its outcome closes or re-opens the circuit.
+    """
+
+    CLOSED = "closed"
+    OPEN = "open"
+    HALF_OPEN = "half-open"
+
+    def __init__(self, failure_threshold=5, reset_timeout=60.0):
+        self.failure_threshold = failure_threshold
+        self.reset_timeout = reset_timeout
+        self._lock = threading.Lock()
+        self._failures = 0
+        self._opened_at = 0.0
+        self._state = self.CLOSED
+
+    @property
+    def state(self):
+        with self._lock:
+            return self._state
+
+    def before_request(self):
+        with self._lock:
+            if self._state == self.OPEN:
+                remaining = self.reset_timeout - (time.monotonic() - self._opened_at)
+                if remaining > 0:
+                    raise CircuitOpenError(
+                        f"TCEQ Records Online appears to be down; not retrying for {remaining:.0f}s.",
+                        retry_after=remaining
+                    )
+                self._state = self.HALF_OPEN
+            elif self._state == self.HALF_OPEN:
+                # Only the single trial call may proceed while half-open
+                raise CircuitOpenError("TCEQ Records Online is being re-checked; try again shortly.",
+                                       retry_after=1.0)
+
+    def record_success(self):
+        with self._lock:
+            self._failures = 0
+            self._state = self.CLOSED
+
+    def record_failure(self):
+        with self._lock:
+            self._failures += 1
+            if self._state == self.HALF_OPEN or self._failures >= self.failure_threshold:
+                if self._state != self.OPEN:
+                    METRICS.inc("tceq_circuit_opened_total", help="Times a circuit breaker opened.")
+                self._state = self.OPEN
+                self._opened_at = time.monotonic()
+
+
+_breakers = {}
+_breakers_lock = threading.Lock()
+
+
+def breaker_for(url):
+    """
+    The process-wide CircuitBreaker for url's host, shared by every client.
+    """
+    host = urllib.parse.urlparse(url).netloc
+    with _breakers_lock:
+        if host not in _breakers:
+            _breakers[host] = CircuitBreaker()
+        return _breakers[host]
+
+
+DEFAULT_RETRY_POLICY = RetryPolicy()
+
+
+class _Attempts:
+    """
+    Bookkeeping shared by call_with_retries and async_call_with_retries:
+    the breaker check, classifying each outcome for the breaker, and the
+    backoff between attempts. Only calling fn and sleeping differ between
+    the two.
+    """
+
+    def __init__(self, policy, breaker, description):
+        self.policy = policy or DEFAULT_RETRY_POLICY
+        self.breaker = breaker
+        self.description = description
+        self.failures = 0
+
+    def start(self):
+        if self.breaker:
+            self.breaker.before_request()
+
+    def succeeded(self):
+        # Also used when fn raised something other than TCEQUnavailableError:
+        # the server answered, so whatever went wrong is not an outage
+        if self.breaker:
+            self.breaker.record_success()
+
+    def retry_delay(self, error):
+        """
+        Seconds to wait before retrying after a TCEQUnavailableError, or None
+        to give up: when retries are used up, or for an open circuit.
+        """
+        if isinstance(error, CircuitOpenError):
+            return None
+        if self.breaker:
+            self.breaker.record_failure()
+        self.failures += 1
+        if self.failures >= self.policy.max_attempts:
+            return None
+        METRICS.inc("tceq_retries_total", help="Requests retried after a transient failure.",
+                    status=error.status_code or "error")
+        delay = self.policy.delay(self.failures - 1, error.retry_after)
+        print(f"{self.description} failed ({error}); retry {self.failures}/{self.policy.max_attempts - 1} in {delay:.1f}s...")
+        return delay
+
+
+def call_with_retries(fn, policy=None, breaker=None, description="TCEQ request"):
+    """
+    Call fn(), retrying TCEQUnavailableError with backoff and honoring the breaker.
+    Open-circuit errors and all other exceptions propagate immediately.
+    """
+    attempts = _Attempts(policy, breaker, description)
+    while True:
+        attempts.start()
+        try:
+            result = fn()
+        except TCEQUnavailableError as e:
+            delay = attempts.retry_delay(e)
+            if delay is None:
+                raise
+            time.sleep(delay)
+        except Exception:
+            attempts.succeeded()
+            raise
+        else:
+            attempts.succeeded()
+            return result
+
+
+def iter_with_retries(iter_fn, policy=None, breaker=None, description="TCEQ request"):
+    """
+    Streaming call_with_retries: yields the items of iter_fn(). A
+    TCEQUnavailableError raised before the first item is retried with a
+    fresh iter_fn(); once items have been handed out a retry would repeat
+    them, so later errors propagate, still counted by the breaker.
+    """
+    attempts = _Attempts(policy, breaker, description)
+    while True:
+        attempts.start()
+        items = iter_fn()
+        try:
+            first = next(items)
+        except StopIteration:
+            attempts.succeeded()
+            return
+        except TCEQUnavailableError as e:
+            delay = attempts.retry_delay(e)
+            if delay is None:
+                raise
+            time.sleep(delay)
+        except Exception:
+            attempts.succeeded()
+            raise
+        else:
+            break
+
+    attempts.succeeded()
+    yield first
+    try:
+        yield from items
+    except CircuitOpenError:
+        raise
+    except TCEQUnavailableError:
+        if breaker:
+            breaker.record_failure()
+        raise
+
+
+async def async_call_with_retries(fn, policy=None, breaker=None, description="TCEQ request"):
+    """
+    asyncio version of call_with_retries; fn is a coroutine function.
+    """
+    attempts = _Attempts(policy, breaker, description)
+    while True:
+        attempts.start()
+        try:
+            result = await fn()
+        except TCEQUnavailableError as e:
+            delay = attempts.retry_delay(e)
+            if delay is None:
+                raise
+            await asyncio.sleep(delay)
+        except Exception:
+            attempts.succeeded()
+            raise
+        else:
+            attempts.succeeded()
+            return result
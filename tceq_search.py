@@ -0,0 +1,97 @@
+import threading
+
+from tceq_client import TCEQClient
+from tceq_metrics import METRICS, span
+from tceq_resilience import TCEQError, TCEQUnavailableError
+
+
+class TCEQSearch:
+    """
+    One search entry point that prefers the cheap HTTP client and only
+    borrows a browser when it has to.
+
+    Each search runs on TCEQClient first. Its result is trusted when the
+    results table was found and the parsed row counts match the total TCEQ
+    reported (TCEQClient raises TCEQLayoutError otherwise). On a layout
+    error or any other failed HTTP search the query is re-run on the
+    BrowserPool. Outages (TCEQUnavailableError) are not retried in a browser:
+    it would hit the same server behind the same circuit breaker.
+
+    The engine that served each query is returned by search_with_engine(),
+    counted in engine_counts and exported as tceq_search_engine_total.
+    """
+
+    HTTP = "http"
+    SELENIUM = "selenium"
+
+    def __init__(self, http_client=None, browser_pool=None, cache=None):
+        self.http_client = http_client or TCEQClient(cache=cache)
+        self.browser_pool = browser_pool
+        self.engine_counts = {self.HTTP: 0, self.SELENIUM: 0}
+        self._lock = threading.Lock()
+
+    def _served_by(self, engine, rn_number):
+        print(f"Search for {rn_number} served by {engine}.")
+        METRICS.inc("tceq_search_engine_total", help="Searches served by each engine.", engine=engine)
+        with self._lock:
+            self.engine_counts[engine] += 1
+
+    def search_with_engine(self, rn_number, start_date=None, end_date=None, refresh=False, progress=None):
+        """
+        Returns (results, engine), engine being TCEQSearch.HTTP or TCEQSearch.SELENIUM.
+        Raises the HTTP error when there is no browser pool to fall back to.
+        """
+        with span("search_facade", rn=rn_number) as attributes:
+            try:
+                results = self.http_client.search_technical_reviews(rn_number, start_date, end_date, refresh)
+            except TCEQUnavailableError:
+                raise
+            except TCEQError as e:
+                if self.browser_pool is None:
+                    raise
+                print(f"HTTP search for {rn_number} failed ({e}); falling back to the browser.")
+                METRICS.inc("tceq_search_fallbacks_total", help="HTTP searches re-run in a browser.",
+                            reason=type(e).__name__)
+                results = self.browser_pool.search(rn_number, start_date, end_date, refresh, progress=progress)
+                engine = self.SELENIUM
+            else:
+                engine = self.HTTP
+            attributes["engine"] = engine
+        self._served_by(engine, rn_number)
+        return results, engine
+
+    def iter_search(self, rn_number, start_date=None, end_date=None, refresh=False, progress=None):
+        """
+        Streaming search_with_engine(): yields (rows, engine) page by page.
+        If the HTTP search fails part-way, the browser search starts over and
+        rows that were already yielded are skipped.
+        """
+        yielded = set()
+        fallback_error = None
+        try:
+            for rows in self.http_client.iter_search(rn_number, start_date, end_date, refresh):
+                yielded.update(doc.get('url') for doc in rows)
+                yield rows, self.HTTP
+        except TCEQUnavailableError:
+            raise
+        except TCEQError as e:
+            if self.browser_pool is None:
+                raise
+            fallback_error = e
+
+        if fallback_error is None:
+            self._served_by(self.HTTP, rn_number)
+            return
+
+        print(f"HTTP search for {rn_number} failed ({fallback_error}); falling back to the browser.")
+        METRICS.inc("tceq_search_fallbacks_total", help="HTTP searches re-run in a browser.",
+                    reason=type(fallback_error).__name__)
+        for rows in self.browser_pool.iter_search(rn_number, start_date, end_date, refresh, progress=progress):
+            yield [doc for doc in rows if doc.get('url') not in yielded], self.SELENIUM
+        self._served_by(self.SELENIUM, rn_number)
+
+    def search(self, rn_number, start_date=None, end_date=None, refresh=False, progress=None):
+        """
+        Same contract as BrowserPool.search: filtered results, TCEQError subclasses on failure.
+        """
+        return self.search_with_engine(rn_number, start_date, end_date, refresh, progress)[0]
@@ -5,15 +5,136 @@ from selenium.webdriver.common.by import By
 from selenium.webdriver.support.ui import WebDriverWait
 from selenium.webdriver.support import expected_conditions as EC
 from selenium.webdriver.support.ui import Select
+from selenium.common.exceptions import StaleElementReferenceException, TimeoutException
 from webdriver_manager.chrome import ChromeDriverManager
 import time
-from datetime import datetime
-from bs4 import BeautifulSoup
+from tceq_parser import parse_results_page
+from tceq_resilience import (TCEQBrowserError, TCEQError, TCEQLayoutError, TCEQUnavailableError, breaker_for,
+                             call_with_retries, iter_with_retries)
+from tceq_client import TCEQClient, filter_by_date
+from tceq_http import default_governor
+from tceq_metrics import METRICS, record_span, span
+
+_driver_path = None
+
+def _chromedriver_path():
+    """
+    Resolve the ChromeDriver binary once per process.
+    ChromeDriverManager().install() can hit the network, so its result is reused.
+    """
+    global _driver_path
+    if _driver_path is None:
+        print("Using webdriver_manager for Chrome...")
+        _driver_path = ChromeDriverManager().install()
+    return _driver_path
+
+class PhaseTimer:
+    """
+    Records wall-clock time spent in each named phase of a search.
+    Each mark() closes the phase that started at the previous mark and
+    records it as a span, so browser phases show up in the same metrics and
+    traces as the HTTP client's.
+    """
+
+    def __init__(self):
+        self.phases = []
+        self._last = time.perf_counter()
+
+    def mark(self, name, page=None):
+        now = time.perf_counter()
+        label = name if page is None else f"{name} (page {page})"
+        self.phases.append((label, now - self._last))
+        if page is None:
+            record_span(name, now - self._last, client="selenium")
+        else:
+            record_span(name, now - self._last, client="selenium", page=page)
+        self._last = now
+
+    def restart(self):
+        """
+        Start the next phase now, leaving the time since the last mark unrecorded.
+        """
+        self._last = time.perf_counter()
+
+    def total(self):
+        return sum(seconds for _, seconds in self.phases)
+
+    def report(self):
+        lines = [f"  {name:<24} {seconds:7.3f}s" for name, seconds in self.phases]
+        lines.append(f"  {'total':<24} {self.total():7.3f}s")
+        return "\n".join(lines)
+
+def _ajax_complete(driver):
+    """
+    Expected condition: document loaded and no jQuery AJAX requests in flight.
+    """
+    return driver.execute_script(
+        "return document.readyState === 'complete' && "
+        "(typeof jQuery === 'undefined' || jQuery.active === 0);"
+    )
+
+# Resources the search never needs; blocked in the lean profile
+BLOCKED_URL_PATTERNS = ["*.png", "*.jpg", "*.jpeg", "*.gif", "*.svg", "*.ico", "*.webp",
+                        "*.css", "*.woff", "*.woff2", "*.ttf", "*.otf", "*.eot"]
+
+UNAVAILABLE_MARKERS = ("Service Unavailable", "Service Temporarily Unavailable", "503 Service")
+
+def _page_unavailable(driver):
+    """
+    True if the browser is showing a server error page instead of TCEQ content.
+    """
+    text = driver.title + " " + driver.execute_script("return document.body ? document.body.innerText.slice(0, 500) : '';")
+    return any(marker in text for marker in UNAVAILABLE_MARKERS)
+
+def _results_ready(driver):
+    """
+    Expected condition: the results table, the 'No search results' message
+    or a server error page is showing.
+    """
+    if driver.find_elements(By.ID, "table_0"):
+        return True
+    body_text = driver.execute_script("return document.body ? document.body.innerText : '';")
+    return "No search results" in body_text or _page_unavailable(driver)
+
+class _results_page_changed:
+    """
+    Expected condition for in-place or full-page pagination: the old table_0
+    went stale, or its row count / first data row changed.
+    """
+
+    def __init__(self, old_table, old_row_count, old_first_row):
+        self.old_table = old_table
+        self.old_row_count = old_row_count
+        self.old_first_row = old_first_row
+
+    def __call__(self, driver):
+        try:
+            rows = self.old_table.find_elements(By.TAG_NAME, "tr")
+            if len(rows) != self.old_row_count:
+                return True
+            first_row = rows[1].text if len(rows) > 1 else ""
+            return first_row != self.old_first_row
+        except StaleElementReferenceException:
+            return True
 
 class TCEQSeleniumClient:
     BASE_URL = "https://records.tceq.texas.gov/cs/idcplg?IdcService=TCEQ_SEARCH"
 
-    def __init__(self, headless=True):
+    RECORD_SERIES = TCEQClient.RECORD_SERIES
+    KEYWORD = TCEQClient.KEYWORD
+    SORT = TCEQClient.SORT
+    # A navigation is timed until the page has rendered, which takes far longer
+    # than the HTTP reply; only loads slower than this slow the governor down
+    PAGE_LOAD_TARGET = 20.0
+
+    def __init__(self, headless=True, cache=None, base_url=None, lean=True, debug=None, governor=None):
+        # base_url is the search form URL, overridable e.g. for the local replay server
+        if base_url:
+            self.BASE_URL = base_url
+        # Every navigation waits for the rate governor shared with the HTTP clients
+        self.governor = governor or default_governor()
+        # Debug mode keeps a screenshot of every results page; TCEQ_DEBUG=1 turns it on
+        self.debug = bool(os.environ.get("TCEQ_DEBUG")) if debug is None else debug
         options = webdriver.ChromeOptions()
         if headless:
             options.add_argument("--headless")
@@ -21,6 +142,19 @@ class TCEQSeleniumClient:
         options.add_argument("--disable-dev-shm-usage")
         options.add_argument("--disable-gpu")
         options.add_argument("--window-size=1920,1080")
+        if lean:
+            # Performance profile: the search only needs the DOM, so don't wait for
+            # or download images, stylesheets and fonts
+            options.page_load_strategy = "eager"
+            options.add_argument("--blink-settings=imagesEnabled=false")
+            options.add_argument("--disable-extensions")
+            options.add_argument("--disable-background-networking")
+            options.add_argument("--mute-audio")
+            options.add_experimental_option("prefs", {
+                "profile.managed_default_content_settings.images": 2,
+                "profile.managed_default_content_settings.stylesheets": 2,
+                "profile.managed_default_content_settings.fonts": 2,
+            })
         
         # Check for system-installed Chromium and ChromeDriver (common in Streamlit Cloud)
         system_chromium = "/usr/bin/chromium"
@@ -32,35 +166,150 @@ class TCEQSeleniumClient:
             service = Service(system_chromedriver)
             self.driver = webdriver.Chrome(service=service, options=options)
         else:
-            print("Using webdriver_manager for Chrome...")
             # Use webdriver_manager to automatically handle driver installation
-            self.driver = webdriver.Chrome(service=Service(ChromeDriverManager().install()), options=options)
+            self.driver = webdriver.Chrome(service=Service(_chromedriver_path()), options=options)
+        
+        if lean:
+            try:
+                self.driver.execute_cdp_cmd("Network.enable", {})
+                self.driver.execute_cdp_cmd("Network.setBlockedURLs", {"urls": BLOCKED_URL_PATTERNS})
+            except Exception as e:
+                print(f"Could not block static resources: {e}")
             
         self.wait = WebDriverWait(self.driver, 20) # 20 seconds explicit wait
+        self._at_search_form = False
+        self.last_timings = None
+        # Optional SearchCache shared with other clients
+        self.cache = cache
 
     def close(self):
         if self.driver:
             self.driver.quit()
 
-    def search(self, rn_number, start_date=None, end_date=None):
+    def is_healthy(self):
+        """
+        Cheap liveness check: the browser responds and still has its window.
+        """
+        try:
+            return bool(self.driver.window_handles) and self.driver.execute_script("return document.readyState") is not None
+        except Exception:
+            return False
+
+    def reset(self):
+        """
+        Put the browser back on a fresh search form so the next search can start immediately.
+        """
+        self._at_search_form = False
+        self.driver.delete_all_cookies()
+        self._paced()
+        self.driver.get(self.BASE_URL)
+        self.wait.until(EC.presence_of_element_located((By.ID, "xRecordSeries")))
+        self._at_search_form = True
+
+    def search(self, rn_number, start_date=None, end_date=None, refresh=False, progress=None):
         """
         Perform a search using Selenium.
         Returns a list of dictionaries with document info.
+        With a cache configured, results come from it unless expired or refresh is set.
+        progress, if given, is called as progress(pages_parsed, rows_found) after each page.
+        Raises a TCEQError subclass if the search fails.
+        """
+        with span("search", client="selenium", rn=rn_number):
+            if self.cache:
+                key = self.cache.make_key(rn_number, self.RECORD_SERIES, self.KEYWORD, self.SORT)
+                results = self.cache.fetch(key, lambda: self.fetch_all(rn_number, progress), refresh)
+            else:
+                results = self.fetch_all(rn_number, progress)
+            
+            with span("filter", client="selenium"):
+                return filter_by_date(results, start_date, end_date)
+
+    def iter_search(self, rn_number, start_date=None, end_date=None, refresh=False, progress=None):
+        """
+        Streaming search(): yields the filtered rows of each result page as
+        soon as it is parsed. A cached search is yielded in one piece.
+        As in search(), an outage is retried behind the circuit breaker, but
+        only until the first page arrives, since rows are handed out from then on.
+        """
+        def iter_pages():
+            return iter_with_retries(lambda: self._iter_pages(rn_number, progress),
+                                     breaker=breaker_for(self.BASE_URL),
+                                     description=f"Selenium search for {rn_number}")
+
+        if self.cache:
+            key = self.cache.make_key(rn_number, self.RECORD_SERIES, self.KEYWORD, self.SORT)
+            pages = self.cache.stream(key, iter_pages, refresh)
+        else:
+            pages = iter_pages()
+        for rows in pages:
+            yield filter_by_date(rows, start_date, end_date)
+
+    def fetch_all(self, rn_number, progress=None, retry_policy=None):
+        """
+        Every Technical Review row for the RN, unfiltered. A search that hits a
+        server error page is retried with backoff (retry_policy, or the
+        default) behind the same circuit breaker the HTTP clients use.
+        """
+        return call_with_retries(
+            lambda: self._search_all(rn_number, progress),
+            retry_policy,
+            breaker=breaker_for(self.BASE_URL),
+            description=f"Selenium search for {rn_number}"
+        )
+
+    def _paced(self):
+        """
+        Wait for the rate governor before a navigation. Returns the start time
+        to pass to _check_available once the page has loaded.
+        """
+        self.governor.acquire(self.BASE_URL)
+        return time.perf_counter()
+
+    def _check_available(self, started=None):
+        unavailable = _page_unavailable(self.driver)
+        if started is not None:
+            self.governor.record(self.BASE_URL, time.perf_counter() - started, 503 if unavailable else 200,
+                                 latency_target=self.PAGE_LOAD_TARGET)
+        if unavailable:
+            self._at_search_form = False
+            raise TCEQUnavailableError("TCEQ Records Online returned a 503 Service Unavailable page.", status_code=503)
+
+    def _search_all(self, rn_number, progress=None):
+        """
+        Every Technical Review row across all pages, unfiltered.
+        """
+        return [row for rows in self._iter_pages(rn_number, progress) for row in rows]
+
+    def _iter_pages(self, rn_number, progress=None):
         """
+        Drive the search form and yield the Technical Review rows of each page, unfiltered.
+        Raises a TCEQError subclass if the search failed: TCEQUnavailableError
+        when TCEQ was down or a page did not load in time, TCEQBrowserError
+        when the browser itself failed.
+        Per-phase timings of the search are kept in self.last_timings.
+        """
+        timer = PhaseTimer()
+        self.last_timings = timer
         try:
-            print(f"Navigating to {self.BASE_URL}...")
-            self.driver.get(self.BASE_URL)
+            # A pooled browser may already be sitting on a fresh search form
+            if not self._at_search_form:
+                print(f"Navigating to {self.BASE_URL}...")
+                started = self._paced()
+                self.driver.get(self.BASE_URL)
+                self._check_available(started)
+            self._at_search_form = False
+            timer.mark("form_bootstrap")
             
             # 1. Select 'AIR / New Source Review Permit'
             print("Selecting Record Series...")
             record_series_select = self.wait.until(EC.presence_of_element_located((By.ID, "xRecordSeries")))
-            Select(record_series_select).select_by_value("1081") # 1081 = AIR / New Source Review Permit
+            Select(record_series_select).select_by_value(self.RECORD_SERIES) # 1081 = AIR / New Source Review Permit
             
             # 1.5 Select 'Permits' in Document Type to narrow results
             print("Selecting 'Permits' Document Type...")
             try:
-                # Wait for AJAX update
-                time.sleep(1)
+                # Wait for the AJAX update triggered by the record series change
+                self.wait.until(_ajax_complete)
                 doc_type_select = self.wait.until(EC.presence_of_element_located((By.ID, "xInsightDocumentType")))
                 Select(doc_type_select).select_by_value("27") # 27 = Permits
             except Exception as e:
@@ -81,12 +330,13 @@ class TCEQSeleniumClient:
                     print("Attempting fallback to 4th select for RN field.")
                 except:
                     self.driver.save_screenshot("error_no_rn_dropdown.png")
-                    return []
+                    raise TCEQLayoutError("Could not find the 'Central Registry RN' field on the search form.")
 
             # 2. Select 'Central Registry RN'
             Select(target_select).select_by_value("xRefNumTxt") 
             
-            time.sleep(1) 
+            self.wait.until(_ajax_complete)
+            timer.mark("select_criteria")
             
             # 3. Enter RN Number
             print(f"Entering RN: {rn_number}")
@@ -97,7 +347,7 @@ class TCEQSeleniumClient:
                     rn_input = self.wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "input.wideInput")))
                 except:
                     print("Could not find RN input.")
-                    return []
+                    raise TCEQLayoutError("Could not find the RN input on the search form.")
             
             rn_input.clear()
             rn_input.send_keys(rn_number)
@@ -108,13 +358,13 @@ class TCEQSeleniumClient:
                 # Use a specific CSS selector to skip hidden input with same name
                 search_input = self.wait.until(EC.element_to_be_clickable((By.CSS_SELECTOR, "input[name='ftx'][type='text']")))
                 search_input.clear()
-                search_input.send_keys("Technical Review")
+                search_input.send_keys(self.KEYWORD)
             except Exception as e:
                 print(f"Could not find visible 'ftx' input: {e}")
                 try:
                     search_input = self.driver.find_element(By.ID, "MiniSearchText")
                     search_input.clear()
-                    search_input.send_keys("Technical Review")
+                    search_input.send_keys(self.KEYWORD)
                 except:
                     print("Could not find any search keyword input.")
 
@@ -128,8 +378,12 @@ class TCEQSeleniumClient:
             except:
                 pass
                 
+            timer.mark("fill_form")
+            
             # 5. Click Search
             print("Clicking Search...")
+            form_page = self.driver.find_element(By.TAG_NAME, "html")
+            started = self._paced()
             try:
                 search_btn = self.wait.until(EC.element_to_be_clickable((By.XPATH, "(//button[contains(text(), 'Search')])[last()]")))
                 search_btn.click()
@@ -139,101 +393,48 @@ class TCEQSeleniumClient:
                     search_btn.click()
                 except:
                     print("Could not find any Search button.")
-                    return []
+                    raise TCEQLayoutError("Could not find the Search button on the search form.")
             
             # 6. Parse Results
             print("Waiting for results...")
-            time.sleep(3) 
+            self.wait.until(EC.staleness_of(form_page))
+            self.wait.until(_results_ready)
+            self._check_available(started)
+            self.wait.until(_ajax_complete)
+            timer.mark("submit")
             
-            self.driver.save_screenshot("search_results_page.png")
+            if self.debug:
+                self.driver.save_screenshot("search_results_page.png")
             
-            results = []
+            rows_found = 0
             
             # Pagination loop
             page_num = 1
             while True:
-                soup = BeautifulSoup(self.driver.page_source, 'html.parser')
-                page_text = soup.get_text()
+                page_source = self.driver.page_source
+                METRICS.inc("tceq_response_bytes_total", len(page_source), client="selenium")
+                page = parse_results_page(page_source, self.driver.current_url, self.KEYWORD)
                 
-                if "No search results" in page_text:
+                if page['no_results']:
                     print(f"No results found on page {page_num}.")
                     break
-                    
-                # Find specific results table
-                try:
-                    # Use BeautifulSoup for faster parsing of the table if rows are many
-                    results_table = soup.find('table', id='table_0')
-                    if not results_table:
-                        print(f"Could not find results table (id='table_0') on page {page_num}.")
-                        break
-                        
-                    rows = results_table.find_all('tr')
-                    print(f"Parsing page {page_num}: Found {len(rows)} rows in results table.")
-                except Exception as e:
-                    print(f"Error finding results table on page {page_num}: {e}")
+                if not page['has_table']:
+                    print(f"Could not find results table (id='table_0') on page {page_num}.")
+                    if page_num == 1:
+                        raise TCEQLayoutError("The results page has no results table (id='table_0'); the page layout may have changed.")
                     break
                 
-                # Identify column indices from header
-                header_cells = rows[0].find_all(['th', 'td'])
-                header_texts = [h.get_text(strip=True) for h in header_cells]
-                
-                try:
-                    title_idx = header_texts.index('Title')
-                except ValueError:
-                    title_idx = 12 # Fallback
+                print(f"Parsing page {page_num}: Found {len(page['rows'])} Technical Review rows.")
+                rows_found += len(page['rows'])
+                METRICS.inc("tceq_pages_total", client="selenium")
+                METRICS.inc("tceq_rows_total", len(page['rows']), client="selenium")
                 
-                try:
-                    # Prefer 'Begin Date' or just 'Date'
-                    date_idx = header_texts.index('Begin Date')
-                except ValueError:
-                    try:
-                        date_idx = header_texts.index('Date')
-                    except ValueError:
-                        date_idx = 14 # Fallback
-                
-                # Skip header row
-                for row in rows[1:]:
-                    try:
-                        cols = row.find_all('td')
-                        if len(cols) <= max(title_idx, date_idx):
-                            continue
-                            
-                        title = cols[title_idx].get_text(strip=True)
-                        date_str = cols[date_idx].get_text(strip=True)
-                        
-                        # STRICT FILTERING: Only include if "Technical Review" is in the title
-                        if "technical review" not in title.lower():
-                            continue
-                            
-                        # Extract Link - try Content ID column (index 2) or any link
-                        link_tag = row.find('a', href=True)
-                        href = link_tag['href'] if link_tag else ""
-                        if href and not href.startswith('http'):
-                            href = "https://records.tceq.texas.gov" + href
-                            
-                        doc_date = None
-                        if date_str:
-                            try:
-                                date_part = date_str.split()[0]
-                                doc_date = datetime.strptime(date_part, "%m/%d/%Y")
-                            except:
-                                pass
-                                
-                        # Filter by date range
-                        if start_date and doc_date and doc_date < start_date:
-                            continue
-                        if end_date and doc_date and doc_date > end_date:
-                            continue
-                            
-                        results.append({
-                            "title": title,
-                            "url": href,
-                            "date": date_str
-                        })
-                        
-                    except Exception as e:
-                        print(f"Error parsing row: {e}")
-                        continue
+                timer.mark("parse", page_num)
+                if progress:
+                    progress(page_num, rows_found)
+                yield page['rows']
+                # Time the caller spent on the rows is not part of the next page load
+                timer.restart()
                 
                 # Check for Next Page
                 try:
@@ -243,19 +444,39 @@ class TCEQSeleniumClient:
                         # Click the last one (usually bottom) or first (usually top)
                         next_link = next_buttons[-1]
                         print(f"Navigating to page {page_num + 1}...")
+                        old_table = self.driver.find_element(By.ID, "table_0")
+                        old_rows = old_table.find_elements(By.TAG_NAME, "tr")
+                        old_first_row = old_rows[1].text if len(old_rows) > 1 else ""
+                        started = self._paced()
                         next_link.click()
                         page_num += 1
-                        time.sleep(3) # Wait for page load
+                        # Wait until the old table is replaced or its rows change, then for AJAX to settle
+                        self.wait.until(_results_page_changed(old_table, len(old_rows), old_first_row))
+                        self.wait.until(_results_ready)
+                        self._check_available(started)
+                        self.wait.until(_ajax_complete)
+                        timer.mark("page_load", page_num)
                     else:
                         print(f"No 'Next' button found on page {page_num}. Ending pagination.")
                         break
+                except TCEQError:
+                    raise
                 except Exception as e:
                     print(f"Ending pagination on page {page_num}: {e}")
                     break
-                        
-            return results
 
+        except TCEQError:
+            raise
+        except TimeoutException as e:
+            # The page never finished loading: TCEQ is slow, which counts against its breaker
+            self._at_search_form = False
+            raise TCEQUnavailableError(f"TCEQ did not finish loading the page: {e.msg or 'timed out'}") from e
         except Exception as e:
             print(f"Selenium Error: {e}")
-            self.driver.save_screenshot("selenium_error.png")
-            return []
+            try:
+                self.driver.save_screenshot("selenium_error.png")
+            except Exception:
+                pass
+            raise TCEQBrowserError(f"Browser search failed: {e}") from e
+        finally:
+            print(f"Search timing for {rn_number}:\n{timer.report()}")
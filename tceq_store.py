@@ -0,0 +1,213 @@
+"""
+Content-addressed store of downloaded Technical Review documents.
+
+Every downloaded file is kept once under blobs/, named by the SHA-256 of its
+content, and a SQLite index maps each document id (normally the dID) to its
+blob and each RN to the document ids found under it. The same PDF listed
+under several RNs, searches or runs is therefore fetched and stored once:
+
+    store = DocumentStore("tceq_store")
+    downloader = DocumentDownloader("downloads", store=store)
+
+Download directories get hard links to the blobs (or copies where a hard
+link is not possible, e.g. across file systems), so a repeat or overlapping
+audit costs neither bandwidth nor disk.
+"""
+import argparse
+import hashlib
+import os
+import shutil
+import sqlite3
+import threading
+import time
+
+from tceq_metrics import METRICS
+
+DEFAULT_STORE_DIR = "tceq_store"
+CHUNK_SIZE = 64 * 1024
+
+
+def file_sha256(path, chunk_size=CHUNK_SIZE):
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def link_file(src, dest):
+    """
+    Atomically make dest a hard link to src, falling back to a copy.
+    The temporary name is unique to this process and thread, so concurrent
+    links to the same dest never share it.
+    """
+    tmp_path = f"{dest}.{os.getpid()}.{threading.get_ident()}.link"
+    if os.path.exists(tmp_path):
+        os.remove(tmp_path)
+    try:
+        try:
+            os.link(src, tmp_path)
+        except OSError:
+            shutil.copyfile(src, tmp_path)
+        os.replace(tmp_path, dest)
+    finally:
+        # Also left behind when dest already linked src: rename() is then a no-op
+        if os.path.exists(tmp_path):
+            os.remove(tmp_path)
+    return dest
+
+
+class DocumentStore:
+    """
+    Blobs keyed by content hash, plus a SQLite index of document id -> blob
+    and RN -> document ids. Safe to share between download threads.
+    """
+
+    def __init__(self, root=DEFAULT_STORE_DIR):
+        self.root = root
+        self.blob_dir = os.path.join(root, "blobs")
+        os.makedirs(self.blob_dir, exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(os.path.join(root, "store.sqlite3"), check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS documents ("
+            " doc_id TEXT PRIMARY KEY,"
+            " sha256 TEXT NOT NULL,"
+            " ext TEXT NOT NULL,"
+            " size INTEGER NOT NULL,"
+            " title TEXT,"
+            " date TEXT,"
+            " url TEXT,"
+            " stored_at REAL NOT NULL)"
+        )
+        self._conn.execute("CREATE INDEX IF NOT EXISTS documents_sha256 ON documents (sha256)")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS rn_documents ("
+            " rn TEXT NOT NULL,"
+            " doc_id TEXT NOT NULL,"
+            " PRIMARY KEY (rn, doc_id))"
+        )
+        self._conn.commit()
+
+    def blob_path(self, sha256, ext):
+        return os.path.join(self.blob_dir, sha256[:2], sha256 + ext)
+
+    def lookup(self, doc_id):
+        """
+        Path of the stored blob for doc_id, or None if it is not in the store.
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT sha256, ext FROM documents WHERE doc_id = ?", (doc_id,)).fetchone()
+        if row is None:
+            return None
+        path = self.blob_path(*row)
+        return path if os.path.exists(path) else None
+
+    def add(self, doc_id, path, doc=None, rn=None):
+        """
+        Put a downloaded file in the store and return its blob path. If the
+        same content is already stored (e.g. under another dID), path is
+        replaced with a link to the existing blob, so the bytes exist once.
+        A document id already in the store is only tagged with the RN.
+        """
+        blob = self.lookup(doc_id)
+        if blob is None:
+            sha256 = file_sha256(path)
+            ext = os.path.splitext(path)[1].lower()
+            blob = self.blob_path(sha256, ext)
+            os.makedirs(os.path.dirname(blob), exist_ok=True)
+            if not os.path.exists(blob):
+                link_file(path, blob)
+            elif not os.path.samefile(blob, path):
+                METRICS.inc("tceq_store_dedup_bytes_total", os.path.getsize(path),
+                            help="Bytes of downloads that duplicated a stored document.")
+                link_file(blob, path)
+            doc = doc or {}
+            with self._lock:
+                self._conn.execute(
+                    "INSERT OR REPLACE INTO documents (doc_id, sha256, ext, size, title, date, url, stored_at)"
+                    " VALUES (?, ?, ?, ?, ?, ?, ?, ?)",
+                    (doc_id, sha256, ext, os.path.getsize(blob), doc.get('title'), doc.get('date'),
+                     doc.get('url'), time.time())
+                )
+                self._conn.commit()
+        if rn:
+            self.tag(rn, [doc_id])
+        return blob
+
+    def checkout(self, doc_id, dest_dir, rn=None):
+        """
+        Link the stored copy of doc_id into dest_dir as <doc_id><ext> and
+        return its path, or None if the document is not in the store.
+        """
+        blob = self.lookup(doc_id)
+        if blob is None:
+            return None
+        METRICS.inc("tceq_store_hits_total", help="Downloads served from the local document store.")
+        if rn:
+            self.tag(rn, [doc_id])
+        return link_file(blob, os.path.join(dest_dir, doc_id + os.path.splitext(blob)[1]))
+
+    def tag(self, rn, doc_ids):
+        """
+        Record that doc_ids were found under rn.
+        """
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO rn_documents (rn, doc_id) VALUES (?, ?)",
+                [(rn, doc_id) for doc_id in doc_ids]
+            )
+            self._conn.commit()
+
+    def doc_ids(self, rn):
+        with self._lock:
+            rows = self._conn.execute("SELECT doc_id FROM rn_documents WHERE rn = ? ORDER BY doc_id", (rn,)).fetchall()
+        return [doc_id for (doc_id,) in rows]
+
+    def rns(self, doc_id):
+        with self._lock:
+            rows = self._conn.execute("SELECT rn FROM rn_documents WHERE doc_id = ? ORDER BY rn", (doc_id,)).fetchall()
+        return [rn for (rn,) in rows]
+
+    def stats(self):
+        """
+        Counts of documents, distinct blobs, RNs and stored bytes.
+        """
+        with self._lock:
+            documents, blobs = self._conn.execute(
+                "SELECT COUNT(*), COUNT(DISTINCT sha256) FROM documents").fetchone()
+            size = self._conn.execute(
+                "SELECT COALESCE(SUM(size), 0) FROM (SELECT DISTINCT sha256, size FROM documents)").fetchone()[0]
+            rns = self._conn.execute("SELECT COUNT(DISTINCT rn) FROM rn_documents").fetchone()[0]
+        return {"documents": documents, "blobs": blobs, "rns": rns, "bytes": size}
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Inspect the local content-addressed document store.")
+    parser.add_argument("--store", default=DEFAULT_STORE_DIR, help="Store directory")
+    commands = parser.add_subparsers(dest="command", required=True)
+    commands.add_parser("stats", help="Show document, blob and RN counts")
+    rn_cmd = commands.add_parser("rn", help="List the stored documents found under an RN")
+    rn_cmd.add_argument("rn")
+    args = parser.parse_args(argv)
+
+    store = DocumentStore(args.store)
+    try:
+        if args.command == "stats":
+            stats = store.stats()
+            print(f"{stats['documents']} documents in {stats['blobs']} blobs ({stats['bytes']} bytes) "
+                  f"across {stats['rns']} RNs.")
+        else:
+            for doc_id in store.doc_ids(args.rn):
+                print(f"{doc_id}\t{store.lookup(doc_id) or ''}")
+    finally:
+        store.close()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,198 @@
+import argparse
+import sqlite3
+import sys
+import threading
+import time
+from datetime import datetime
+
+from tceq_batch import TCEQBatchRunner, parse_date_arg, read_rn_list
+from tceq_client import filter_by_date
+from tceq_downloader import DocumentDownloader, document_id
+from tceq_http import PooledSession, governor_path, shared_governor
+from tceq_index import DocumentIndex
+from tceq_store import DocumentStore
+
+DEFAULT_MANIFEST_PATH = "tceq_manifest.sqlite3"
+
+
+class SyncManifest:
+    """
+    Local record of every document already seen per RN, keyed by dID, and of
+    the date range each RN was last synced for.
+    """
+
+    def __init__(self, path=DEFAULT_MANIFEST_PATH):
+        self.path = path
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(path, check_same_thread=False, timeout=30)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS seen_documents ("
+            " rn TEXT NOT NULL,"
+            " doc_id TEXT NOT NULL,"
+            " doc_date TEXT,"
+            " title TEXT,"
+            " url TEXT,"
+            " first_seen REAL NOT NULL,"
+            " PRIMARY KEY (rn, doc_id))"
+        )
+        self._conn.execute(
+            "CREATE TABLE IF NOT EXISTS sync_runs ("
+            " rn TEXT PRIMARY KEY,"
+            " last_run REAL NOT NULL,"
+            " start_date TEXT,"
+            " end_date TEXT)"
+        )
+        self._conn.commit()
+
+    def seen_ids(self, rn_number):
+        with self._lock:
+            rows = self._conn.execute("SELECT doc_id FROM seen_documents WHERE rn = ?", (rn_number,)).fetchall()
+        return {doc_id for (doc_id,) in rows}
+
+    def last_run(self, rn_number):
+        with self._lock:
+            row = self._conn.execute("SELECT last_run FROM sync_runs WHERE rn = ?", (rn_number,)).fetchone()
+        return row[0] if row else None
+
+    def covers(self, rn_number, start_date=None, end_date=None):
+        """
+        True when the last run for rn_number synced a date range that contains
+        start_date..end_date (None meaning unbounded).
+        """
+        with self._lock:
+            row = self._conn.execute("SELECT start_date, end_date FROM sync_runs WHERE rn = ?", (rn_number,)).fetchone()
+        if row is None:
+            return False
+        synced_start, synced_end = (datetime.fromisoformat(value) if value else None for value in row)
+        if synced_start and (start_date is None or start_date < synced_start):
+            return False
+        if synced_end and (end_date is None or end_date > synced_end):
+            return False
+        return True
+
+    def record(self, rn_number, docs, start_date=None, end_date=None):
+        """
+        Mark docs as seen and remember the date range this run synced.
+        """
+        now = time.time()
+        with self._lock:
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO seen_documents (rn, doc_id, doc_date, title, url, first_seen) VALUES (?, ?, ?, ?, ?, ?)",
+                [(rn_number, document_id(doc), doc.get('date'), doc.get('title'), doc.get('url'), now) for doc in docs]
+            )
+            self._conn.execute(
+                "INSERT OR REPLACE INTO sync_runs (rn, last_run, start_date, end_date) VALUES (?, ?, ?, ?)",
+                (rn_number, now, start_date.isoformat() if start_date else None, end_date.isoformat() if end_date else None)
+            )
+            self._conn.commit()
+
+    def close(self):
+        with self._lock:
+            self._conn.close()
+
+
+class IncrementalSync(TCEQBatchRunner):
+    """
+    Batch runner that only returns documents not seen on a previous run.
+
+    Results come back sorted by dInDate descending, so paging stops at the
+    first document already in the manifest. An RN that was synced before
+    normally costs a single result page. RNs never synced, or last synced for
+    a narrower date range, are fetched in full with concurrent pagination.
+    New documents in the date range are optionally downloaded.
+
+    Only documents in the date range are recorded as seen, so widening the
+    range later still finds the rest. With a downloader, nothing newer than
+    a failed download is recorded either, so the next run retries it.
+    """
+
+    def __init__(self, manifest, downloader=None, max_workers=4, max_per_host=4, requests_per_second=None,
+                 base_url=None, governor=None):
+        super().__init__(max_workers, max_per_host, requests_per_second, base_url=base_url, governor=governor)
+        self.manifest = manifest
+        self.downloader = downloader
+
+    def _new_documents(self, rn_number, start_date=None, end_date=None):
+        client = self._client()
+        seen = self.manifest.seen_ids(rn_number)
+        if not seen or not self.manifest.covers(rn_number, start_date, end_date):
+            return [doc for doc in client._fetch_all(rn_number) if document_id(doc) not in seen]
+
+        new_docs = []
+        for page in client.iter_pages(rn_number):
+            for doc in page:
+                if document_id(doc) in seen:
+                    return new_docs
+                new_docs.append(doc)
+        return new_docs
+
+    def _search_one(self, rn_number, start_date, end_date, refresh):
+        new_docs = self._new_documents(rn_number, start_date, end_date)
+        wanted = filter_by_date(new_docs, start_date, end_date)
+        print(f"{rn_number}: {len(wanted)} new documents since last run.")
+        done = wanted
+        if self.downloader and wanted:
+            # Tagged with the RN so the full-text index can record it
+            tagged = [doc.with_rn(rn_number) for doc in wanted]
+            failed = {document_id(doc) for doc, _, error in self.downloader.iter_download(tagged) if error}
+            if failed:
+                # The next run pages only down to the newest recorded document, so
+                # nothing newer than a failed download may be recorded
+                last_failed = max(i for i, doc in enumerate(wanted) if document_id(doc) in failed)
+                done = wanted[last_failed + 1:]
+                print(f"{rn_number}: {len(failed)} downloads failed; they will be retried next run.")
+        # Record only after downloads, and not failed ones, so the next run retries them
+        self.manifest.record(rn_number, done, start_date, end_date)
+        return wanted
+
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Fetch only Technical Reviews that are new since the last run.")
+    parser.add_argument("rn_file", help="Watchlist file with one RN per line ('-' for stdin)")
+    parser.add_argument("--manifest", default=DEFAULT_MANIFEST_PATH, help="SQLite manifest of seen documents")
+    parser.add_argument("--download", metavar="DIR", help="Also download new documents into DIR")
+    parser.add_argument("--index", metavar="PATH", help="Add downloaded documents to this full-text index")
+    parser.add_argument("--store", metavar="DIR", help="Keep downloads in this content-addressed store; "
+                                                     "documents already in it are linked instead of fetched")
+    parser.add_argument("--start-date", help="YYYY-MM-DD")
+    parser.add_argument("--end-date", help="YYYY-MM-DD")
+    parser.add_argument("--workers", type=int, default=4)
+    parser.add_argument("--rps", type=float,
+                        help="Cap this run at this many requests per second (default: the shared adaptive rate)")
+    args = parser.parse_args(argv)
+
+    if args.rn_file == "-":
+        rns = read_rn_list(sys.stdin)
+    else:
+        with open(args.rn_file) as f:
+            rns = read_rn_list(f)
+
+    start_date = parse_date_arg(args.start_date)
+    end_date = parse_date_arg(args.end_date, end_of_day=True)
+
+    manifest = SyncManifest(args.manifest)
+    # Kept beside the manifest, so overlapping syncs and CLI runs there share one rate
+    governor = shared_governor(governor_path(args.manifest))
+    store = DocumentStore(args.store) if args.store and args.download else None
+    index = DocumentIndex(args.index) if args.index and args.download else None
+    downloader = None
+    if args.download:
+        session = PooledSession(rate_limiter=governor, pool_size=args.workers)
+        downloader = DocumentDownloader(args.download, max_workers=args.workers, session=session, index=index,
+                                        store=store)
+    sync = IncrementalSync(manifest, downloader, max_workers=args.workers, requests_per_second=args.rps,
+                           governor=governor)
+    total = 0
+    try:
+        for rn, results, error in sync.iter_results(rns, start_date, end_date):
+            total += len(results)
+            for doc in results:
+                print(f"{rn}\t{doc.get('date', '')}\t{doc.get('title', '')}\t{doc.get('url', '')}")
+    finally:
+        sync.close()
+    print(f"{total} new documents across {len(rns)} RNs.", file=sys.stderr)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,130 @@
+"""
+Offline benchmark suite: runs both search clients against the local replay
+server instead of records.tceq.texas.gov.
+
+    pip install -r requirements-dev.txt
+    python -m pytest test_benchmark_replay.py --benchmark-only
+
+Each benchmark records end-to-end search latency; pages/sec and parse time
+per row are attached as extra_info in the benchmark report. Selenium
+benchmarks are skipped when Chrome is not available.
+"""
+import importlib.util
+import shutil
+import time
+
+import pytest
+
+from tceq_client import TCEQClient
+from tceq_fixtures import TITLES, make_result_pages
+from tceq_parser import parse_results
+from tceq_replay_server import ReplayServer
+
+RN = "RN100223445"
+
+
+def _expected_rows(total_rows):
+    return sum(1 for i in range(total_rows) if "technical review" in TITLES[i % len(TITLES)].lower())
+
+
+def _chrome_available():
+    if importlib.util.find_spec("selenium") is None:
+        return False
+    return any(shutil.which(name) for name in ("chromium", "chromium-browser", "google-chrome", "chrome"))
+
+
+requires_chrome = pytest.mark.skipif(not _chrome_available(), reason="Chrome/Selenium not available")
+
+
+@pytest.fixture(scope="module")
+def single_page_server():
+    with ReplayServer(total_rows=200, page_size=200) as server:
+        yield server
+
+
+@pytest.fixture(scope="module")
+def multi_page_server():
+    with ReplayServer(total_rows=2000, page_size=200) as server:
+        yield server
+
+
+@pytest.fixture(scope="module")
+def degraded_server():
+    # 10% injected 503s and 50 ms added latency per response
+    with ReplayServer(total_rows=2000, page_size=200, error_rate=0.1, latency=0.05, seed=7) as server:
+        yield server
+
+
+def _mean_seconds(benchmark):
+    # benchmark.stats is None under --benchmark-disable
+    return benchmark.stats.stats.mean if benchmark.stats else None
+
+
+def _record_throughput(benchmark, pages):
+    mean = _mean_seconds(benchmark)
+    benchmark.extra_info["pages"] = pages
+    benchmark.extra_info["pages_per_sec"] = round(pages / mean, 2) if mean else None
+
+
+def test_http_client_single_page(benchmark, single_page_server):
+    client = TCEQClient(base_url=single_page_server.base_url)
+    results = benchmark(client.search_technical_reviews, RN)
+    assert len(results) == _expected_rows(200)
+    _record_throughput(benchmark, 1)
+
+
+def test_http_client_multi_page(benchmark, multi_page_server):
+    client = TCEQClient(base_url=multi_page_server.base_url)
+    results = benchmark(client.search_technical_reviews, RN)
+    assert len(results) == _expected_rows(2000)
+    _record_throughput(benchmark, 10)
+
+
+def test_http_client_degraded_server(benchmark, degraded_server):
+    client = TCEQClient(base_url=degraded_server.base_url)
+    benchmark.pedantic(client.search_technical_reviews, args=(RN,), rounds=5)
+    _record_throughput(benchmark, 10)
+
+
+def test_parse_time_per_row(benchmark):
+    total_rows = 2000
+    pages = make_result_pages(total_rows)
+    rows = benchmark(lambda: sum(len(parse_results(page, TCEQClient.BASE_URL)) for page in pages))
+    assert rows == _expected_rows(total_rows)
+    mean = _mean_seconds(benchmark)
+    benchmark.extra_info["us_per_row"] = round(mean / total_rows * 1e6, 2) if mean else None
+
+
+@requires_chrome
+@pytest.mark.parametrize("lean", [True, False], ids=["lean", "full"])
+def test_selenium_client_multi_page(benchmark, multi_page_server, lean):
+    from tceq_selenium_client import TCEQSeleniumClient
+
+    client = TCEQSeleniumClient(headless=True, base_url=multi_page_server.search_url, lean=lean)
+    try:
+        results = benchmark.pedantic(client.search, args=(RN,), rounds=3)
+        assert len(results) == _expected_rows(2000)
+        _record_throughput(benchmark, 10)
+    finally:
+        client.close()
+
+
+def test_replay_server_serves_all_pages(multi_page_server):
+    client = TCEQClient(base_url=multi_page_server.base_url)
+    start = time.perf_counter()
+    results = client.search_technical_reviews(RN)
+    assert len(results) == _expected_rows(2000)
+    assert time.perf_counter() - start < 30
+
+
+def test_time_to_first_page(benchmark, multi_page_server):
+    client = TCEQClient(base_url=multi_page_server.base_url)
+
+    def first_page():
+        pages = client.iter_search(RN)
+        rows = next(pages)
+        pages.close()
+        return rows
+
+    rows = benchmark(first_page)
+    assert rows == client.search_technical_reviews(RN)[:len(rows)]
@@ -0,0 +1,117 @@
+import asyncio
+
+import httpx
+
+from tceq_async_client import AsyncTCEQClient
+from tceq_fixtures import make_result_pages, make_result_rows
+from tceq_resilience import RetryPolicy, TCEQLayoutError, TCEQUnavailableError
+
+RN = "RN100223445"
+BODY = b"%PDF-1.4 " + b"x" * 1000
+DOC = {"title": "Technical Review", "url": "https://records.tceq.texas.gov/cs/idcplg?dID=5000001", "dID": "5000001"}
+SEARCH_FORM = "<form><input type='hidden' name='IdcService' value='TCEQ_PERFORM_SEARCH'></form>"
+
+
+def _search_handler(pages, requests):
+    def handle(request):
+        params = dict(request.url.params)
+        if request.method == "POST":
+            params.update(httpx.QueryParams(request.content.decode()))
+        requests.append((request.method, params.get("StartRow")))
+        if params.get("IdcService") == "TCEQ_SEARCH":
+            return httpx.Response(200, text=SEARCH_FORM)
+        start_row = int(params.get("StartRow", 1))
+        return httpx.Response(200, text=pages[(start_row - 1) // 200])
+    return handle
+
+
+def _run(coro_fn, handler, **kwargs):
+    async def main():
+        client = httpx.AsyncClient(transport=httpx.MockTransport(handler))
+        async with AsyncTCEQClient(client=client, retry_policy=RetryPolicy(base_delay=0), **kwargs) as tceq:
+            return await coro_fn(tceq)
+    return asyncio.run(main())
+
+
+def test_async_client_fetches_every_page_in_order():
+    requests = []
+    pages = make_result_pages(450)
+
+    async def search(tceq):
+        return [result async for result in tceq.search_many([RN, "RN100210517"])]
+
+    finished = _run(search, _search_handler(pages, requests))
+    expected = [row['dID'] for row in make_result_rows(450) if "technical review" in row['title'].lower()]
+    assert sorted(rn for rn, _, _ in finished) == sorted([RN, "RN100210517"])
+    for rn, results, error in finished:
+        assert error is None
+        assert [doc['dID'] for doc in results] == expected
+    # The search form is fetched once and shared by both searches
+    assert requests.count(("GET", None)) == 1
+
+
+def test_async_client_checks_the_layout_of_every_page():
+    pages = make_result_pages(450)
+    pages[1] = "<html><body><div>Redesigned results</div></body></html>"
+
+    async def search(tceq):
+        return [result async for result in tceq.search_many([RN])]
+
+    [(rn, results, error)] = _run(search, _search_handler(pages, []))
+    assert results == []
+    assert isinstance(error, TCEQLayoutError)
+
+
+def test_async_download_resumes_partial_files(tmp_path):
+    ranges = []
+
+    def handle(request):
+        byte_range = request.headers.get("Range")
+        ranges.append(byte_range)
+        if not byte_range:
+            return httpx.Response(200, content=BODY, headers={"Content-Type": "application/pdf"})
+        offset = int(byte_range[len("bytes="):-1])
+        if offset >= len(BODY):
+            return httpx.Response(416, headers={"Content-Range": f"bytes */{len(BODY)}"})
+        return httpx.Response(206, content=BODY[offset:], headers={"Content-Type": "application/pdf"})
+
+    (tmp_path / "5000001.part").write_bytes(BODY[:100])
+    path = _run(lambda tceq: tceq.download(DOC, str(tmp_path)), handle)
+    assert path == str(tmp_path / "5000001.pdf")
+    assert (tmp_path / "5000001.pdf").read_bytes() == BODY
+    assert ranges == ["bytes=100-"]
+
+    # A part file longer than the document is downloaded again
+    (tmp_path / "5000001.pdf").unlink()
+    (tmp_path / "5000001.part").write_bytes(BODY + b"garbage")
+    _run(lambda tceq: tceq.download(DOC, str(tmp_path)), handle)
+    assert ranges[1:] == [f"bytes={len(BODY) + 7}-", None]
+    assert (tmp_path / "5000001.pdf").read_bytes() == BODY
+
+
+def test_async_search_timeout_is_an_outage():
+    async def handle(request):
+        await asyncio.sleep(1)
+        return httpx.Response(200, text=SEARCH_FORM)
+
+    async def search(tceq):
+        return [result async for result in tceq.search_many([RN])]
+
+    [(rn, results, error)] = _run(search, handle, search_timeout=0.05)
+    assert rn == RN and results == []
+    assert isinstance(error, TCEQUnavailableError)
+
+
+def test_async_download_retries_and_resumes(tmp_path):
+    ranges = []
+
+    def handle(request):
+        ranges.append(request.headers.get("Range"))
+        if len(ranges) == 1:
+            return httpx.Response(503, headers={"Retry-After": "0"})
+        return httpx.Response(206, content=BODY[100:], headers={"Content-Type": "application/pdf"})
+
+    (tmp_path / "5000001.part").write_bytes(BODY[:100])
+    assert _run(lambda tceq: tceq.download(DOC, str(tmp_path)), handle) == str(tmp_path / "5000001.pdf")
+    assert ranges == ["bytes=100-", "bytes=100-"]
+    assert (tmp_path / "5000001.pdf").read_bytes() == BODY
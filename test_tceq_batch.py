@@ -0,0 +1,38 @@
+from datetime import datetime
+
+import pytest
+
+from tceq_batch import AsyncBatchRunner, TCEQBatchRunner, read_rn_list
+from tceq_client import TCEQClient, filter_by_date
+from tceq_replay_server import ReplayServer
+
+RN = "RN100223445"
+
+
+def test_read_rn_list_dedupes_and_skips_comments():
+    lines = ["rn100223445, RN100210517\n", "# header\n", b"RN100223445\n", "\n", "RN102000000 # last\n"]
+    assert read_rn_list(lines) == [RN, "RN100210517", "RN102000000"]
+
+
+@pytest.mark.parametrize("runner_class", [TCEQBatchRunner, AsyncBatchRunner], ids=["threads", "async"])
+def test_batch_runner_returns_rows_per_rn(runner_class):
+    rns = [RN, "RN100210517", "RN102000000"]
+    with ReplayServer(total_rows=450) as server:
+        expected = TCEQClient(base_url=server.base_url).search_technical_reviews(RN)
+        runner = runner_class(max_workers=2, requests_per_second=None, base_url=server.base_url)
+        finished = list(runner.iter_results(rns))
+    assert sorted(rn for rn, _, _ in finished) == sorted(rns)
+    for rn, results, error in finished:
+        assert error is None
+        assert results == expected
+
+
+@pytest.mark.parametrize("runner_class", [TCEQBatchRunner, AsyncBatchRunner], ids=["threads", "async"])
+def test_batch_runner_pushes_start_date_into_the_search(runner_class):
+    with ReplayServer(total_rows=2000) as server:
+        everything = TCEQClient(base_url=server.base_url).search_technical_reviews(RN)
+        start_date = datetime.strptime(everything[150]['date'], "%m/%d/%Y")
+        searches = server.request_counts["TCEQ_PERFORM_SEARCH"]
+        runner = runner_class(requests_per_second=None, base_url=server.base_url)
+        assert runner.run([RN], start_date) == {RN: filter_by_date(everything, start_date)}
+        assert server.request_counts["TCEQ_PERFORM_SEARCH"] - searches < searches
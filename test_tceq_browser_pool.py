@@ -0,0 +1,57 @@
+import time
+
+import pytest
+
+from tceq_browser_pool import BrowserPool
+from tceq_resilience import RetryPolicy, TCEQUnavailableError
+
+RN = "RN100223445"
+
+
+def test_browser_pool_resets_in_background_and_times_out(fake_browsers):
+    browsers = fake_browsers(reset_delay=0.3)
+    pool = BrowserPool(size=1, acquire_timeout=0.1, client_factory=browsers)
+    start = time.perf_counter()
+    with pool.acquire() as first:
+        with pytest.raises(TimeoutError):
+            with pool.acquire():
+                pass
+    # Releasing did not wait for the reset; the next borrower gets the browser once it is done
+    assert time.perf_counter() - start < 0.3
+    pool.acquire_timeout = 5
+    with pool.acquire() as client:
+        assert client is first
+        assert browsers.resets == 1
+    pool.close()
+    assert first.closed
+
+
+def test_browser_pool_recycles_failed_and_worn_browsers(fake_browsers):
+    browsers = fake_browsers()
+    pool = BrowserPool(size=1, max_uses=2, client_factory=browsers)
+    with pytest.raises(ValueError):
+        with pool.acquire():
+            raise ValueError("job failed")
+    for _ in range(3):
+        with pool.acquire():
+            pass
+    # One browser dropped after the failed job, one after max_uses jobs
+    assert [browser.closed for browser in browsers.built] == [True, True, False]
+    pool.close()
+
+
+def test_browser_stream_retries_until_first_page(fake_browsers):
+    pages = [[{"title": "Technical Review", "url": "https://example.invalid/1", "date": "06/01/2024"}],
+             [{"title": "Technical Review", "url": "https://example.invalid/2", "date": "05/01/2024"}]]
+    browsers = fake_browsers(pages=pages, errors=[TCEQUnavailableError("503", status_code=503)],
+                             tail_error=TCEQUnavailableError("503", status_code=503))
+    pool = BrowserPool(size=1, base_url="https://flaky-stream.invalid/cs/idcplg", client_factory=browsers,
+                       retry_policy=RetryPolicy(max_attempts=3, base_delay=0))
+    streamed = pool.iter_search(RN)
+    # The outage before the first page is retried; after it, the error propagates
+    assert [doc['url'] for doc in next(streamed)] == ["https://example.invalid/1"]
+    assert [doc['url'] for doc in next(streamed)] == ["https://example.invalid/2"]
+    with pytest.raises(TCEQUnavailableError):
+        next(streamed)
+    assert browsers.searches == 2
+    pool.close()
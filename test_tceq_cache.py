@@ -0,0 +1,42 @@
+import time
+
+from tceq_cache import SearchCache
+from tceq_records import ResultRecord
+from tceq_resilience import TCEQUnavailableError
+
+RN = "RN100223445"
+
+
+def _key(cache, rn_number):
+    return cache.make_key(rn_number, "1081", "Technical Review", ("dInDate", "Desc"))
+
+
+def test_cache_expires_empty_results_early(tmp_path):
+    cache = SearchCache(str(tmp_path / "cache.sqlite3"), ttl=3600, empty_ttl=0)
+    empty_key = _key(cache, RN)
+    found_key = _key(cache, "RN100210517")
+    cache.put(empty_key, [])
+    cache.put(found_key, [{"title": "Technical Review", "url": "https://example.invalid/doc", "date": "06/01/2024"}])
+    time.sleep(0.01)
+    assert cache.get(empty_key) is None
+    assert cache.get(empty_key, allow_stale=True) == []
+    assert len(cache.get(found_key)) == 1
+    cache.close()
+
+
+def test_cache_serves_stale_results_when_refetch_fails(tmp_path):
+    cache = SearchCache(str(tmp_path / "cache.sqlite3"), ttl=0, max_entries=2)
+    rows = [ResultRecord("Technical Review", "https://example.invalid/doc", "06/01/2024")]
+    assert cache.fetch(_key(cache, RN), lambda: rows) == rows
+    time.sleep(0.01)
+
+    def down():
+        raise TCEQUnavailableError("503", status_code=503)
+
+    assert cache.fetch(_key(cache, RN), down) == rows
+
+    # Only the max_entries most recently used entries are kept
+    for rn_number in ("RN100210517", "RN102000000"):
+        cache.put(_key(cache, rn_number), rows)
+    assert cache.get(_key(cache, RN), allow_stale=True) is None
+    cache.close()
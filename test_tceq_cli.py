@@ -0,0 +1,40 @@
+import json
+
+import pytest
+
+import tceq_batch
+from tceq_async_client import AsyncTCEQClient
+from tceq_client import TCEQClient
+from tceq_cli import in_shard, main, parse_shard
+from tceq_replay_server import ReplayServer
+
+RN = "RN100223445"
+
+
+def test_shards_split_rn_list_exactly_once():
+    rns = [f"RN1{i:08d}" for i in range(500)]
+    shards = [[rn for rn in rns if in_shard(rn, parse_shard(f"{i}/4"))] for i in range(4)]
+    assert sorted(rn for shard in shards for rn in shard) == rns
+    assert all(shard for shard in shards)
+
+
+def test_batch_entry_point_runs_the_cli(capsys):
+    with pytest.raises(SystemExit):
+        tceq_batch.main(["--help"])
+    assert "--shard" in capsys.readouterr().out
+
+
+@pytest.mark.parametrize("engine", ["http", "async"])
+def test_cli_writes_every_rn_to_json_lines(tmp_path, monkeypatch, engine):
+    rns = [RN, "RN100210517"]
+    (tmp_path / "rns.txt").write_text("\n".join(rns) + "\n")
+    output = tmp_path / "results.jsonl"
+    with ReplayServer(total_rows=450) as server:
+        expected = TCEQClient(base_url=server.base_url).search_technical_reviews(RN)
+        monkeypatch.setattr(TCEQClient, "BASE_URL", server.base_url)
+        monkeypatch.setattr(AsyncTCEQClient, "BASE_URL", server.base_url)
+        status = main([str(tmp_path / "rns.txt"), "--engine", engine, "--cache", "", "--output", str(output)])
+    rows = [json.loads(line) for line in output.read_text().splitlines()]
+    assert status == 0
+    assert len(rows) == len(rns) * len(expected)
+    assert {row["rn"] for row in rows} == set(rns)
@@ -0,0 +1,49 @@
+from datetime import datetime, timedelta
+
+from tceq_cache import SearchCache
+from tceq_client import TCEQClient, filter_by_date
+from tceq_replay_server import ReplayServer
+
+RN = "RN100223445"
+
+
+def test_start_date_narrows_search_by_check_in(tmp_path):
+    with ReplayServer(total_rows=2000, page_size=200) as server:
+        client = TCEQClient(base_url=server.base_url, page_workers=2)
+        everything = client.search_technical_reviews(RN)
+        start_date = datetime.strptime(everything[150]['date'], "%m/%d/%Y")
+        searches = server.request_counts["TCEQ_PERFORM_SEARCH"]
+
+        results = client.search_technical_reviews(RN, start_date)
+        assert results == filter_by_date(everything, start_date)
+        assert server.request_counts["TCEQ_PERFORM_SEARCH"] - searches < searches
+
+        # A narrowed cache entry serves later start dates only
+        cached = TCEQClient(base_url=server.base_url, cache=SearchCache(str(tmp_path / "cache.sqlite3")))
+        cached.search_technical_reviews(RN, start_date)
+        searches = server.request_counts["TCEQ_PERFORM_SEARCH"]
+        later = start_date + timedelta(days=60)
+        assert cached.search_technical_reviews(RN, later) == filter_by_date(everything, later)
+        assert server.request_counts["TCEQ_PERFORM_SEARCH"] == searches
+        assert cached.search_technical_reviews(RN) == everything
+        assert server.request_counts["TCEQ_PERFORM_SEARCH"] > searches
+
+
+def test_iter_search_streams_pages_and_caches_only_complete_searches(tmp_path):
+    with ReplayServer(total_rows=450, page_size=200) as server:
+        cache = SearchCache(str(tmp_path / "cache.sqlite3"))
+        client = TCEQClient(base_url=server.base_url, cache=cache)
+        pages = client.iter_search(RN)
+        first = next(pages)
+        pages.close()
+        # An abandoned search caches nothing
+        key = cache.make_key(RN, client.RECORD_SERIES, client.KEYWORD, client.SORT)
+        assert cache.get(key) is None
+
+        streamed = list(client.iter_search(RN))
+        assert len(streamed) == 3 and streamed[0] == first
+        assert [doc for rows in streamed for doc in rows] == cache.get(key)
+        searches = server.request_counts["TCEQ_PERFORM_SEARCH"]
+        assert list(client.iter_search(RN)) == [cache.get(key)]
+        assert server.request_counts["TCEQ_PERFORM_SEARCH"] == searches
+        cache.close()
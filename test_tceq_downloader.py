@@ -0,0 +1,92 @@
+import os
+import zipfile
+
+from tceq_downloader import DocumentDownloader, build_zip, zip_name_for
+
+BODY = b"%PDF-1.4 " + b"x" * 1000
+DOC = {"title": "Technical Review", "url": "https://example.invalid/cs/idcplg?dID=5000001", "dID": "5000001"}
+
+
+class FakeResponse:
+    def __init__(self, status_code, body=b"", headers=None):
+        self.status_code = status_code
+        self.body = body
+        self.headers = headers or {}
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        return False
+
+    def raise_for_status(self):
+        if self.status_code >= 400:
+            raise OSError(f"HTTP {self.status_code}")
+
+    def iter_content(self, chunk_size=1):
+        for i in range(0, len(self.body), chunk_size):
+            yield self.body[i:i + chunk_size]
+
+
+class FakeSession:
+    """
+    Serves BODY, honouring Range requests the way TCEQ does.
+    """
+
+    def __init__(self, body=BODY):
+        self.body = body
+        self.ranges = []
+
+    def get(self, url, headers=None, **kwargs):
+        byte_range = (headers or {}).get("Range")
+        self.ranges.append(byte_range)
+        if not byte_range:
+            return FakeResponse(200, self.body, {"Content-Type": "application/pdf"})
+        offset = int(byte_range[len("bytes="):-1])
+        if offset >= len(self.body):
+            return FakeResponse(416, headers={"Content-Range": f"bytes */{len(self.body)}"})
+        return FakeResponse(206, self.body[offset:], {"Content-Type": "application/pdf"})
+
+
+def test_download_resumes_partial_files(tmp_path):
+    (tmp_path / "5000001.part").write_bytes(BODY[:100])
+    session = FakeSession()
+    path = DocumentDownloader(str(tmp_path), session=session).download(DOC)
+    assert path == str(tmp_path / "5000001.pdf")
+    assert (tmp_path / "5000001.pdf").read_bytes() == BODY
+    assert session.ranges == ["bytes=100-"]
+
+    # Documents already on disk are not fetched again
+    assert DocumentDownloader(str(tmp_path), session=session).download_all([DOC, dict(DOC)]) == [path]
+    assert len(session.ranges) == 1
+
+
+def test_unsatisfiable_range_checks_the_part_file(tmp_path):
+    # A complete part file is renamed into place
+    (tmp_path / "5000001.part").write_bytes(BODY)
+    session = FakeSession()
+    assert DocumentDownloader(str(tmp_path), session=session).download(DOC) == str(tmp_path / "5000001.pdf")
+    assert session.ranges == [f"bytes={len(BODY)}-"]
+
+    # A part file longer than the document is downloaded again
+    os.remove(tmp_path / "5000001.pdf")
+    (tmp_path / "5000001.part").write_bytes(BODY + b"garbage")
+    session = FakeSession()
+    DocumentDownloader(str(tmp_path), session=session).download(DOC)
+    assert session.ranges == [f"bytes={len(BODY) + 7}-", None]
+    assert (tmp_path / "5000001.pdf").read_bytes() == BODY
+    assert sorted(os.listdir(tmp_path)) == ["5000001.pdf"]
+
+
+def test_zip_name_is_stable_per_result_set(tmp_path):
+    other = dict(DOC, url="https://example.invalid/cs/idcplg?dID=5000002", dID="5000002")
+    assert zip_name_for([DOC, other]) == zip_name_for([other, DOC])
+    assert zip_name_for([DOC]) != zip_name_for([DOC, other])
+
+    path = DocumentDownloader(str(tmp_path), session=FakeSession()).download(DOC)
+    zip_path = str(tmp_path / zip_name_for([DOC]))
+    for _ in range(2):
+        assert build_zip([path], zip_path) == zip_path
+    with zipfile.ZipFile(zip_path) as zf:
+        assert zf.namelist() == ["5000001.pdf"]
+    assert sorted(os.listdir(tmp_path)) == sorted(["5000001.pdf", os.path.basename(zip_path)])
@@ -0,0 +1,54 @@
+import re
+
+import pytest
+
+from tceq_browser_pool import BrowserPool
+from tceq_client import TCEQClient
+from tceq_fixtures import make_result_rows, make_results_page, make_search_form_page
+from tceq_replay_server import SEARCH_PATH, ReplayServer
+from tceq_search import TCEQSearch
+
+RN = "RN100223445"
+BROWSER_DOC = {"title": "Technical Review", "url": "https://example.invalid/doc"}
+
+
+def _without_total(page):
+    return re.sub(r"<div class='summary'>.*?</div>|<input type='hidden' name='TotalRows'[^>]*>", "", page)
+
+
+def _search(server, fake_browsers):
+    pool = BrowserPool(size=1, client_factory=fake_browsers(pages=[[BROWSER_DOC]]))
+    try:
+        return TCEQSearch(TCEQClient(base_url=server.base_url), pool).search_with_engine(RN)
+    finally:
+        pool.close()
+
+
+def test_search_is_served_over_http_when_the_layout_is_sane(fake_browsers):
+    with ReplayServer(total_rows=450) as server:
+        expected = TCEQClient(base_url=server.base_url).search_technical_reviews(RN)
+        results, engine = _search(server, fake_browsers)
+    assert engine == TCEQSearch.HTTP
+    assert results == expected
+
+
+@pytest.mark.parametrize("layout", ["redesigned", "short_single_page", "next_link_without_table"])
+def test_layout_checks_trigger_browser_fallback(tmp_path, fake_browsers, layout):
+    rows = make_result_rows(400)
+    if layout == "redesigned":
+        pages = ["<html><body><div>Redesigned results</div></body></html>"]
+    elif layout == "short_single_page":
+        # One page that claims more rows than its table holds
+        pages = [make_results_page(rows[:5]).replace("value='5'", "value='6'").replace("of 5<", "of 6<")]
+    else:
+        # No total anywhere, so pages are followed by their next links
+        pages = [_without_total(make_results_page(rows[:200], total=400)),
+                 "<html><body><div>Redesigned results</div></body></html>"]
+    (tmp_path / "search_form.html").write_text(make_search_form_page(SEARCH_PATH))
+    for i, page in enumerate(pages, start=1):
+        (tmp_path / f"results_{i}.html").write_text(page)
+
+    with ReplayServer(pages_dir=str(tmp_path)) as server:
+        results, engine = _search(server, fake_browsers)
+    assert engine == TCEQSearch.SELENIUM
+    assert results == [BROWSER_DOC]
@@ -0,0 +1,88 @@
+import os
+import time
+
+from tceq_http import (CappedGovernor, HostLimiter, PooledSession, RateGovernor, default_governor, governor_path,
+                       shared_governor)
+from tceq_replay_server import ReplayServer
+
+HOST = "records.tceq.texas.gov"
+URL = f"https://{HOST}/cs/idcplg"
+
+
+def test_rate_governor_adapts_and_is_shared(tmp_path):
+    path = str(tmp_path / "governor.sqlite3")
+    first = RateGovernor(path, initial_rate=4.0, max_rate=10.0, cooldown=60)
+    second = RateGovernor(path, initial_rate=4.0, max_rate=10.0, cooldown=60)
+
+    for _ in range(10):
+        first.record(URL, 0.1, 200)
+    assert second.rate(HOST) > 4.0
+
+    first.record(URL, 0.1, 503)
+    second.record(URL, None)
+    halved = second.rate(HOST)
+    assert 2.0 < halved < 2.5
+
+    second.record(URL, 9.0, 200)
+    assert first.rate(HOST) == halved
+    # Browser page loads are judged against their own, longer target
+    second.record(URL, 9.0, 200, latency_target=20.0)
+    assert first.rate(HOST) > halved
+    first.close()
+    second.close()
+
+
+def test_default_governor_stays_near_two_rps_and_writes_no_file(tmp_path, monkeypatch):
+    monkeypatch.delenv("TCEQ_GOVERNOR_PATH", raising=False)
+    monkeypatch.chdir(tmp_path)
+    governor = RateGovernor()
+    for _ in range(50):
+        governor.record(URL, 0.1, 200)
+    assert governor.rate(HOST) == 2.0
+
+    PooledSession().rate_limiter.record(URL, 0.1, 200)
+    assert default_governor().rate(HOST) <= 2.0
+    assert os.listdir(tmp_path) == []
+    assert governor_path(str(tmp_path / "cache" / "tceq_cache.sqlite3")) == str(
+        tmp_path / "cache" / "tceq_governor.sqlite3")
+
+
+def test_shared_governor_is_one_per_path_and_caps_stay_local(tmp_path, monkeypatch):
+    monkeypatch.chdir(tmp_path)
+    governor = shared_governor("governor.sqlite3")
+    assert shared_governor(str(tmp_path / "governor.sqlite3")) is governor
+    assert shared_governor(None) is not governor
+
+    slow, fast = CappedGovernor(governor, 0.5), CappedGovernor(governor, 5.0)
+    fast.record(URL, 0.1, 200)
+    assert slow.rate(HOST) == 0.5
+    assert fast.rate(HOST) == governor.rate(HOST) == 2.0
+
+
+def test_capped_governor_paces_requests():
+    capped = CappedGovernor(RateGovernor(initial_rate=100.0, max_rate=100.0, burst=100.0, hosts=None), 20.0)
+    started = time.perf_counter()
+    for _ in range(5):
+        capped.acquire(URL)
+    assert time.perf_counter() - started >= 0.19
+
+
+def test_session_takes_rate_token_before_host_slot():
+    limiter = HostLimiter(max_per_host=1)
+    slot_free = []
+
+    class CheckingGovernor:
+        def acquire(self, url=None):
+            semaphore = limiter.semaphore(url)
+            free = semaphore.acquire(blocking=False)
+            if free:
+                semaphore.release()
+            slot_free.append(free)
+
+        def record(self, *args, **kwargs):
+            pass
+
+    with ReplayServer(total_rows=20) as server:
+        session = PooledSession(limiter, CheckingGovernor())
+        assert session.get(server.search_url).status_code == 200
+    assert slot_free == [True]
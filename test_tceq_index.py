@@ -0,0 +1,30 @@
+from tceq_downloader import DocumentDownloader
+from tceq_index import DocumentIndex
+
+RN = "RN100223445"
+
+
+def test_document_index_round_trip(tmp_path):
+    downloads = tmp_path / "downloads"
+    downloads.mkdir()
+    (downloads / "5000001.html").write_text("<html><body><p>NOx limit of 12.5 lb/hr for Boiler B-1</p></body></html>")
+    (downloads / "5000002.txt").write_text("PSD applicability review: CO emissions below threshold.")
+    index = DocumentIndex(str(tmp_path / "index.sqlite3"))
+
+    # Files the downloader delivers are indexed, including ones already on disk
+    doc = {"title": "Technical Review", "url": "https://example.invalid/cs/idcplg?dID=5000001",
+           "date": "06/01/2024", "dID": 5000001, "rn": RN}
+    downloader = DocumentDownloader(str(downloads), index=index)
+    assert [error for _, _, error in downloader.iter_download([doc])] == [None]
+    hits = index.search("boiler NOx")
+    assert [hit['doc_id'] for hit in hits] == ["5000001"]
+    assert hits[0]['rn'] == RN and hits[0]['title'] == "Technical Review"
+    assert "**NOx**" in hits[0]['snippet']
+
+    # Re-indexing the directory only extracts files that are new or changed
+    assert index.index_directory(str(downloads)) == 1
+    assert index.index_directory(str(downloads)) == 0
+    assert [hit['doc_id'] for hit in index.search("PSD: co-emissions")] == ["5000002"]
+    assert index.search("   ") == []
+    assert index.count() == 2
+    index.close()
@@ -0,0 +1,66 @@
+import threading
+import time
+
+from tceq_batch import TCEQBatchRunner
+from tceq_client import TCEQClient
+from tceq_jobs import Job, JobQueue, batch_job
+from tceq_replay_server import ReplayServer
+from tceq_resilience import TCEQUnavailableError
+
+RN = "RN100223445"
+
+
+def _wait_for(job, timeout=30):
+    deadline = time.monotonic() + timeout
+    while not job.finished and time.monotonic() < deadline:
+        time.sleep(0.01)
+    assert job.finished
+
+
+def test_job_queue_runs_cancels_and_prunes_jobs():
+    queue = JobQueue(max_workers=1, max_finished=2)
+    release = threading.Event()
+    blocker = queue.get(queue.submit("search", lambda job: release.wait(5)))
+    queued = queue.get(queue.submit("search", lambda job: "never run"))
+    assert queued.status == Job.QUEUED
+    assert queue.cancel(queued.id)
+    assert queued.status == Job.CANCELLED
+
+    def fail(job):
+        raise TCEQUnavailableError("TCEQ is down")
+
+    done = queue.get(queue.submit("search", lambda job, n: n * 2, 21, description="Double"))
+    failed = queue.get(queue.submit("search", fail))
+    release.set()
+    for job in (blocker, done, failed):
+        _wait_for(job)
+    assert done.status == Job.DONE and done.result == 42
+    assert done.snapshot()["description"] == "Double"
+    assert done.trace is not None
+    assert failed.status == Job.FAILED and isinstance(failed.error, TCEQUnavailableError)
+    assert not queue.cancel(done.id)
+
+    # Submitting prunes all but the newest max_finished finished jobs
+    queue.submit("search", lambda job: None)
+    assert len(queue.jobs()) == 3
+    queue.shutdown(wait=True)
+
+
+def test_batch_jobs_share_one_runner():
+    rns = [RN, "RN100210517"]
+    with ReplayServer(total_rows=450) as server:
+        expected = TCEQClient(base_url=server.base_url).search_technical_reviews(RN)
+        runner = TCEQBatchRunner(max_workers=2, requests_per_second=None, base_url=server.base_url)
+        queue = JobQueue(max_workers=2)
+        jobs = [queue.get(queue.submit("batch", batch_job, runner, rns)) for _ in range(2)]
+        for job in jobs:
+            _wait_for(job)
+        batch_threads = [t for t in threading.enumerate() if t.name.startswith("tceq-batch")]
+        queue.shutdown(wait=True)
+        runner.close()
+    # Both jobs ran on the runner's two workers
+    assert len(batch_threads) <= 2
+    for job in jobs:
+        assert job.status == Job.DONE and job.done == len(rns)
+        assert len(job.result) == len(rns) * len(expected)
+        assert {doc['rn'] for doc in job.result} == set(rns)
@@ -0,0 +1,30 @@
+import time
+
+from tceq_metrics import Metrics, record_span, span, trace
+
+RN = "RN100223445"
+
+
+def test_prometheus_text_and_trace_breakdown():
+    metrics = Metrics()
+    metrics.inc("tceq_requests_total", help="HTTP requests\nsent", client="http", rn='RN1 "x"\\y\nz')
+    metrics.inc("tceq_requests_total", 2, client="http", rn='RN1 "x"\\y\nz')
+    metrics.observe("tceq_span_seconds", 0.02, phase="parse")
+    text = metrics.prometheus_text()
+    assert "# HELP tceq_requests_total HTTP requests\\nsent\n" in text
+    assert 'tceq_requests_total{client="http",rn="RN1 \\"x\\"\\\\y\\nz"} 3\n' in text
+    assert 'tceq_span_seconds_bucket{phase="parse",le="0.01"} 0\n' in text
+    assert 'tceq_span_seconds_bucket{phase="parse",le="0.025"} 1\n' in text
+    assert 'tceq_span_seconds_count{phase="parse"} 1\n' in text
+
+    with trace("search", rn=RN) as t:
+        with span("page_load"):
+            pass
+        with span("page_load"):
+            time.sleep(0.01)
+        record_span("parse", 0.5)
+    breakdown = t.breakdown()
+    assert [row["phase"] for row in breakdown] == ["page_load", "parse"]
+    assert breakdown[0]["count"] == 2 and breakdown[0]["max_s"] >= 0.01
+    assert breakdown[1]["total_s"] == 0.5
+    assert breakdown[0]["total_s"] <= t.duration()
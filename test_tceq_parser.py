@@ -0,0 +1,32 @@
+import pytest
+
+from tceq_fixtures import make_result_pages, make_result_rows, make_results_page
+from tceq_parser import parse_results, parse_results_page
+
+BASE_URL = "https://records.tceq.texas.gov/cs/idcplg"
+
+
+def test_parser_reads_rows_and_paging():
+    rows = make_result_rows(400)
+    page = parse_results_page(make_results_page(rows[:200], total=400), BASE_URL)
+    assert page['has_table'] and not page['no_results']
+    assert page['total'] == 400
+    assert page['next_params']
+    assert [doc['dID'] for doc in page['rows']] == [row['dID'] for row in rows[:200]
+                                                      if "technical review" in row['title'].lower()]
+    assert all(doc['url'].startswith(BASE_URL) and doc['date'] for doc in page['rows'])
+
+    empty = parse_results_page(make_results_page([]), BASE_URL)
+    assert empty['no_results'] and not empty['has_table'] and empty['rows'] == []
+
+
+@pytest.mark.parametrize("header", ["td", "none"])
+def test_parser_handles_td_or_missing_header(header):
+    page = make_result_pages(20)[0]
+    expected = parse_results(page, BASE_URL)
+    header_row = page[page.index("<table id='table_0'><tr>") + len("<table id='table_0'>"):]
+    header_row = header_row[:header_row.index("</tr>") + len("</tr>")]
+    replacement = header_row.replace("<th>", "<td>").replace("</th>", "</td>") if header == "td" else ""
+    rows = parse_results(page.replace(header_row, replacement), BASE_URL)
+    assert rows == expected
+    assert rows and all(doc['title'].startswith("Technical Review") for doc in rows)
@@ -0,0 +1,23 @@
+from tceq_cache import SearchCache
+from tceq_client import TCEQClient
+from tceq_records import ResultRecord, open_writer
+from tceq_replay_server import ReplayServer
+
+RN = "RN100223445"
+
+
+def test_records_round_trip_cache_and_csv(tmp_path):
+    with ReplayServer(total_rows=200, page_size=200) as server:
+        cache = SearchCache(str(tmp_path / "cache.sqlite3"))
+        client = TCEQClient(base_url=server.base_url, cache=cache)
+        results = client.search_technical_reviews(RN)
+        assert all(isinstance(doc, ResultRecord) and isinstance(doc.dID, int) and doc.doc_date for doc in results)
+        assert client.search_technical_reviews(RN) == results
+
+    writer = open_writer(str(tmp_path / "results.csv"))
+    writer.write([doc.with_rn(RN) for doc in results])
+    writer.close()
+    lines = (tmp_path / "results.csv").read_text().splitlines()
+    assert lines[0] == "rn,dID,title,date,doc_date,url,raw_text"
+    assert len(lines) == len(results) + 1
+    cache.close()
@@ -0,0 +1,61 @@
+import asyncio
+import time
+
+import pytest
+
+from tceq_resilience import (CircuitBreaker, CircuitOpenError, RetryPolicy, TCEQUnavailableError,
+                             async_call_with_retries, call_with_retries)
+
+
+def test_retries_transient_failures_then_succeeds():
+    calls = []
+
+    def flaky():
+        calls.append(1)
+        if len(calls) < 3:
+            raise TCEQUnavailableError("503", status_code=503)
+        return "ok"
+
+    breaker = CircuitBreaker(failure_threshold=5)
+    assert call_with_retries(flaky, RetryPolicy(max_attempts=4, base_delay=0), breaker) == "ok"
+    assert len(calls) == 3
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    calls.clear()
+    with pytest.raises(TCEQUnavailableError):
+        call_with_retries(flaky, RetryPolicy(max_attempts=2, base_delay=0))
+    assert len(calls) == 2
+
+    async def async_flaky():
+        return flaky()
+
+    calls.clear()
+    assert asyncio.run(async_call_with_retries(async_flaky, RetryPolicy(max_attempts=4, base_delay=0))) == "ok"
+    assert len(calls) == 3
+
+
+def test_circuit_breaker_opens_and_recovers():
+    calls = []
+
+    def down():
+        calls.append(1)
+        raise TCEQUnavailableError("503", status_code=503)
+
+    breaker = CircuitBreaker(failure_threshold=3, reset_timeout=0.2)
+    with pytest.raises(TCEQUnavailableError):
+        call_with_retries(down, RetryPolicy(max_attempts=5, base_delay=0), breaker)
+    # The third failure opened the circuit; the fourth attempt was refused without a call
+    assert len(calls) == 3
+    assert breaker.state == CircuitBreaker.OPEN
+    with pytest.raises(CircuitOpenError):
+        call_with_retries(lambda: "ok", breaker=breaker)
+
+    time.sleep(0.25)
+    # Half-open: one trial call is let through and closes the circuit
+    assert call_with_retries(lambda: "ok", breaker=breaker) == "ok"
+    assert breaker.state == CircuitBreaker.CLOSED
+
+    # Other errors mean the server answered, so they do not count as failures
+    with pytest.raises(ValueError):
+        call_with_retries(lambda: int("x"), breaker=breaker)
+    assert breaker.state == CircuitBreaker.CLOSED
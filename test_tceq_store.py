@@ -0,0 +1,47 @@
+import os
+from concurrent.futures import ThreadPoolExecutor
+
+from tceq_client import TCEQClient
+from tceq_downloader import DocumentDownloader
+from tceq_jobs import Job, download_job, search_job
+from tceq_replay_server import ReplayServer
+from tceq_search import TCEQSearch
+from tceq_store import DocumentStore, link_file
+
+RN = "RN100223445"
+
+
+def test_store_links_documents_instead_of_downloading(tmp_path):
+    with ReplayServer(total_rows=450) as server:
+        rows = TCEQClient(base_url=server.base_url).search_technical_reviews(RN)[:5]
+        store = DocumentStore(str(tmp_path / "store"))
+        first = DocumentDownloader(str(tmp_path / "audit1"), store=store).download_all([doc.with_rn(RN) for doc in rows])
+        downloads = server.request_counts["GET_FILE"]
+
+        second = DocumentDownloader(str(tmp_path / "audit2"), store=store).download_all(rows)
+        assert server.request_counts["GET_FILE"] == downloads == 5
+    assert sorted(os.path.basename(path) for path in first) == sorted(os.path.basename(path) for path in second)
+    assert all(os.path.samefile(path, store.lookup(os.path.splitext(os.path.basename(path))[0])) for path in second)
+    assert store.doc_ids(RN) == sorted(str(doc.dID) for doc in rows)
+    store.close()
+
+
+def test_single_rn_downloads_fill_the_store_index(tmp_path):
+    with ReplayServer(total_rows=20) as server:
+        search = Job("search")
+        rows = search_job(search, TCEQSearch(TCEQClient(base_url=server.base_url)), RN.lower())
+        assert rows and all(doc.rn == RN for doc in rows)
+        store = DocumentStore(str(tmp_path / "store"))
+        download_job(Job("download"), rows, str(tmp_path / "downloads"), store=store)
+    assert store.doc_ids(RN) == sorted(str(doc.dID) for doc in rows)
+    store.close()
+
+
+def test_link_file_is_safe_across_threads(tmp_path):
+    src = tmp_path / "blob"
+    src.write_bytes(b"%PDF-1.4 stored document")
+    dest = str(tmp_path / "5000001.pdf")
+    with ThreadPoolExecutor(max_workers=8) as executor:
+        assert set(executor.map(lambda _: link_file(str(src), dest), range(64))) == {dest}
+    assert sorted(os.listdir(tmp_path)) == ["5000001.pdf", "blob"]
+    assert os.path.samefile(dest, src)
@@ -0,0 +1,80 @@
+from datetime import datetime
+
+import pytest
+
+from tceq_client import TCEQClient, filter_by_date
+from tceq_downloader import document_id
+from tceq_replay_server import ReplayServer
+from tceq_sync import IncrementalSync, SyncManifest
+
+RN = "RN100223445"
+
+
+class FakeDownloader:
+    """
+    Stand-in for DocumentDownloader that fails the documents in fail_ids.
+    """
+
+    def __init__(self):
+        self.fail_ids = set()
+        self.downloaded = []
+
+    def iter_download(self, docs):
+        for doc in docs:
+            if document_id(doc) in self.fail_ids:
+                yield doc, None, OSError("connection reset")
+            else:
+                self.downloaded.append(document_id(doc))
+                yield doc, f"downloads/{document_id(doc)}.pdf", None
+
+
+@pytest.fixture
+def server():
+    # Three result pages, one document a week back from June 2024
+    with ReplayServer(total_rows=450) as server:
+        yield server
+
+
+def _page_requests(server):
+    return server.request_counts.get("TCEQ_PERFORM_SEARCH", 0)
+
+
+def test_sync_retries_failed_downloads(tmp_path, server):
+    rows = TCEQClient(base_url=server.base_url).search_technical_reviews(RN)
+    manifest = SyncManifest(str(tmp_path / "manifest.sqlite3"))
+    downloader = FakeDownloader()
+    downloader.fail_ids = {document_id(rows[10])}
+    sync = IncrementalSync(manifest, downloader, requests_per_second=None, base_url=server.base_url)
+
+    assert sync.run([RN])[RN] == rows
+    assert manifest.seen_ids(RN) == {document_id(doc) for doc in rows[11:]}
+    downloader.fail_ids = set()
+    assert sync.run([RN])[RN] == rows[:11]
+    assert manifest.seen_ids(RN) == {document_id(doc) for doc in rows}
+    requests_before = _page_requests(server)
+    assert sync.run([RN])[RN] == []
+    # Paging stopped at the first known document
+    assert _page_requests(server) - requests_before == 1
+    manifest.close()
+
+
+def test_sync_records_only_documents_in_the_date_range(tmp_path, server):
+    rows = TCEQClient(base_url=server.base_url).search_technical_reviews(RN)
+    manifest = SyncManifest(str(tmp_path / "manifest.sqlite3"))
+    downloader = FakeDownloader()
+    sync = IncrementalSync(manifest, downloader, requests_per_second=None, base_url=server.base_url)
+    start_date, end_date = datetime(2023, 10, 1), datetime(2024, 3, 31)
+
+    in_range = filter_by_date(rows, start_date, end_date)
+    assert in_range and in_range[0] != rows[0]
+    assert sync.run([RN], start_date, end_date)[RN] == in_range
+    assert manifest.seen_ids(RN) == {document_id(doc) for doc in in_range}
+    requests_before = _page_requests(server)
+    assert sync.run([RN], start_date, end_date)[RN] == []
+    assert _page_requests(server) - requests_before == 1
+
+    # A wider range than the last run pages through everything again
+    assert sync.run([RN])[RN] == [doc for doc in rows if doc not in in_range]
+    assert sorted(downloader.downloaded) == sorted(document_id(doc) for doc in rows)
+    assert manifest.covers(RN) and not manifest.covers("RN100210517")
+    manifest.close()